@@ -0,0 +1,131 @@
+# app/api/v1/admin.py
+import asyncio
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+from app.services.datastore import append_log_path, peek_snapshot
+from app.services.hot_reload import DatasetBusy, DatasetUpdateFailed, append_rows, reload_dataset
+from app.services.profiler import ProfilerBusy, sample
+from app.utils.fast_json import JSONBytesResponse
+
+
+def require_admin(x_admin_token: str | None = Header(None, description="settings.ADMIN_TOKEN")) -> None:
+    """管理 API の認可。ADMIN_TOKEN 未設定なら存在しない扱い（404）。"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+# ========== サンプリングプロファイラ (/v1/admin/profile) ==========
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10.0, gt=0, le=settings.PROFILER_MAX_SECONDS, description="計測時間（秒）"),
+    interval_ms: float = Query(5.0, ge=1.0, le=1000.0, description="サンプリング間隔（ミリ秒）"),
+    include_idle: bool = Query(False, description="待機中のスレッド（イベントループの select、空きワーカー等）も数える"),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+):
+    """このワーカープロセスの全スレッドのスタックを一定間隔で採取する。
+
+    - collapsed: ``スレッド;外側;...;葉 回数`` の行（flamegraph.pl / speedscope にそのまま渡せる）
+    - json: pid・サンプル数・スタック別回数
+    計測スレッドは呼び出しのたびに作り、終われば何も残らない（平常時のオーバーヘッドなし）。
+    """
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="profiler is disabled (PROFILER_ENABLED)")
+    try:
+        # CPU 実行器を塞がないよう既定スレッドプールで計測（イベントループも計測対象）
+        prof = await asyncio.to_thread(sample, seconds, interval_ms, include_idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    headers = {"X-Profile-Pid": str(prof.pid), "X-Profile-Samples": str(prof.samples)}
+    if format == "json":
+        return JSONBytesResponse({
+            "pid": prof.pid,
+            "seconds": prof.seconds,
+            "interval_ms": prof.interval_ms,
+            "samples": prof.samples,
+            "stacks": dict(prof.stacks.most_common()),
+        }, headers=headers)
+    return PlainTextResponse(prof.collapsed(), headers=headers)
+
+
+# ========== データセットの再読み込み・追記 (/v1/admin/dataset) ==========
+# いずれもこのワーカープロセスだけに効く（複数ワーカー時は各ワーカーで reload する）
+
+class AppendRow(BaseModel):
+    budget_id: str = Field(description="予算事業ID（既存・追記済みの ID とは重複不可）")
+    name: str | None = Field(None, description="事業名")
+    overview: str | None = Field(None, description="事業の概要")
+    issues: str | None = Field(None, description="現状・課題")
+    initial_budget: float | None = Field(None, description="当初予算（円）。無ければ推定の根拠には使われない")
+    final_budget: float | None = Field(None, description="歳出予算現額（円）")
+    embedding: list[float] | None = Field(None, description="X1 と同じ次元の埋め込み（省略時は 現状・課題 / 事業の概要 から計算）")
+
+class AppendRequest(BaseModel):
+    rows: list[AppendRow] = Field(min_length=1, max_length=10_000)
+
+
+def _update_error(e: Exception) -> HTTPException:
+    if isinstance(e, DatasetBusy):
+        return HTTPException(status_code=409, detail=str(e))
+    if isinstance(e, ValueError):
+        return HTTPException(status_code=422, detail=str(e))
+    if isinstance(e, DatasetUpdateFailed):
+        return HTTPException(status_code=500, detail=f"new dataset not activated: {e}")
+    return HTTPException(status_code=500, detail=f"dataset update failed: {type(e).__name__}: {e}")
+
+
+@router.get("/dataset")
+async def dataset_info():
+    """現在の版（未ロードなら null）と追記ログの場所。"""
+    snap = peek_snapshot()
+    log = append_log_path()
+    return JSONBytesResponse({
+        "active": snap.info() if snap is not None else None,
+        "append_log": str(log) if log is not None else None,
+    })
+
+
+@router.post("/dataset/reload")
+async def dataset_reload():
+    """データファイル（と追記ログ）を読み直した新しい版を作り、準備ができてから差し替える。
+
+    差し替えは参照の付け替えだけで、実行中のリクエストは開始時の版で最後まで処理される。
+    必須の段階（カタログ・インデックス・ウォームアップ推定）が失敗したら旧版のまま 500。
+    """
+    try:
+        # 構築中も CPU 実行器（推定）を塞がないよう既定スレッドプールで実行
+        return JSONBytesResponse(await asyncio.to_thread(reload_dataset))
+    except Exception as e:
+        raise _update_error(e)
+
+
+@router.post("/dataset/append")
+async def dataset_append(req: AppendRequest):
+    """現在の版に行を足した新しい版を作って差し替える（コーパス・インデックスは作り直さない）。
+
+    追記行は近傍探索で総当たりされ、既存のインデックス（exact / IVF / 共有セグメント）と結果を統合する。
+    DATASET_APPEND_PATH に保存されるので、再読み込み・再起動後も残る。
+    """
+    rows = [{
+        "予算事業ID": r.budget_id,
+        "事業名": r.name,
+        "事業の概要": r.overview,
+        "現状・課題": r.issues,
+        "当初予算": r.initial_budget,
+        "歳出予算現額": r.final_budget,
+        "embedding": r.embedding,
+    } for r in req.rows]
+    try:
+        return JSONBytesResponse(await asyncio.to_thread(append_rows, rows))
+    except Exception as e:
+        raise _update_error(e)
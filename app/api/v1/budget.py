@@ -1,14 +1,23 @@
 # app/api/v1/budget.py
-from fastapi import APIRouter, HTTPException
+import asyncio
+import os
+import tempfile
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 import numpy as np
 from pathlib import Path
 
-from app.api.v1.state import _SESSIONS  # MVP: セッションKVSを共用
-from app.services.predictor import predict_initial_budget
-from app.services.datastore import load_budget_data
-from app.services.embedding import embed_text_to_vec
-from app.utils.json_safe import json_safe
+from app.core.config import settings
+from app.services.concurrency import get_cpu_executor, mutate_session, run_cpu
+from app.services.bulk_predict import FORMATS, BulkSource, iter_ndjson, sniff_format
+from app.services.predictor import predict_initial_budget, predict_initial_budget_batch, quantization_report
+from app.services.datastore import current_snapshot
+from app.services.similarity import get_similarity_index, index_type
+from app.services.embedding import embed_text_to_vec, embed_texts_to_mat
+from app.services.embedding_cache import get_embedding_cache
+from app.utils.fast_json import JSONBytesResponse
 
 router = APIRouter()
 
@@ -25,63 +34,66 @@ class AllocateResponse(BaseModel):
     allocation_saved: bool = True
 
 @router.post("/allocate", response_model=AllocateResponse)
-def allocate(req: AllocateRequest):
+async def allocate(req: AllocateRequest):
     """
     予算割当：
+    - 同一セッションへの要求は session_lock で直列化（別セッションは待たない）
+    - セッションの読み書きは mutate() 内で一括（複数ワーカーでも原子的）
     - session存在チェック（なければ404）
     - 残額 < 割当なら422
     - OKなら allocations[event_id] に保存し、残額を減算
     """
-    session = _SESSIONS.get(req.session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="session not found")
+    async with mutate_session(req.session_id) as session:
+        if not session:
+            raise HTTPException(status_code=404, detail="session not found")
 
-    # 既存割当との差分のみを残額に反映（上書き動作）
-    remaining = float(session["year_budget_remaining"])
-    prev = float(session["allocations"].get(req.event_id, 0.0))
-    new = float(req.allocated_budget)
-    delta = new - prev  # 追加で必要な増分（マイナスなら残額が戻る）
+        # 既存割当との差分のみを残額に反映（上書き動作）
+        remaining = float(session["year_budget_remaining"])
+        prev = float(session["allocations"].get(req.event_id, 0.0))
+        new = float(req.allocated_budget)
+        delta = new - prev  # 追加で必要な増分（マイナスなら残額が戻る）
 
-    if delta > remaining:
-        over = delta - remaining
-        raise HTTPException(status_code=422, detail=f"budget exceeded by {over:.0f} JPY (delta)")
+        if delta > remaining:
+            over = delta - remaining
+            raise HTTPException(status_code=422, detail=f"budget exceeded by {over:.0f} JPY (delta)")
 
-    # 保存＆残額更新（上書きで整合）
-    session["allocations"][req.event_id] = new
-    session["year_budget_remaining"] = remaining - delta
+        # 保存＆残額更新（上書きで整合）
+        session["allocations"][req.event_id] = new
+        session["year_budget_remaining"] = remaining - delta
 
-    # 配分ログを追記（メモリ内永続）
-    try:
-        import datetime as _dt
-        year = int(session.get("year", 1))
-        # month: タイムラインから索引（1始まり）。見つからない場合は None
-        month = None
+        # 配分ログを追記（メモリ内永続）
         try:
-            tl = session.get("timeline", {}).get(year, [])
-            month = (tl.index(str(req.event_id)) + 1) if str(req.event_id) in tl else None
-        except Exception:
+            import datetime as _dt
+            year = int(session.get("year", 1))
+            # month: タイムラインから索引（1始まり）。見つからない場合は None
             month = None
-        session.setdefault("alloc_log", []).append({
-            "ts": _dt.datetime.utcnow().isoformat() + "Z",
-            "year": year,
-            "month": month,
-            "event_id": str(req.event_id),
-            "amount": float(new),
-        })
-    except Exception:
-        pass
-
-    return AllocateResponse(
-        year=session["year"],
-        year_budget_remaining=float(session["year_budget_remaining"]),
-        allocation_saved=True,
-    )
+            try:
+                tl = session.get("timeline", {}).get(year, [])
+                month = (tl.index(str(req.event_id)) + 1) if str(req.event_id) in tl else None
+            except Exception:
+                month = None
+            session.setdefault("alloc_log", []).append({
+                "ts": _dt.datetime.utcnow().isoformat() + "Z",
+                "year": year,
+                "month": month,
+                "event_id": str(req.event_id),
+                "amount": float(new),
+            })
+        except Exception:
+            pass
+
+        return AllocateResponse(
+            year=session["year"],
+            year_budget_remaining=float(session["year_budget_remaining"]),
+            allocation_saved=True,
+        )
 
 # ========== 2) 予算推定 (/v1/budget/predict) ==========
 
 class PredictRequest(BaseModel):
     # テキストのみ受け付け（サーバ側で埋め込み）
     query_text: str
+    topk: int | None = Field(None, ge=1, le=settings.TOPK_MAX, description="根拠として返す類似事業数（省略時は TOPK）")
 
 class PredictResponse(BaseModel):
     can_estimate: bool
@@ -92,42 +104,199 @@ class PredictResponse(BaseModel):
     topk: list[dict] | None = None
     reason: str | None = None
 
-@router.post("/budget/predict", response_model=PredictResponse)
-def budget_predict(req: PredictRequest):
+def _predict_text(text: str, topk: int | None = None) -> dict:
+    # 埋め込み＋近傍探索（CPU 実行器で動かす）。途中でデータが差し替わっても同じ版で推定する
+    snap = current_snapshot()
+    q = embed_text_to_vec(text, dim=int(snap.data.X1.shape[1]), normalize=True)
+    return predict_initial_budget(q, topk=topk, snapshot=snap)
+
+# 推定結果は predictor 側で NaN/Inf 除去済みなので、検証・再変換せずにそのまま JSON 化する
+# （response_model は OpenAPI スキーマ用に残す）
+@router.post("/budget/predict", response_model=PredictResponse, response_class=JSONBytesResponse)
+async def budget_predict(req: PredictRequest):
     try:
-        data = load_budget_data()
         if not req.query_text or not req.query_text.strip():
             raise HTTPException(status_code=422, detail="query_text is required")
-        q = embed_text_to_vec(req.query_text, dim=int(data.X1.shape[1]), normalize=True)
-
-        result = predict_initial_budget(q)
-        result = json_safe(result)
+        result = await run_cpu(_predict_text, req.query_text, req.topk)
         if not result["can_estimate"]:
             raise HTTPException(status_code=422, detail=result.get("reason", "cannot estimate"))
-        return result
+        return JSONBytesResponse(result)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"prediction failed: {e}")
 
 
+# ========== 2b) 一括予算推定 (/v1/budget/predict_batch) ==========
+
+class PredictBatchRequest(BaseModel):
+    query_texts: list[str] = Field(min_length=1, max_length=256, description="推定対象のテキスト（最大256件）")
+    topk: int | None = Field(None, ge=1, le=settings.TOPK_MAX, description="各推定の根拠として返す類似事業数（省略時は TOPK）")
+
+class PredictBatchItem(BaseModel):
+    index: int
+    ok: bool
+    result: PredictResponse | None = None
+    error: str | None = None
+
+class PredictBatchResponse(BaseModel):
+    results: list[PredictBatchItem]
+
+def _predict_texts(texts: list[str], topk: int | None = None) -> tuple[list[int], list, list[str | None]]:
+    snap = current_snapshot()
+    Q, errors = embed_texts_to_mat(texts, dim=int(snap.data.X1.shape[1]), normalize=True)
+    ok_idx = [i for i, err in enumerate(errors) if err is None]
+    preds = predict_initial_budget_batch(Q[ok_idx], topk=topk, snapshot=snap) if ok_idx else []
+    return ok_idx, preds, errors
+
+@router.post("/budget/predict_batch", response_model=PredictBatchResponse, response_class=JSONBytesResponse)
+async def budget_predict_batch(req: PredictBatchRequest):
+    """複数テキストを一括で推定する。結果は入力順、失敗は項目ごとに error で返す。"""
+    try:
+        ok_idx, preds, errors = await run_cpu(_predict_texts, req.query_texts, req.topk)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"prediction failed: {e}")
+
+    by_idx = dict(zip(ok_idx, preds))
+    items: list[dict] = []
+    for i, err in enumerate(errors):
+        if err is not None:
+            items.append({"index": i, "ok": False, "result": None, "error": err})
+            continue
+        result = by_idx[i]
+        if not result["can_estimate"]:
+            items.append({"index": i, "ok": False, "result": None, "error": result.get("reason", "cannot estimate")})
+        else:
+            items.append({"index": i, "ok": True, "result": result, "error": None})
+    return JSONBytesResponse({"results": items})
+
+
+# ========== 2c) 一括推定 (/v1/budget/predict_bulk) ==========
+
+async def _spool_upload(request: Request) -> str:
+    # 本文を受け取りながら一時ファイルへ書き出す（全体をメモリに載せない。parquet は末尾のフッタが必要）
+    limit = settings.BULK_MAX_UPLOAD_MB << 20
+    fd, path = tempfile.mkstemp(prefix="bulk-", dir=settings.BULK_SPOOL_DIR)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for piece in request.stream():
+                size += len(piece)
+                if size > limit:
+                    raise HTTPException(status_code=413, detail=f"upload exceeds {settings.BULK_MAX_UPLOAD_MB} MB")
+                f.write(piece)
+    except BaseException:
+        os.unlink(path)
+        raise
+    if size == 0:
+        os.unlink(path)
+        raise HTTPException(status_code=422, detail="empty upload")
+    return path
+
+def _close_bulk(gen, source: BulkSource) -> None:
+    try:
+        gen.close()
+    finally:
+        source.path.unlink(missing_ok=True)
+
+async def _stream_ndjson(source: BulkSource, topk: int | None, evidence: bool):
+    # 1 チャンクずつ CPU 実行器で推定し、できた分から送る（次のチャンクは送信後に処理）
+    gen = iter_ndjson(source, topk=topk, evidence=evidence)
+    fut = None
+    try:
+        while True:
+            fut = get_cpu_executor().submit(next, gen, None)
+            chunk = await asyncio.wrap_future(fut)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        # 切断で待ちが取り消されても実行中のチャンクは止まらない。実行中の生成器は close できないので、
+        # そのチャンクが終わってから（実行器のスレッドで）閉じて一時ファイルを消す
+        if fut is not None and not fut.done():
+            fut.add_done_callback(lambda _: _close_bulk(gen, source))
+        else:
+            _close_bulk(gen, source)
+
+@router.post("/budget/predict_bulk", response_class=StreamingResponse)
+async def budget_predict_bulk(
+    request: Request,
+    text_column: str = Query("事業の概要", description="推定に使うテキスト列"),
+    id_column: str | None = Query("予算事業ID", description="結果に添える ID 列（空なら付けない）"),
+    format: str | None = Query(None, description="csv / parquet（省略時は Content-Type かファイル先頭から判定）"),
+    chunk_rows: int | None = Query(None, ge=1, le=10_000, description="1 回に推定する行数（省略時は BULK_CHUNK_ROWS）"),
+    topk: int | None = Query(None, ge=1, le=settings.TOPK_MAX),
+    evidence: bool = Query(False, description="各行に Top-K 根拠（topk）を含める"),
+    encoding: str = Query("utf-8-sig", description="CSV の文字コード（例: cp932）"),
+):
+    """CSV / parquet の本文（multipart ではなくファイルそのもの）を受け取り、行ごとの推定を NDJSON で返す。
+
+    - 1 行 1 JSON: ``{"row", "id", "ok", "estimate_initial", ...}``（失敗行は ``error``）
+    - 最後に ``{"summary": {"rows", "ok", "failed", "dataset_version", "seconds"}}``
+    - チャンク単位で埋め込み・推定し、終わった分から送る（メモリは chunk_rows に比例）
+    """
+    if format is not None and format not in FORMATS:
+        raise HTTPException(status_code=422, detail=f"format must be one of {FORMATS}")
+    path = await _spool_upload(request)
+    try:
+        source = BulkSource(
+            path=Path(path),
+            fmt=format or sniff_format(Path(path), request.headers.get("content-type")),
+            text_column=text_column,
+            id_column=id_column or None,
+            chunk_rows=chunk_rows or settings.BULK_CHUNK_ROWS,
+            encoding=encoding,
+        )
+        await run_cpu(source.validate)
+    except Exception as e:
+        os.unlink(path)
+        raise HTTPException(status_code=422, detail=f"cannot read upload: {e}")
+    return StreamingResponse(_stream_ndjson(source, topk, evidence), media_type="application/x-ndjson")
+
+
 # ========== 3) モデル情報 (/v1/budget/model_info) ==========
 
 class ModelInfo(BaseModel):
     x_dim: int
     n_items: int
     topk: int
+    topk_max: int
     tau: float
     data_source: str
+    index_type: str
+    index_build_ms: float
+    index_memory_bytes: int
+    embedding_cache: dict | None = None  # hits/misses/items（無効時は None）
+    storage: str = "float32"
+    quantization: dict | None = None  # float16/int8 時: メモリ削減量・Top-K一致率・推定値ずれ
+    dataset_version: int = 0  # 応答に使っているデータの版（再読み込み・追記のたびに増える）
+    dataset: dict | None = None  # 版の詳細: kind / rows / base_rows / appended_rows / created_at
+
+def _model_info() -> ModelInfo:
+    # 初回はインデックス構築・量子化評価を伴うため CPU 実行器で呼ぶ
+    snap = current_snapshot()
+    index = get_similarity_index(snap)
+    data_source = "adm_game.parquet" if Path("data/adm_game.parquet").exists() else "embeddings.npz"
+    return ModelInfo(
+        x_dim=index.dim,
+        n_items=index.n_items,
+        topk=settings.TOPK,
+        topk_max=settings.TOPK_MAX,
+        tau=settings.TAU,
+        data_source=data_source,
+        index_type=index_type(index),
+        index_build_ms=index.build_seconds * 1000.0,
+        index_memory_bytes=index.nbytes,
+        embedding_cache=(cache.stats() if (cache := get_embedding_cache()) is not None else None),
+        storage=index.storage,
+        quantization=quantization_report(snapshot=snap),
+        dataset_version=snap.version,
+        dataset=snap.info(),
+    )
 
 @router.get("/budget/model_info", response_model=ModelInfo)
-def budget_model_info():
+async def budget_model_info():
     try:
-        data = load_budget_data()
-        x_dim = int(data.X1.shape[1])
-        n_items = int(data.X1.shape[0])
-        data_source = "adm_game.parquet" if Path("data/adm_game.parquet").exists() else "embeddings.npz"
-        from app.core.config import settings
-        return ModelInfo(x_dim=x_dim, n_items=n_items, topk=settings.TOPK, tau=settings.TAU, data_source=data_source)
+        return await run_cpu(_model_info)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"failed to load model info: {e}")
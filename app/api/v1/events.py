@@ -1,7 +1,8 @@
 # app/api/v1/events.py
 from fastapi import APIRouter, HTTPException, Query
-from app.api.v1.state import _SESSIONS  # MVP: stateが持つKVSを使い回す
-from app.services.events_catalog import get_event_meta, get_all_event_ids
+from app.services.concurrency import mutate_session, run_cpu
+from app.services.events_catalog import get_event_meta, get_event_meta_by_name, get_all_event_ids, search_events_by_name
+from app.utils.fast_json import JSONBytesResponse
 from pydantic import BaseModel, Field, ConfigDict
 import math
 
@@ -16,62 +17,56 @@ def _safe_num(v):
     except Exception:
         return v
 
-def _clean_meta(d: dict) -> dict:
-    out = {}
-    for k, v in d.items():
-        if isinstance(v, (int, float)):
-            out[k] = _safe_num(v)
-        elif isinstance(v, str) and v.lower() == 'nan':
-            out[k] = None
-        else:
-            out[k] = v
+# EventMetaResponse のフィールド（カタログ側で NaN/"nan" は None に正規化済み）
+_META_RESPONSE_FIELDS = ("予算事業ID", "事業名", "事業の概要", "現状・課題", "当初予算", "歳出予算現額")
+_META_FLOAT_FIELDS = ("当初予算", "歳出予算現額")
+
+def _meta_payload(meta: dict) -> dict:
+    """EventMetaResponse と同じ形の dict（モデル検証を通さずにそのまま JSON 化する）。"""
+    out = {k: meta.get(k) for k in _META_RESPONSE_FIELDS}
+    for k in _META_FLOAT_FIELDS:
+        if out[k] is not None:
+            out[k] = _safe_num(out[k])
     return out
 
-@router.get("/next")
-def next_event(session_id: str = Query(..., description="start()で得たUUID")):
+@router.get("/next", response_class=JSONBytesResponse)
+async def next_event(session_id: str = Query(..., description="start()で得たUUID")):
     """
     当年の未提示イベントから1件取り出して返す。
     - 予定キュー(schedule[year])の先頭をpop
     - 残件数を返却
     """
-    session = _SESSIONS.get(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="session not found")
-
-    year = session["year"]
-    schedule = session["schedule"].get(year, [])
-    if not schedule:
-        # 予定が空：年度のイベントを出し切った
-        # クライアントは /v1/state/next_year を呼んで遷移する想定
-        raise HTTPException(status_code=409, detail="no remaining events in this year")
-
-    event_id = schedule.pop(0)  # 先頭を取り出す（重複防止）
-    remaining = len(schedule)
-    # 現在の月（1始まり）: 取り出し後の残件数から算出
-    events_per_year = session.get("events_per_year", 12)
-    month_in_year = int(events_per_year - remaining)
-
-    # メタ情報の付与（selected_game.csv 由来）
+    # 取り出しは read-modify-write を原子的に（同時呼び出しで同じイベントを二重に返さない）
+    async with mutate_session(session_id) as session:
+        if not session:
+            raise HTTPException(status_code=404, detail="session not found")
+
+        year = session["year"]
+        schedule = session["schedule"].get(year, [])
+        if not schedule:
+            # 予定が空：年度のイベントを出し切った
+            # クライアントは /v1/state/next_year を呼んで遷移する想定
+            raise HTTPException(status_code=409, detail="no remaining events in this year")
+
+        event_id = schedule.pop(0)  # 先頭を取り出す（重複防止）
+        remaining = len(schedule)
+        # 現在の月（1始まり）: 取り出し後の残件数から算出
+        events_per_year = session.get("events_per_year", 12)
+        month_in_year = int(events_per_year - remaining)
+
+    # メタ情報の付与（selected_game.csv 由来、NaN/Inf はカタログ読み込み時に None 化済み）
     try:
-        meta = get_event_meta(event_id)
+        meta = await run_cpu(get_event_meta, event_id)
     except Exception:
         meta = {"予算事業ID": event_id}
 
-    # JSON安全化（NaN/Inf→None）
-    try:
-        from math import isfinite
-        from app.utils.json_safe import json_safe
-        meta = json_safe(meta)
-    except Exception:
-        pass
-
-    return {
+    return JSONBytesResponse({
         "year": year,
         "予算事業ID": event_id,
         "month_in_year": month_in_year,
         "remaining_in_year": remaining,
         "meta": meta,
-    }
+    })
 
 
 # 任意のIDからメタを取得する簡易API
@@ -87,62 +82,65 @@ class EventMetaResponse(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
 
 
-@router.get("/meta", response_model=EventMetaResponse)
-def event_meta(budget_id: str = Query(..., description="selected_game.csv の 予算事業ID")):
+@router.get("/meta", response_model=EventMetaResponse, response_class=JSONBytesResponse)
+async def event_meta(budget_id: str = Query(..., description="selected_game.csv の 予算事業ID")):
     try:
-        return _clean_meta(get_event_meta(budget_id))
+        return JSONBytesResponse(_meta_payload(await run_cpu(get_event_meta, budget_id)))
     except KeyError:
         raise HTTPException(status_code=404, detail="budget_id not found")
 
 
-@router.get("/overview", response_model=EventMetaResponse)
-def event_overview():
+@router.get("/overview", response_model=EventMetaResponse, response_class=JSONBytesResponse)
+async def event_overview():
     """Return the default overview item picked from selected_game.csv.
     Currently selects the first row's 予算事業ID.
     """
-    ids = get_all_event_ids()
+    ids = await run_cpu(get_all_event_ids)
     if not ids:
         raise HTTPException(status_code=404, detail="no events available")
     try:
-        return _clean_meta(get_event_meta(str(ids[0])))
+        return JSONBytesResponse(_meta_payload(await run_cpu(get_event_meta, str(ids[0]))))
     except KeyError:
         raise HTTPException(status_code=404, detail="default event not found")
 
 
-@router.get("/ids", response_model=list[str])
-def event_ids():
+@router.get("/ids", response_model=list[str], response_class=JSONBytesResponse)
+async def event_ids():
     """Return all available event ids from selected_game.csv as strings."""
-    ids = [str(i) for i in get_all_event_ids()]
+    ids = list(await run_cpu(get_all_event_ids))
     if not ids:
         raise HTTPException(status_code=404, detail="no events available")
-    return ids
+    return JSONBytesResponse(ids)
 
 
-@router.get("/meta_by_name", response_model=EventMetaResponse)
-def event_meta_by_name(name: str = Query(..., description="事業名 完全一致/部分一致")):
-    """Lookup event metadata by name (exact or substring match). Returns the first hit.
+@router.get("/meta_by_name", response_model=EventMetaResponse, response_class=JSONBytesResponse)
+async def event_meta_by_name(name: str = Query(..., description="事業名 完全一致/部分一致")):
+    """Lookup event metadata by name (exact or substring match). Returns the first hit in catalog order.
     This is a fallback path when 予算事業ID is unavailable in prediction results.
+    Ranked / normalized matching is /search_by_name.
     """
-    from app.services.events_catalog import load_events_df
-    df = load_events_df()
-    candidates = df
-    if "事業名" in df.columns:
-        # Try exact first
-        exact = df[df["事業名"] == name]
-        if len(exact) == 0:
-            # Fallback to contains
-            contains = df[df["事業名"].astype(str).str.contains(str(name), na=False)]
-            candidates = contains
-        else:
-            candidates = exact
-    if len(candidates) == 0:
+    try:
+        return JSONBytesResponse(_meta_payload(await run_cpu(get_event_meta_by_name, name)))
+    except KeyError:
         raise HTTPException(status_code=404, detail="name not found")
-    row = candidates.iloc[0]
-    return _clean_meta({
-        "予算事業ID": str(row.get("予算事業ID", "")),
-        "事業名": row.get("事業名", None),
-        "事業の概要": row.get("事業の概要", None),
-        "現状・課題": row.get("現状・課題", None),
-        "当初予算": row.get("当初予算", None),
-        "歳出予算現額": row.get("歳出予算現額", None),
-    })
+
+
+class NameSearchHit(BaseModel):
+    yosan_jigyo_id: str = Field(..., validation_alias="予算事業ID", serialization_alias="予算事業ID")
+    jigyo_mei: str | None = Field(None, validation_alias="事業名", serialization_alias="事業名")
+    match: str  # exact / prefix / substring / fuzzy
+    score: float
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+@router.get("/search_by_name", response_model=list[NameSearchHit], response_class=JSONBytesResponse)
+async def event_search_by_name(
+    name: str = Query(..., description="事業名（前方一致/部分一致/あいまい一致）"),
+    limit: int = Query(10, ge=1, le=100),
+    fuzzy: bool = Query(True, description="文字bigramの重なりによるあいまい一致を含める"),
+):
+    """Ranked 事業名 search over the catalog's character n-gram index."""
+    hits = await run_cpu(search_events_by_name, name, limit=limit, fuzzy=fuzzy)
+    return JSONBytesResponse([{"予算事業ID": h["予算事業ID"], "事業名": h["事業名"],
+                               "match": h["match"], "score": h["score"]} for h in hits])
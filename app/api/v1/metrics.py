@@ -3,11 +3,9 @@ from pydantic import BaseModel, Field
 from typing import List, Optional
 import math
 
-from app.api.v1.state import _SESSIONS
-from app.services.events_catalog import get_event_meta
-from app.services.datastore import load_budget_data
-from app.services.embedding import embed_text_to_vec
-from app.services.predictor import predict_initial_budget
+from app.services.session_store import get_session_store
+from app.services.concurrency import run_cpu, run_session_io
+from app.services.events_catalog import get_event_meta, load_ai_references
 
 
 router = APIRouter()
@@ -31,9 +29,20 @@ class YearMetrics(BaseModel):
     months: List[MonthMetric]
 
 
+def _event_metas(event_ids: list[str]) -> dict[str, dict]:
+    """イベントID -> メタ（カタログにないIDは含めない）。"""
+    out: dict[str, dict] = {}
+    for eid in event_ids:
+        try:
+            out[str(eid)] = get_event_meta(str(eid))
+        except Exception:
+            pass
+    return out
+
+
 @router.get("/months", response_model=YearMetrics)
-def months_metrics(session_id: str = Query(..., description="start()で得たUUID")):
-    session = _SESSIONS.get(session_id)
+async def months_metrics(session_id: str = Query(..., description="start()で得たUUID")):
+    session = await run_session_io(get_session_store().get, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="session not found")
 
@@ -41,16 +50,17 @@ def months_metrics(session_id: str = Query(..., description="start()で得たUUI
     events_per_year = int(session.get("events_per_year", 12))
     timeline = session.get("timeline", {}).get(year, [])
 
-    # 予測のための埋め込み次元を一度だけ取得
+    # AI参考値は事前計算済みテーブルから引く（未計算分はここで一括推定）。
+    # 事前ロードなしの初回は表の構築（埋め込み約60件）を伴うので CPU 実行器で
     try:
-        data = load_budget_data()
-        x_dim = int(data.X1.shape[1])
+        ai_refs = await run_cpu(load_ai_references)
+        await run_cpu(ai_refs.ensure, timeline)
     except Exception:
-        data = None
-        x_dim = None
+        ai_refs = None
 
     months: list[MonthMetric] = []
     max_len = min(events_per_year, len(timeline)) if timeline else events_per_year
+    metas = await run_cpu(_event_metas, timeline[:max_len])
 
     for i in range(max_len):
         month_no = i + 1
@@ -65,7 +75,7 @@ def months_metrics(session_id: str = Query(..., description="start()で得たUUI
 
         if eid:
             try:
-                meta = get_event_meta(eid)
+                meta = metas[eid]
                 name = meta.get("事業名")
                 v = meta.get("当初予算")
                 if v is not None:
@@ -86,19 +96,9 @@ def months_metrics(session_id: str = Query(..., description="start()で得たUUI
                         allocated = af
                     except Exception:
                         pass
-                # AI参考値（課題 or 概要を入力として推定）
-                if x_dim is not None and data is not None:
-                    text = meta.get("現状・課題") or meta.get("事業の概要") or None
-                    if text and isinstance(text, str) and text.strip():
-                        try:
-                            q = embed_text_to_vec(text, dim=x_dim, normalize=True)
-                            pr = predict_initial_budget(q)
-                            if pr and pr.get("can_estimate"):
-                                ev = float(pr.get("estimate_initial"))
-                                if math.isfinite(ev):
-                                    ai_ref = ev
-                        except Exception:
-                            ai_ref = None
+                # AI参考値（課題 or 概要を入力とした推定; 事前計算済み）
+                if ai_refs is not None:
+                    ai_ref = ai_refs.get(eid)
             except Exception:
                 pass
 
@@ -4,11 +4,12 @@ from fastapi import APIRouter, HTTPException, Body
 from pydantic import BaseModel
 from app.core.config import settings
 from typing import List, Optional
-from app.services.events_catalog import get_all_event_ids, get_event_meta
+from app.services.events_catalog import get_all_event_ids, get_event_meta, has_event_id
+from app.services.session_store import get_session_store
+from app.services.concurrency import mutate_session, run_cpu, run_session_io
 
 
 router = APIRouter()
-_SESSIONS: dict[str, dict] = {}
 
 class StartRequest(BaseModel):
     # 任意: 初年度に提示するイベントIDを指定（最大 events_per_year 件）
@@ -25,26 +26,42 @@ class StartResponse(BaseModel):
     # 選定イベントの簡易メタ（事業名・現状・課題）
     events_meta: list[dict] | None = None
 
+def _first_year_events(event_ids: list[str] | None, events_per_year: int) -> tuple[list[str], list[dict]]:
+    """初年度のイベントIDと、その事業名・現状・課題。"""
+    if event_ids:
+        # 指定されたIDのうち存在するもののみ採用、先頭から events_per_year 件まで
+        filtered = [str(e) for e in event_ids if has_event_id(str(e))]
+        scheduled_ids = filtered[:events_per_year]
+    else:
+        scheduled_ids = list(get_all_event_ids()[:events_per_year])
+
+    # 事業名と現状・課題を抽出
+    metas: list[dict] = []
+    for eid in scheduled_ids:
+        try:
+            meta = get_event_meta(eid)
+            metas.append({
+                "予算事業ID": str(eid),
+                "事業名": meta.get("事業名"),
+                "現状・課題": meta.get("現状・課題"),
+            })
+        except Exception:
+            metas.append({"予算事業ID": str(eid)})
+    return scheduled_ids, metas
+
 @router.post("/start", response_model=StartResponse)
-def start(req: StartRequest | None = Body(default=None)):
+async def start(req: StartRequest | None = Body(default=None)):
     """サーバ側で決めた設定（5年・12件/年・1500億/年）でセッションを開始。"""
     years = settings.GAME_YEARS
     events_per_year = settings.GAME_EVENTS_PER_YEAR
     budget_per_year = settings.GAME_BUDGET_PER_YEAR
 
-    # 実データからイベントIDを採番（リクエストで指定があれば優先）
-    all_ids = get_all_event_ids()
-    if req and req.event_ids:
-        # 指定されたIDのうち存在するもののみ採用、先頭から events_per_year 件まで
-        id_set = set(map(str, all_ids))
-        filtered = [str(e) for e in req.event_ids if str(e) in id_set]
-        scheduled_ids = filtered[:events_per_year]
-    else:
-        scheduled_ids = [str(eid) for eid in all_ids[:events_per_year]]
+    # 実データからイベントIDを採番（カタログ読み込みはイベントループを塞がないよう CPU 実行器で）
+    scheduled_ids, metas = await run_cpu(_first_year_events, req.event_ids if req else None, events_per_year)
     scheduled = {1: scheduled_ids}
 
     session_id = str(uuid.uuid4())
-    _SESSIONS[session_id] = {
+    await run_session_io(get_session_store().put, session_id, {
         "year": 1,
         "years_total": years,
         "year_budget_total": budget_per_year,
@@ -57,20 +74,7 @@ def start(req: StartRequest | None = Body(default=None)):
         "alloc_log": [],                              # [{year, month, event_id, amount, ts}]
         "predictions": {},
         "scores": {},
-    }
-
-    # 事業名と現状・課題を抽出
-    metas: list[dict] = []
-    for eid in scheduled_ids:
-        try:
-            meta = get_event_meta(eid)
-            metas.append({
-                "予算事業ID": str(eid),
-                "事業名": meta.get("事業名"),
-                "現状・課題": meta.get("現状・課題"),
-            })
-        except Exception:
-            metas.append({"予算事業ID": str(eid)})
+    })
 
     return StartResponse(
         session_id=session_id,
@@ -91,41 +95,42 @@ class NextYearResponse(BaseModel):
     year_budget_remaining: float
 
 @router.post("/next_year", response_model=NextYearResponse)
-def next_year(session_id: str = Body(..., embed=True)):
-    session = _SESSIONS.get(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="session not found")
-
-    year = session["year"]
-    # まだ残っていれば進めない
-    if session["schedule"].get(year, []):
-        raise HTTPException(status_code=409, detail="events remain in this year")
-
-    # 最終年度は進めない
-    if year >= session["years_total"]:
-        raise HTTPException(status_code=409, detail="already at final year")
-
-    # 年+1、予算リセット、次年度の events_per_year 件を補充（selected_game.csv の順にスライス）
-    next_year = year + 1
-    session["year"] = next_year
-    session["year_budget_remaining"] = session["year_budget_total"]
-    events_per_year = session["events_per_year"]
-    all_ids = get_all_event_ids()
-    start_idx = (next_year - 1) * events_per_year
-    end_idx = start_idx + events_per_year
-    next_ids = [str(eid) for eid in all_ids[start_idx:end_idx]]
-    if not next_ids:
-        # データが尽きた場合、空のままにしておきクライアント側で処理
-        next_ids = []
-    session["schedule"][next_year] = next_ids
-    # タイムライン（固定順序）にも保存
-    session.setdefault("timeline", {})[next_year] = list(next_ids)
-
-    return NextYearResponse(
-        moved_to_year=next_year,
-        year_budget_total=session["year_budget_total"],
-        year_budget_remaining=session["year_budget_remaining"],
-    )
+async def next_year(session_id: str = Body(..., embed=True)):
+    # mutate の中では await できないので、カタログは先に引いておく
+    all_ids = await run_cpu(get_all_event_ids)
+    async with mutate_session(session_id) as session:
+        if not session:
+            raise HTTPException(status_code=404, detail="session not found")
+
+        year = session["year"]
+        # まだ残っていれば進めない
+        if session["schedule"].get(year, []):
+            raise HTTPException(status_code=409, detail="events remain in this year")
+
+        # 最終年度は進めない
+        if year >= session["years_total"]:
+            raise HTTPException(status_code=409, detail="already at final year")
+
+        # 年+1、予算リセット、次年度の events_per_year 件を補充（selected_game.csv の順にスライス）
+        next_year = year + 1
+        session["year"] = next_year
+        session["year_budget_remaining"] = session["year_budget_total"]
+        events_per_year = session["events_per_year"]
+        start_idx = (next_year - 1) * events_per_year
+        end_idx = start_idx + events_per_year
+        next_ids = list(all_ids[start_idx:end_idx])
+        if not next_ids:
+            # データが尽きた場合、空のままにしておきクライアント側で処理
+            next_ids = []
+        session["schedule"][next_year] = next_ids
+        # タイムライン（固定順序）にも保存
+        session.setdefault("timeline", {})[next_year] = list(next_ids)
+
+        return NextYearResponse(
+            moved_to_year=next_year,
+            year_budget_total=session["year_budget_total"],
+            year_budget_remaining=session["year_budget_remaining"],
+        )
 
 
 class MeResponse(BaseModel):
@@ -138,8 +143,8 @@ class MeResponse(BaseModel):
     remaining_in_year: int
 
 @router.get("/me", response_model=MeResponse)
-def me(session_id: str):
-    session = _SESSIONS.get(session_id)
+async def me(session_id: str):
+    session = await run_session_io(get_session_store().get, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="session not found")
     year = session["year"]
@@ -153,3 +158,16 @@ def me(session_id: str):
         events_per_year=session["events_per_year"],
         remaining_in_year=remaining,
     )
+
+
+class SessionStatsResponse(BaseModel):
+    active: int
+    evicted: int
+    expired: int
+    max_sessions: int
+    ttl_seconds: float
+
+@router.get("/stats", response_model=SessionStatsResponse)
+async def session_stats():
+    """セッションストアの件数（有効・LRU退避・期限切れ）。"""
+    return SessionStatsResponse(**await run_session_io(get_session_store().stats))
@@ -11,17 +11,61 @@ class Settings(BaseSettings):
     GAME_BUDGET_PER_YEAR: int = 150_000_000_000  # 1,500億円
     GAME_CURRENCY: str = "JPY"  # 返却時の明示に使える
 
+    # ★ セッション保持
+    SESSION_BACKEND: str = "memory"  # "memory"（プロセス内）or "sqlite"（WAL, 複数ワーカーで共有）
+    SESSION_SQLITE_PATH: str = "data/sessions.sqlite3"
+    SESSION_TTL_SECONDS: int = 2 * 60 * 60  # 最終アクセスからの有効期間（0で無期限）
+    SESSION_MAX: int = 10_000               # 上限を超えたら最も古いセッションから退避（LRU）
+    SESSION_SWEEP_INTERVAL: int = 60        # 期限切れ掃除の間隔（秒）
+    SESSION_IO_WORKERS: int = 8             # sqlite セッション読み書き用スレッド数（ロック待ちでイベントループを止めない）
+
+    # ★ リクエスト処理
+    CPU_EXECUTOR_WORKERS: int = 0  # 埋め込み・スコア計算用スレッド数（0 なら CPU 数）
+    PRELOAD_ON_STARTUP: bool = True  # 起動時にデータ・カタログ・インデックスを読み込む（False なら初回リクエスト時）
+    PRELOAD_WARMUP: bool = True      # 読み込み後にウォームアップ推定を 1 回実行
+    METRICS_ENABLED: bool = True     # 段階別レイテンシ・リクエスト数を集計し /metrics で公開（False で計測しない）
+
+    # ★ 一括推定（/v1/budget/predict_bulk）
+    BULK_CHUNK_ROWS: int = 256         # 1 回に埋め込み・推定する行数（メモリはこれに比例）
+    BULK_MAX_UPLOAD_MB: int = 1024     # アップロードの上限（超えたら 413）
+    BULK_SPOOL_DIR: str | None = None  # アップロードの一時置き場（未設定なら OS の一時ディレクトリ）
+
+    # ★ 管理用エンドポイント（/v1/admin/*）
+    ADMIN_TOKEN: str | None = None   # X-Admin-Token ヘッダで照合。未設定なら管理 API は 404（無効）
+    PROFILER_ENABLED: bool = False   # /v1/admin/profile（サンプリングプロファイラ）を有効化
+    PROFILER_MAX_SECONDS: float = 60.0  # 1 回の計測時間の上限
+
     # ★ 予算推定のハイパーパラメータ
     TOPK: int = 5
+    TOPK_MAX: int = 100  # リクエストごとの topk 指定の上限
     TAU: float = 0.08
     ALPHA: float = 0.5
     BETA: float = 0.5
+    INDEX_TYPE: str = "exact"  # "exact"（総当たり）or "ivf"（近似: k-means 転置インデックス）
+    IVF_NLIST: int = 0         # クラスタ数（0 なら 4*sqrt(N) を自動設定）
+    IVF_NPROBE: int = 8        # 探索するクラスタ数（大きいほど高再現率・低速）
+    IVF_TRAIN_ITERS: int = 10
+    EMBEDDING_STORAGE: str = "float32"  # コーパス保持形式: "float32" / "float16" / "int8"（行ごとスケール）
+
+    # ★ データ設定
+    DATA_CACHE_DIR: str = "data/.cache"  # adm_game.parquet の埋め込みサイドカー(.npy)置き場
+    SHARED_CORPUS: bool = False  # 正規化済みコーパスと目的変数を共有セグメントに置き、全ワーカーで読み取り専用に共有
+    SHARED_CORPUS_DIR: str = "/dev/shm/policy-game"  # セグメント置き場（親が無ければ DATA_CACHE_DIR/shared）
+    SHARED_CORPUS_CLEANUP_ON_EXIT: bool = True  # 最後に抜けたワーカーがセグメントを削除
+    DATASET_APPEND_PATH: str | None = "data/appended_rows.parquet"  # 追記 API の行の保存先（空ならメモリのみ。再読み込み・再起動で消える）
 
     # ★ 埋め込み設定
     EMBEDDING_PROVIDER: str = "dummy"  # "openai" or "dummy"
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-large"
     OPENAI_API_KEY: str | None = None
     OPENAI_BASE_URL: str | None = None  # e.g. Azure/OpenAI-compatible endpoint
+    OPENAI_BATCH_SIZE: int = 128       # 1リクエストあたりの入力件数
+    OPENAI_MAX_CONCURRENCY: int = 8    # 同時リクエスト数（= 接続プール上限）
+    OPENAI_TIMEOUT: float = 30.0       # 秒
+    OPENAI_MAX_RETRIES: int = 3
+    EMBEDDING_TOKEN_CACHE_SIZE: int = 4096  # dummy埋め込みのトークンベクトル保持数（0で無効）
+    EMBEDDING_CACHE_DIR: str | None = "data/.embedding_cache"  # 永続埋め込みキャッシュ（空で無効）
+    EMBEDDING_CACHE_MAX_ITEMS: int = 50_000  # (provider, model, dim) ごとの最大保持件数（LRU）
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -1,28 +1,77 @@
 # app/main.py
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi.responses import RedirectResponse, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.state import router as state_router
 from app.api.v1.events import router as events_router
 from app.api.v1.budget import router as budget_router
 from app.core.config import settings
 from app.api.v1.metrics import router as metrics_router
+from app.api.v1.admin import router as admin_router
+from app.services.concurrency import get_cpu_executor, get_session_executor, run_cpu, run_session_io
+from app.services.datastore import peek_snapshot
+from app.services.session_store import get_session_store
+from app.services.shared_corpus import release_all as release_shared_corpus
+from app.services.warmup import get_readiness, run_preload, skip_preload
+from app.utils.telemetry import RequestMetricsMiddleware, render_prometheus
 from fastapi.staticfiles import StaticFiles
 
-app = FastAPI(title="Policy Game API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 起動直後の初回リクエストが parquet 読み込みを待たないよう、バックグラウンドで事前ロード
+    # （完了までは /ready が 503 を返すので、LB は /ready を見て振り分ける）
+    if settings.PRELOAD_ON_STARTUP:
+        app.state.preload_task = asyncio.create_task(run_cpu(run_preload))
+    else:
+        skip_preload()
+    yield
+    get_session_store().stop_sweeper()
+    release_shared_corpus()
+    get_cpu_executor().shutdown(wait=False, cancel_futures=True)
+    get_cpu_executor.cache_clear()
+    get_session_executor().shutdown(wait=False, cancel_futures=True)
+    get_session_executor.cache_clear()
+
+
+app = FastAPI(title="Policy Game API", version="0.1.0", lifespan=lifespan)
 
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
 
+# Readiness: 事前ロードの完了状況と段階ごとの所要時間（未完了なら 503）
+@app.get("/ready")
+async def ready():
+    state = get_readiness().snapshot()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+# Prometheus 形式の計測値（段階別レイテンシ・ルート別リクエスト数）。集計はスクレイプ時のみ
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    extra = {"ready": int(get_readiness().snapshot()["ready"])}
+    if (snap := peek_snapshot()) is not None:
+        extra["dataset_version"] = snap.version
+        extra["dataset_rows"] = snap.n_rows
+    try:
+        extra["sessions_active"] = (await run_session_io(get_session_store().stats))["active"]
+    except Exception:
+        pass
+    return PlainTextResponse(render_prometheus(extra), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Redirect root to UI
 @app.get("/")
-def root_redirect():
+async def root_redirect():
     return RedirectResponse(url="/ui/")
 
 # Avoid noisy 404 for browsers requesting a favicon
 @app.get("/favicon.ico")
-def favicon():
+async def favicon():
     return Response(status_code=204)
 
 # /v1/state/... のルート群を登録
@@ -30,6 +79,7 @@ app.include_router(state_router, prefix="/v1/state", tags=["state"])
 app.include_router(events_router, prefix="/v1/events", tags=["events"])
 app.include_router(budget_router, prefix="/v1", tags=["budget"])
 app.include_router(metrics_router, prefix="/v1/metrics", tags=["metrics"])
+app.include_router(admin_router, prefix="/v1/admin", tags=["admin"])
 
 # CORS
 _origins = [o.strip() for o in settings.CORS_ORIGINS.split(",") if o.strip()]
@@ -40,6 +90,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# ルート別リクエスト数・レイテンシ（最外周で計測）
+app.add_middleware(RequestMetricsMiddleware)
 
 # Static UI (simple test frontend)
 app.mount("/ui", StaticFiles(directory="web", html=True), name="ui")
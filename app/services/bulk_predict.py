@@ -0,0 +1,137 @@
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from app.services.dataset import normalize_ids
+from app.services.datastore import DatasetSnapshot, current_snapshot
+from app.services.embedding import embed_texts_to_mat
+from app.services.predictor import predict_initial_budget_batch
+from app.utils.fast_json import dumps
+
+FORMATS = ("csv", "parquet")
+_PARQUET_MAGIC = b"PAR1"
+
+
+def sniff_format(path: Path, content_type: str | None = None) -> str:
+    """csv / parquet from the Content-Type, else from the file's magic bytes."""
+    ct = (content_type or "").lower()
+    if "parquet" in ct:
+        return "parquet"
+    if "csv" in ct:
+        return "csv"
+    with open(path, "rb") as f:
+        return "parquet" if f.read(4) == _PARQUET_MAGIC else "csv"
+
+
+@dataclass
+class BulkSource:
+    """A spooled upload (or local file) read back in bounded chunks.
+
+    Only the text / ID columns are read. CSV uses ``pandas.read_csv(chunksize=)``
+    and parquet ``ParquetFile.iter_batches``, so memory follows ``chunk_rows``,
+    not the file size.
+    """
+    path: Path
+    fmt: str
+    text_column: str
+    id_column: str | None
+    chunk_rows: int = 256
+    encoding: str = "utf-8-sig"
+
+    def columns(self) -> list[str]:
+        if self.fmt == "parquet":
+            return list(pq.ParquetFile(self.path).schema_arrow.names)
+        return list(pd.read_csv(self.path, nrows=0, encoding=self.encoding).columns)
+
+    def validate(self) -> None:
+        """Raise ValueError (before any output is streamed) if a requested column is missing."""
+        if self.fmt not in FORMATS:
+            raise ValueError(f"unknown format: {self.fmt} (expected one of {FORMATS})")
+        cols = self.columns()
+        missing = [c for c in (self.text_column, self.id_column) if c and c not in cols]
+        if missing:
+            raise ValueError(f"column(s) not found: {missing} (available: {cols[:20]})")
+
+    def frames(self) -> Iterator[pd.DataFrame]:
+        usecols = [c for c in (self.text_column, self.id_column) if c]
+        if self.fmt == "parquet":
+            pf = pq.ParquetFile(self.path)
+            for batch in pf.iter_batches(batch_size=self.chunk_rows, columns=usecols):
+                yield batch.to_pandas()
+            return
+        # 全列を文字列として読む（ID の先頭ゼロ・型推定のぶれを避ける）
+        yield from pd.read_csv(self.path, usecols=usecols, dtype=str, keep_default_na=False,
+                               chunksize=self.chunk_rows, encoding=self.encoding)
+
+
+def _line(obj: dict[str, Any]) -> bytes:
+    return dumps(obj) + b"\n"
+
+
+def predict_frame(df: pd.DataFrame, text_column: str, id_column: str | None, start_row: int,
+                  topk: int | None = None, evidence: bool = False,
+                  snapshot: DatasetSnapshot | None = None) -> tuple[bytes, int]:
+    """Embed and score one chunk in a single batch; returns (NDJSON bytes, number ok).
+
+    Each line is ``{"row", "id", "ok", ...}`` with the same fields as
+    /v1/budget/predict (``topk`` evidence only with ``evidence=True``) or ``error``.
+    """
+    texts = ["" if v is None or (isinstance(v, float) and np.isnan(v)) else str(v)
+             for v in df[text_column].tolist()]
+    if id_column:
+        # 予算事業ID と同じ正規化（"123.0" / 123.0 → "123"）。空・欠損は None
+        ids = [None if v in ("", "nan", "None") else v for v in normalize_ids(df[id_column]).tolist()]
+    else:
+        ids = [None] * len(texts)
+    snap = snapshot or current_snapshot()
+    Q, errors = embed_texts_to_mat(texts, dim=int(snap.data.X1.shape[1]), normalize=True)
+    ok_idx = [i for i, err in enumerate(errors) if err is None]
+    preds = dict(zip(ok_idx, predict_initial_budget_batch(Q[ok_idx], topk=topk, snapshot=snap))) if ok_idx else {}
+
+    out = bytearray()
+    n_ok = 0
+    for i in range(len(texts)):
+        row: dict[str, Any] = {"row": start_row + i, "id": ids[i]}
+        err = errors[i]
+        res = preds.get(i)
+        if err is None and res is not None and not res["can_estimate"]:
+            err = res.get("reason") or "cannot estimate"
+        if err is not None:
+            row.update(ok=False, error=err)
+        else:
+            n_ok += 1
+            row["ok"] = True
+            row.update({k: v for k, v in res.items() if k not in ("can_estimate", "reason", "topk")})
+            if evidence:
+                row["topk"] = res["topk"]
+        out += _line(row)
+    return bytes(out), n_ok
+
+
+def iter_ndjson(source: BulkSource, topk: int | None = None, evidence: bool = False) -> Iterator[bytes]:
+    """NDJSON bytes per chunk, then one ``{"summary": ...}`` line.
+
+    A failure while reading or scoring emits ``{"error": ...}`` and stops
+    (rows already streamed stay valid). The whole file is scored against the
+    dataset snapshot active when the stream starts.
+    """
+    t0 = time.perf_counter()
+    rows = ok = 0
+    snap = current_snapshot()
+    try:
+        for df in source.frames():
+            if df.empty:
+                continue
+            chunk, n_ok = predict_frame(df, source.text_column, source.id_column, rows, topk, evidence, snap)
+            rows += len(df)
+            ok += n_ok
+            yield chunk
+    except Exception as e:
+        yield _line({"error": f"{type(e).__name__}: {e}", "row": rows})
+    yield _line({"summary": {"rows": rows, "ok": ok, "failed": rows - ok, "dataset_version": snap.version,
+                             "seconds": round(time.perf_counter() - t0, 3)}})
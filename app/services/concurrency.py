@@ -0,0 +1,131 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache, partial
+from typing import Any, AsyncIterator, Callable, TypeVar
+
+from app.core.config import settings
+from app.services.session_store import get_session_store
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=1)
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """Dedicated pool for CPU-bound work (embedding, scoring, index builds).
+
+    Kept separate from Starlette's threadpool so long predictions do not starve
+    cheap handlers; NumPy releases the GIL in the heavy kernels.
+    """
+    workers = settings.CPU_EXECUTOR_WORKERS or (os.cpu_count() or 1)
+    return ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="cpu")
+
+
+async def run_cpu(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run ``fn(*args, **kwargs)`` on the CPU executor and await the result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), partial(fn, *args, **kwargs))
+
+
+@lru_cache(maxsize=1)
+def get_session_executor() -> ThreadPoolExecutor:
+    """Threads for blocking session-store I/O (SQLite lock waits).
+
+    Separate from the CPU executor: a worker waiting on another process's
+    write lock must not hold up scoring, and scoring must not delay sessions.
+    """
+    return ThreadPoolExecutor(max_workers=max(1, int(settings.SESSION_IO_WORKERS)), thread_name_prefix="session-io")
+
+
+async def run_session_io(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Call a session-store method without blocking the event loop.
+
+    Backends that only touch process memory are called directly; blocking
+    ones (SQLite) run on the session I/O executor.
+    """
+    if not get_session_store().blocking:
+        return fn(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_session_executor(), partial(fn, *args, **kwargs))
+
+
+class SessionLocks:
+    """One asyncio.Lock per session id, created on demand.
+
+    Requests for the same session are serialized; different sessions never
+    wait on each other. An entry is dropped when its last holder/waiter leaves,
+    so the table only holds sessions with requests in flight.
+    """
+
+    def __init__(self):
+        self._locks: dict[str, tuple[asyncio.Lock, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[None]:
+        lock, users = self._locks.get(session_id, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[session_id] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[session_id]
+            if users <= 1:
+                del self._locks[session_id]
+            else:
+                self._locks[session_id] = (lock, users - 1)
+
+
+@lru_cache(maxsize=1)
+def get_session_locks() -> SessionLocks:
+    return SessionLocks()
+
+
+def session_lock(session_id: str):
+    """``async with session_lock(sid):`` — serialize requests for one session."""
+    return get_session_locks().hold(session_id)
+
+
+@asynccontextmanager
+async def mutate_session(session_id: str) -> AsyncIterator[dict[str, Any] | None]:
+    """Per-session lock + ``SessionStore.mutate`` for async handlers.
+
+    The body must not ``await``: the memory store's RLock is held by the event
+    loop thread, so another coroutine could re-enter it. The asyncio lock is
+    what keeps concurrent requests for the same session apart. For blocking
+    backends the transaction is opened and closed on the session I/O
+    executor (``BEGIN IMMEDIATE`` may wait on other workers); only the body
+    runs on the loop.
+    """
+    async with session_lock(session_id):
+        store = get_session_store()
+        if not store.blocking:
+            with store.mutate(session_id) as session:
+                yield session
+            return
+
+        loop = asyncio.get_running_loop()
+        executor = get_session_executor()
+        cm = store.mutate(session_id)
+        entered = loop.run_in_executor(executor, cm.__enter__)
+        try:
+            session = await asyncio.shield(entered)
+        except asyncio.CancelledError:
+            # 取り消されてもスレッド側の BEGIN は進むので、開いたトランザクションは必ず閉じる
+            def _rollback(f: asyncio.Future) -> None:
+                if not f.cancelled() and f.exception() is None:
+                    err = asyncio.CancelledError()
+                    executor.submit(cm.__exit__, type(err), err, None)
+            entered.add_done_callback(_rollback)
+            raise
+        try:
+            yield session
+        except BaseException as e:
+            await asyncio.shield(loop.run_in_executor(executor, cm.__exit__, type(e), e, e.__traceback__))
+            raise
+        await asyncio.shield(loop.run_in_executor(executor, cm.__exit__, None, None, None))
@@ -0,0 +1,122 @@
+import numpy as np
+
+STORAGE_MODES = ("float32", "float16", "int8")
+
+# 量子化モードでの逆量子化ブロック行数（一時配列は block × d の float32 に収まる）
+_SCORE_BLOCK = 8192
+
+
+def normalize_rows(X: np.ndarray) -> np.ndarray:
+    """L2-normalize rows into a new C-contiguous float32 matrix."""
+    X = np.asarray(X, dtype="float32")
+    if X.ndim != 2:
+        raise ValueError("corpus matrix must be 2D")
+    n = np.linalg.norm(X, axis=1, keepdims=True) + 1e-12
+    return np.ascontiguousarray(X / n, dtype="float32")
+
+
+class CorpusMatrix:
+    """L2-normalized corpus rows stored as float32, float16, or int8 + per-row scale.
+
+    ``scores(Q, start, stop)`` returns float32 cosine scores against rows
+    [start, stop). Quantized modes are dequantized block by block, so the
+    float32 copy of the corpus never exists at once.
+    """
+
+    def __init__(self, X_n: np.ndarray, mode: str = "float32"):
+        mode = mode.lower()
+        if mode not in STORAGE_MODES:
+            raise ValueError(f"unknown storage mode: {mode} (expected one of {STORAGE_MODES})")
+        self.mode = mode
+        self.scales: np.ndarray | None = None
+        if mode == "float32":
+            self.data = np.ascontiguousarray(X_n, dtype="float32")
+        elif mode == "float16":
+            self.data = np.ascontiguousarray(X_n, dtype="float16")
+        else:
+            amax = np.abs(X_n).max(axis=1) if X_n.shape[0] else np.zeros((0,), "float32")
+            scales = (np.maximum(amax, 1e-12) / 127.0).astype("float32")
+            codes = np.empty(X_n.shape, dtype="int8")
+            for s in range(0, X_n.shape[0], _SCORE_BLOCK):
+                blk = X_n[s:s + _SCORE_BLOCK] / scales[s:s + _SCORE_BLOCK, None]
+                codes[s:s + _SCORE_BLOCK] = np.rint(blk).astype("int8")
+            self.data = codes
+            self.scales = scales
+
+    @classmethod
+    def from_arrays(cls, data: np.ndarray, mode: str, scales: np.ndarray | None = None) -> "CorpusMatrix":
+        """Wrap already-encoded rows (e.g. a read-only shared mmap) without copying."""
+        mode = mode.lower()
+        if mode not in STORAGE_MODES:
+            raise ValueError(f"unknown storage mode: {mode} (expected one of {STORAGE_MODES})")
+        if data.dtype != np.dtype(mode) or (mode == "int8") != (scales is not None):
+            raise ValueError(f"arrays do not match storage mode {mode}")
+        self = cls.__new__(cls)
+        self.mode = mode
+        self.data = data
+        self.scales = scales
+        return self
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.data.shape
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0))
+
+    def decode(self, rows) -> np.ndarray:
+        """Rows (int / slice / index array) as float32; quantized modes are dequantized."""
+        v = np.asarray(self.data[rows], dtype="float32")
+        if self.scales is not None:
+            s = self.scales[rows]
+            v = v * (s[..., None] if v.ndim == 2 else s)
+        return v
+
+    def scores(self, Q: np.ndarray, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """(B, d) normalized queries → (B, stop - start) float32 scores."""
+        stop = self.data.shape[0] if stop is None else stop
+        if self.mode == "float32":
+            return Q @ self.data[start:stop].T
+        out = np.empty((Q.shape[0], stop - start), dtype="float32")
+        for s in range(start, stop, _SCORE_BLOCK):
+            e = min(s + _SCORE_BLOCK, stop)
+            blk = self.data[s:e].astype("float32")
+            sc = Q @ blk.T
+            if self.scales is not None:
+                sc *= self.scales[s:e]
+            out[:, s - start:e - start] = sc
+        return out
+
+
+class DecodedRows:
+    """Read-only float32 (N, d) stand-in for a quantized CorpusMatrix.
+
+    Used where only the codes are kept (quantized shared segments): indexing
+    decodes just the selected rows, so callers that only look at ``shape`` or
+    a slice never build the full float32 copy. ``np.asarray`` decodes it all.
+    """
+
+    dtype = np.dtype("float32")
+    ndim = 2
+
+    def __init__(self, corpus: CorpusMatrix):
+        self.corpus = corpus
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.corpus.shape
+
+    def __len__(self) -> int:
+        return self.corpus.shape[0]
+
+    def __getitem__(self, key) -> np.ndarray:
+        rows, rest = (key[0], key[1:]) if isinstance(key, tuple) else (key, ())
+        v = self.corpus.decode(rows)
+        if not rest:
+            return v
+        return v[(slice(None),) + rest] if v.ndim == 2 else v[rest]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        v = self.corpus.decode(slice(None))
+        return v if dtype is None else v.astype(dtype, copy=False)
@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ADM_PARQUET = Path("data") / "adm_game.parquet"
+ID_COLUMN = "予算事業ID"
+
+
+def normalize_ids(s: pd.Series) -> pd.Series:
+    """Normalize 予算事業ID values to strings (vectorized).
+
+    Integral numbers become their integer form ("123.0" / 123.0 → "123"); other
+    values are stringified, stripped, and lose a trailing ".0".
+    """
+    f = pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    integral = np.isfinite(f) & (np.abs(f) < 2**63)
+    integral[integral] = np.abs(f[integral] - np.trunc(f[integral])) < 1e-9
+    # str(nan) == "nan" を保つため object→U 配列経由で文字列化
+    out = pd.Series(s.to_numpy(dtype=object).astype(str), index=s.index, dtype=object).str.strip()
+    out = out.where(~out.str.endswith(".0"), out.str[:-2])
+    if integral.any():
+        out = out.copy()
+        out[integral] = f[integral].astype(np.int64).astype(str)
+    return out
+
+
+@dataclass(frozen=True)
+class AdmDataset:
+    """Shared handle on data/adm_game.parquet.
+
+    Consumers read only the columns they need (pyarrow projection). ``ids`` is
+    the normalized 予算事業ID per row, aligned with every projection, so the
+    predictor's df_index and the events catalog index share one source.
+    """
+    path: Path
+    columns: tuple[str, ...]
+    ids: np.ndarray | None  # (N,) object array of str（ID 列が無ければ None）
+
+    def has(self, column: str) -> bool:
+        return column in self.columns
+
+    def read_table(self, columns: Iterable[str]) -> pa.Table:
+        cols = [c for c in dict.fromkeys(columns) if c in self.columns]
+        return pq.read_table(self.path, columns=cols)
+
+    def read(self, columns: Iterable[str]) -> pd.DataFrame:
+        return self.read_table(columns).to_pandas()
+
+
+@lru_cache(maxsize=1)
+def get_adm_dataset() -> AdmDataset | None:
+    """Open adm_game.parquet (schema + ID column only), cached until a dataset reload; None if absent."""
+    if not ADM_PARQUET.exists():
+        return None
+    names = tuple(pq.read_schema(ADM_PARQUET).names)
+    ids = None
+    if ID_COLUMN in names:
+        raw = pq.read_table(ADM_PARQUET, columns=[ID_COLUMN]).column(ID_COLUMN).to_pandas()
+        ids = normalize_ids(raw).to_numpy(dtype=object)
+    return AdmDataset(path=ADM_PARQUET, columns=names, ids=ids)
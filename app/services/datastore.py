@@ -1,19 +1,38 @@
-from dataclasses import dataclass
-from functools import lru_cache
-from typing import Iterable
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator
 import ast
+import fcntl
+import hashlib
+import itertools
 import json
+import os
+import threading
+import time
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
 
+from app.core.config import settings
+from app.services.corpus_storage import normalize_rows
+from app.services.dataset import ADM_PARQUET, AdmDataset, get_adm_dataset, normalize_ids
+from app.services.shared_corpus import SharedCorpus, attach_or_publish
+from app.utils.telemetry import timed
+
+# サイドカー形式を変えたら上げる（古いサイドカーは読み捨てて再生成）
+SIDECAR_VERSION = 1
+
 @dataclass(frozen=True)
 class BudgetData:
-    X1: np.ndarray  # (N, d1) 目的・課題の埋め込み
+    X1: np.ndarray  # (N, d1) 目的・課題の埋め込み（追記後は AppendedRows）
     X2: np.ndarray  # (N, d2) 事業概要の埋め込み（無ければゼロ配列に）
     y_init: np.ndarray  # (N,) 当初予算
     y_final: np.ndarray | None  # (N,) 現額（無ければ None）
     df: pd.DataFrame           # メタ（事業名など）
+    ids: np.ndarray | None = None  # (N,) 正規化済み 予算事業ID（events_catalog と共通）
+    shared: SharedCorpus | None = None  # SHARED_CORPUS 時: X1 は共有セグメントの正規化済み行（量子化時は DecodedRows）
 
 def _parse_embedding_cell(x) -> np.ndarray:
     """Parse a single cell from the embedding_sum column into 1D float32 array.
@@ -51,45 +70,604 @@ def _stack_embeddings(col: Iterable) -> np.ndarray:
     return np.stack(rows, axis=0).astype("float32", copy=False)
 
 
-@lru_cache(maxsize=1)
+def _embeddings_from_arrow(col: pa.ChunkedArray) -> np.ndarray | None:
+    """Convert a list / fixed_size_list column to an (N, d) float32 matrix via Arrow.
+
+    float32 values are exposed without copying. Returns None when the column is
+    not a numeric list type (or has nulls / ragged rows) so the caller can fall
+    back to the cell-by-cell parser.
+    """
+    t = col.type
+    if not (pa.types.is_list(t) or pa.types.is_large_list(t) or pa.types.is_fixed_size_list(t)):
+        return None
+    if not (pa.types.is_floating(t.value_type) or pa.types.is_integer(t.value_type)):
+        return None
+    arr = col.combine_chunks() if col.num_chunks != 1 else col.chunk(0)
+    n = len(arr)
+    if n == 0:
+        return np.zeros((0, 0), dtype="float32")
+    if arr.null_count:
+        return None
+    if pa.types.is_fixed_size_list(t):
+        dim = t.list_size
+    else:
+        lengths = np.diff(arr.offsets.to_numpy())
+        dim = int(lengths[0])
+        if not (lengths == dim).all():
+            raise ValueError("inconsistent embedding dimensions in embedding_sum")
+    values = arr.flatten()
+    if values.null_count:
+        return None
+    flat = values.to_numpy(zero_copy_only=False)
+    return flat.astype("float32", copy=False).reshape(n, dim)
+
+
+def _file_digest(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 22), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _sidecar_paths(src: Path) -> dict[str, Path]:
+    base = Path(settings.DATA_CACHE_DIR) / f"{src.stem}.v{SIDECAR_VERSION}"
+    return {
+        "meta": base.with_name(base.name + ".meta.json"),
+        "X1": base.with_name(base.name + ".X1.npy"),
+        "targets": base.with_name(base.name + ".targets.npy"),
+    }
+
+
+def _sidecar_valid(src: Path, paths: dict[str, Path]) -> dict | None:
+    """Return sidecar metadata if it matches the source file (size, mtime, hash)."""
+    try:
+        meta = json.loads(paths["meta"].read_text())
+    except Exception:
+        return None
+    if meta.get("version") != SIDECAR_VERSION or not paths["X1"].exists() or not paths["targets"].exists():
+        return None
+    st = src.stat()
+    if meta.get("size") != st.st_size:
+        return None
+    if meta.get("mtime_ns") == st.st_mtime_ns:
+        return meta
+    # mtime だけ変わった（コピー/touch 等）場合は内容ハッシュで判定
+    if meta.get("digest") != _file_digest(src):
+        return None
+    meta["mtime_ns"] = st.st_mtime_ns
+    try:
+        _write_meta(paths["meta"], meta)
+    except OSError:
+        pass
+    return meta
+
+
+def _write_meta(path: Path, meta: dict) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, path)
+
+
+def _write_sidecar(src: Path, paths: dict[str, Path], X1: np.ndarray,
+                   y_init: np.ndarray, y_final: np.ndarray | None) -> None:
+    st = src.stat()
+    paths["meta"].parent.mkdir(parents=True, exist_ok=True)
+    targets = np.stack([y_init, y_final if y_final is not None else np.full_like(y_init, np.nan)])
+    # 一時ファイル名はプロセスごと（同じ parquet で同時に起動したワーカーが互いの書きかけを置かない）
+    for key, arr in (("X1", X1), ("targets", targets)):
+        tmp = paths[key].with_name(f"{paths[key].name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp, paths[key])
+    meta = {
+        "version": SIDECAR_VERSION,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "digest": _file_digest(src),
+        "n": int(X1.shape[0]),
+        "dim": int(X1.shape[1]) if X1.ndim == 2 else 0,
+        "has_y_final": y_final is not None,
+    }
+    _write_meta(paths["meta"], meta)
+
+
+def _open_sidecar(paths: dict[str, Path], meta: dict, n: int) -> tuple[np.ndarray, np.ndarray] | None:
+    """mmap the sidecar arrays; None (rebuild from the parquet) if they fail to load or do not match."""
+    try:
+        X1 = np.load(paths["X1"], mmap_mode="r")
+        targets = np.load(paths["targets"], mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if X1.ndim != 2 or X1.dtype != np.float32 or X1.shape != (n, meta.get("dim")) or meta.get("n") != n:
+        return None
+    if targets.shape != (2, n):
+        return None
+    return X1, targets
+
+
+# 予測器が参照するメタ列（その他の列は events_catalog 側で必要な分だけ読む）
+_META_COLUMNS = ("予算事業ID", "事業名", "当初予算", "歳出予算現額", "現額", "y_final")
+
+
+def _load_parquet(ds: AdmDataset) -> BudgetData:
+    if not ds.has("embedding_sum"):
+        raise KeyError("adm_game.parquet must contain column 'embedding_sum'")
+    parq = ds.path
+    paths = _sidecar_paths(parq)
+
+    side = _sidecar_valid(parq, paths)
+    if side is not None:
+        # 2回目以降の起動: 埋め込み列は読まずにサイドカーを mmap で開く（壊れていれば parquet から作り直す）
+        df = ds.read(_META_COLUMNS)
+        opened = _open_sidecar(paths, side, len(df))
+        if opened is not None:
+            X1, targets = opened
+            y_init = np.asarray(targets[0], dtype="float64")
+            y_final = np.asarray(targets[1], dtype="float64") if side.get("has_y_final") else None
+            X2 = np.zeros((X1.shape[0], 1), dtype="float32")
+            return BudgetData(X1=X1, X2=X2, y_init=y_init, y_final=y_final, df=df, ids=ds.ids)
+
+    table = ds.read_table(_META_COLUMNS + ("embedding_sum",))
+    emb = table.column("embedding_sum")
+    df = table.drop_columns(["embedding_sum"]).to_pandas()
+    # X: use only embedding_sum as single feature set
+    X1 = _embeddings_from_arrow(emb)
+    if X1 is None:
+        X1 = _stack_embeddings(emb.to_pylist())
+    del table, emb
+    # X2 is unused in current predictor; keep a minimal placeholder for compatibility
+    X2 = np.zeros((X1.shape[0], 1), dtype="float32")
+    # Targets: prefer Japanese column names if present
+    if "当初予算" in df.columns:
+        y_init = np.asarray(df["当初予算"].values, dtype="float64")
+    else:
+        # fallback to NaN vector to allow predictor's mask handling
+        y_init = np.full((X1.shape[0],), np.nan, dtype="float64")
+    y_final = None
+    for cand in ("歳出予算現額", "現額", "y_final"):
+        if cand in df.columns:
+            y_final = np.asarray(df[cand].values, dtype="float64")
+            break
+    try:
+        _write_sidecar(parq, paths, X1, y_init, y_final)
+    except OSError:
+        # 読み取り専用環境などではサイドカー無しで続行
+        pass
+    return BudgetData(X1=X1, X2=X2, y_init=y_init, y_final=y_final, df=df, ids=ds.ids)
+
+
+_LEGACY_NPZ = Path("data") / "embeddings.npz"
+
+
+def shared_corpus_sources() -> list[Path]:
+    """Files the shared segment is built from (its key changes when they do)."""
+    return [ADM_PARQUET] if ADM_PARQUET.exists() else [_LEGACY_NPZ]
+
+
+def _load_shared(ds: AdmDataset | None) -> BudgetData:
+    """Attach to (or publish) the shared corpus segment; only the metadata is per-worker."""
+    built: list[BudgetData] = []
+
+    def build() -> dict[str, np.ndarray]:
+        data = _load_local(ds)
+        built.append(data)
+        return {"X_n": normalize_rows(data.X1), "y_init": data.y_init, "y_final": data.y_final}
+
+    seg = attach_or_publish(shared_corpus_sources(), settings.EMBEDDING_STORAGE.lower(), build)
+    if built:
+        df = built[0].df
+    else:
+        df = ds.read(_META_COLUMNS) if ds is not None else _load_legacy_meta()
+    X1 = seg.rows
+    return BudgetData(
+        X1=X1, X2=np.zeros((X1.shape[0], 1), dtype="float32"),
+        y_init=seg.y_init, y_final=seg.y_final, df=df,
+        ids=(ds.ids if ds is not None else None), shared=seg,
+    )
+
+
+def _load_local(ds: AdmDataset | None) -> BudgetData:
+    if ds is not None:
+        return _load_parquet(ds)
+    # Fallback to legacy files if adm_game.parquet is absent
+    return _load_legacy()
+
+
+@timed("dataset_load")
+def _read_budget_data(ds: AdmDataset | None) -> BudgetData:
+    if settings.SHARED_CORPUS:
+        return _load_shared(ds)
+    return _load_local(ds)
+
+
 def load_budget_data() -> BudgetData:
+    """The active dataset (loaded on first use). See ``current_snapshot``."""
+    return current_snapshot().data
+
+
+def _load_legacy_meta() -> pd.DataFrame:
     base = Path("data")
-    parq = base / "adm_game.parquet"
-
-    if parq.exists():
-        df = pd.read_parquet(parq)
-        if "embedding_sum" not in df.columns:
-            raise KeyError("adm_game.parquet must contain column 'embedding_sum'")
-        # X: use only embedding_sum as single feature set
-        X1 = _stack_embeddings(df["embedding_sum"].tolist())
-        # X2 is unused in current predictor; keep a minimal placeholder for compatibility
-        X2 = np.zeros((X1.shape[0], 1), dtype="float32")
-        # Targets: prefer Japanese column names if present
-        if "当初予算" in df.columns:
-            y_init = np.asarray(df["当初予算"].values, dtype="float64")
-        else:
-            # fallback to NaN vector to allow predictor's mask handling
-            y_init = np.full((X1.shape[0],), np.nan, dtype="float64")
-        y_final = None
-        for cand in ("歳出予算現額", "現額", "y_final"):
-            if cand in df.columns:
-                y_final = np.asarray(df[cand].values, dtype="float64")
-                break
-        return BudgetData(X1=X1, X2=X2, y_init=y_init, y_final=y_final, df=df)
+    # メタデータ（優先順: events.parquet > selected_game.csv > events.csv）
+    if (base / "events.parquet").exists():
+        return pd.read_parquet(base / "events.parquet")
+    if (base / "selected_game.csv").exists():
+        return pd.read_csv(base / "selected_game.csv")
+    return pd.read_csv(base / "events.csv")
 
-    # Fallback to legacy files if adm_game.parquet is absent
-    npz = np.load(base / "embeddings.npz")  # 例: {X1, X2, y_init, y_final?}
+
+def _load_legacy() -> BudgetData:
+    npz = np.load(_LEGACY_NPZ)  # 例: {X1, X2, y_init, y_final?}
     X1 = np.asarray(npz["X1"], dtype="float32")
     X2 = np.asarray(npz["X2"], dtype="float32") if "X2" in npz else np.zeros((X1.shape[0], 1), "float32")
     y_init = np.asarray(npz["y_init"], dtype="float64")
     y_final = np.asarray(npz["y_final"], dtype="float64") if "y_final" in npz else None
+    df = _load_legacy_meta()
+    return BudgetData(X1=X1, X2=X2, y_init=y_init, y_final=y_final, df=df)
 
-    # メタデータ（優先順: events.parquet > selected_game.csv > events.csv）
-    if (base / "events.parquet").exists():
-        df = pd.read_parquet(base / "events.parquet")
-    elif (base / "selected_game.csv").exists():
-        df = pd.read_csv(base / "selected_game.csv")
+
+# ========== スナップショット（再読み込み・追記） ==========
+
+# 追記 API が受け付ける列（events_catalog のメタ列のうち行ごとに持つもの）
+APPEND_COLUMNS = ("予算事業ID", "事業名", "事業の概要", "現状・課題", "当初予算", "歳出予算現額")
+
+
+class RowBuffer:
+    """Append-only rows with spare capacity at the end.
+
+    ``extend(n, rows)`` returns a view of the first n rows plus ``rows``.
+    Views handed out earlier stay valid: new rows land past their end, or in a
+    fresh buffer once the capacity runs out (or when n is not the last length
+    handed out). The base array is copied once, on the first extend, so the
+    embedding matrix does not go through here (see ``AppendedRows``).
+    """
+
+    def __init__(self, base: np.ndarray):
+        self._buf = base
+        self._n = int(base.shape[0])
+        self._owned = False  # base は読み取り専用（mmap・共有セグメント）のことがあるので書かない
+
+    def extend(self, n: int, rows: np.ndarray) -> np.ndarray:
+        need = n + rows.shape[0]
+        if not self._owned or n != self._n or need > self._buf.shape[0]:
+            cap = need + max(need >> 6, 256)
+            buf = np.empty((cap,) + self._buf.shape[1:], dtype=self._buf.dtype)
+            buf[:n] = self._buf[:n]
+            self._buf, self._owned = buf, True
+        self._buf[n:need] = rows
+        self._n = need
+        return self._buf[:need]
+
+
+class AppendedRows:
+    """Read-only float32 (N, d) rows: the loaded base rows followed by appended ones.
+
+    The base (sidecar mmap, shared segment or its ``DecodedRows``) is kept as
+    is and only the appended tail lives in process memory, so appends neither
+    copy nor decode the base. Indexing reads each part separately; slices that
+    stay within one part are that part's own slice. ``np.asarray`` joins both.
+    """
+
+    dtype = np.dtype("float32")
+    ndim = 2
+
+    def __init__(self, base, tail: np.ndarray):
+        self.base = base
+        self.tail = tail
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (self.base.shape[0] + self.tail.shape[0], self.base.shape[1])
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, key) -> np.ndarray:
+        rows, rest = (key[0], key[1:]) if isinstance(key, tuple) else (key, ())
+        v = self._rows(rows)
+        if not rest:
+            return v
+        return v[(slice(None),) + rest] if v.ndim == 2 else v[rest]
+
+    def _rows(self, rows) -> np.ndarray:
+        nb, n = self.base.shape[0], self.shape[0]
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(n)
+            if step == 1:
+                stop = max(start, stop)
+                if start >= nb:
+                    return self.tail[start - nb:stop - nb]
+                if stop <= nb:
+                    return np.asarray(self.base[start:stop], dtype="float32")
+            rows = np.arange(start, stop, step)
+        elif np.ndim(rows) == 0:
+            i = int(rows)
+            i = i + n if i < 0 else i
+            if not 0 <= i < n:
+                raise IndexError(f"row {rows} out of range for {n} rows")
+            return np.asarray(self.base[i], dtype="float32") if i < nb else self.tail[i - nb]
+        idx = np.asarray(rows)
+        idx = np.flatnonzero(idx) if idx.dtype == bool else idx.astype("int64")
+        idx = np.where(idx < 0, idx + n, idx)
+        out = np.empty(idx.shape + (self.shape[1],), dtype="float32")
+        head = idx < nb
+        out[head] = self.base[idx[head]]
+        out[~head] = self.tail[idx[~head] - nb]
+        return out
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        v = np.concatenate([np.asarray(self.base, dtype="float32"), self.tail])
+        return v if dtype is None else v.astype(dtype, copy=False)
+
+
+_MISSING = object()
+
+
+@dataclass(eq=False)
+class DatasetSnapshot:
+    """One version of the dataset and everything built from it.
+
+    Handlers take ``current_snapshot()`` once and use it to the end, so a
+    reload or append that activates a newer version never changes the data
+    under an in-flight request; the old version is freed when its last user
+    lets go. Derived structures (similarity index, evidence columns, catalog,
+    ...) are built per snapshot through ``memo`` instead of process-wide caches.
+    """
+    version: int
+    data: BudgetData
+    kind: str                 # "load"（起動時）/ "reload" / "append"
+    base_rows: int            # データファイル由来の行数（以降の行は追記分）
+    adm: AdmDataset | None = None
+    appended: pd.DataFrame | None = None  # 追記行のメタ（APPEND_COLUMNS、正規化済み ID）
+    parent_version: int | None = None
+    created_at: float = field(default_factory=time.time)
+    _memo: dict[str, Any] = field(default_factory=dict, repr=False)
+    _locks: dict[str, threading.Lock] = field(default_factory=dict, repr=False)
+    _guard: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _buffers: dict[str, RowBuffer] = field(default_factory=dict, repr=False)
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.data.y_init.shape[0])
+
+    @property
+    def appended_rows(self) -> int:
+        return self.n_rows - self.base_rows
+
+    def memo(self, key: str, build: Callable[["DatasetSnapshot"], Any]) -> Any:
+        """``build(self)`` once per snapshot and key (concurrent callers wait for the first)."""
+        value = self._memo.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            value = self._memo.get(key, _MISSING)
+            if value is _MISSING:
+                value = build(self)
+                self._memo[key] = value
+        return value
+
+    def peek(self, key: str) -> Any | None:
+        """The memoized value if it has been built, else None (never builds)."""
+        return self._memo.get(key)
+
+    def seed(self, key: str, value: Any) -> None:
+        """Memoize a value derived elsewhere (e.g. the parent's index extended in place of a rebuild)."""
+        self._memo.setdefault(key, value)
+
+    def info(self) -> dict[str, Any]:
+        return {
+            "version": self.version,
+            "kind": self.kind,
+            "parent_version": self.parent_version,
+            "created_at": self.created_at,
+            "rows": self.n_rows,
+            "base_rows": self.base_rows,
+            "appended_rows": self.appended_rows,
+        }
+
+
+def reference_embeddings(snapshot: DatasetSnapshot) -> np.ndarray:
+    """The snapshot's X1 in float32, as a reference for measuring quantization error.
+
+    A quantized shared segment keeps only the codes, so its rows are read back
+    from the data files (the sidecar mmap once it exists) instead of decoded.
+    """
+    data = snapshot.data
+    if data.shared is None or data.shared.storage == "float32":
+        return data.X1
+    n = snapshot.base_rows
+    base = _load_local(snapshot.adm).X1
+    if base.shape != (n, data.X1.shape[1]):
+        return np.asarray(data.X1)  # データファイルが読み込み後に差し替わった
+    if snapshot.appended_rows == 0:
+        return base
+    return np.concatenate([normalize_rows(base), np.asarray(data.X1[n:], dtype="float32")])
+
+
+_versions = itertools.count(1)
+_current: DatasetSnapshot | None = None
+_current_lock = threading.Lock()
+
+
+def current_snapshot() -> DatasetSnapshot:
+    """The active snapshot; the first call loads the data files (plus the append log)."""
+    snap = _current
+    if snap is None:
+        with _current_lock:
+            if _current is None:
+                _activate(load_snapshot("load"))
+            snap = _current
+    return snap
+
+
+def peek_snapshot() -> DatasetSnapshot | None:
+    """The active snapshot, or None if nothing has been loaded yet (never loads)."""
+    return _current
+
+
+def _activate(snap: DatasetSnapshot) -> None:
+    global _current
+    _current = snap
+
+
+def activate_snapshot(snap: DatasetSnapshot, expected: DatasetSnapshot | None = None) -> DatasetSnapshot | None:
+    """Make ``snap`` the active version (a single reference swap); returns the previous one.
+
+    With ``expected``, refuse (RuntimeError) if the active snapshot changed in
+    the meantime, so an append never discards a concurrent reload.
+    """
+    with _current_lock:
+        prev = _current
+        if expected is not None and prev is not expected:
+            raise RuntimeError(f"dataset changed during update (active version {prev and prev.version})")
+        _activate(snap)
+    return prev
+
+
+def load_snapshot(kind: str = "reload") -> DatasetSnapshot:
+    """Read the data files and the append log into a new snapshot (not activated)."""
+    if kind != "load":
+        get_adm_dataset.cache_clear()  # parquet が差し替わっていればスキーマ・ID 列を読み直す
+    ds = get_adm_dataset()
+    data = _read_budget_data(ds)
+    snap = DatasetSnapshot(version=next(_versions), data=data, kind=kind,
+                           base_rows=int(data.y_init.shape[0]), adm=ds)
+    logged = read_append_log()
+    if logged is not None and data.ids is not None:
+        rows, X = logged
+        # adm_game.parquet に取り込み済みの行は読み捨てる
+        keep = ~normalize_ids(rows["予算事業ID"]).isin(set(data.ids)).to_numpy()
+        if keep.any():
+            snap = extend_snapshot(snap, rows[keep].reset_index(drop=True), X[keep],
+                                   kind=kind, version=snap.version)
+    return snap
+
+
+def _column(rows: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in rows.columns:
+        return np.full((len(rows),), np.nan)
+    return pd.to_numeric(rows[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def extend_snapshot(parent: DatasetSnapshot, rows: pd.DataFrame, X: np.ndarray,
+                    kind: str = "append", version: int | None = None) -> DatasetSnapshot:
+    """A new snapshot holding the parent's rows plus ``rows`` (APPEND_COLUMNS) and their X1 embeddings.
+
+    The parent is left untouched. Row arrays grow through RowBuffer, so
+    repeated small appends copy only the new rows; X1 keeps the loaded base
+    rows as they are and buffers only the appended ones (``AppendedRows``).
+    Derived structures are not carried over (see ``hot_reload`` for extending
+    the index without a rebuild).
+    """
+    data = parent.data
+    if data.ids is None:
+        raise ValueError("appending rows needs adm_game.parquet with a 予算事業ID column")
+    n, m = parent.n_rows, len(rows)
+    X = np.asarray(X, dtype="float32")
+    if X.ndim != 2 or X.shape != (m, data.X1.shape[1]):
+        raise ValueError(f"embeddings must be ({m}, {data.X1.shape[1]}), got {X.shape}")
+    if data.shared is not None:
+        X = normalize_rows(X)  # 共有セグメント時の X1 は正規化済み行
+    rows = rows.reindex(columns=list(APPEND_COLUMNS)).reset_index(drop=True)
+    rows["予算事業ID"] = normalize_ids(rows["予算事業ID"])
+
+    buffers = parent._buffers  # 同じ系列（前回の読み込み以降）のスナップショットで共有
+
+    def grow(key: str, base: np.ndarray, new: np.ndarray, start: int = 0) -> np.ndarray:
+        buf = buffers.get(key)
+        if buf is None:
+            buf = buffers[key] = RowBuffer(base)
+        return buf.extend(n - start, new)
+
+    # 埋め込みは読み込んだ行（mmap・共有セグメント）をコピーせず、追記分だけを持つ
+    nb = parent.base_rows
+    X_base = data.X1.base if isinstance(data.X1, AppendedRows) else data.X1
+    X_tail = grow("X1", np.empty((0, X.shape[1]), dtype="float32"), X, start=nb)
+
+    y_final = None
+    if data.y_final is not None:
+        y_final = grow("y_final", data.y_final, _column(rows, "歳出予算現額"))
+    meta = rows[[c for c in data.df.columns if c in rows.columns]]
+    child = BudgetData(
+        X1=AppendedRows(X_base, X_tail),
+        X2=grow("X2", data.X2, np.zeros((m,) + data.X2.shape[1:], dtype=data.X2.dtype)),
+        y_init=grow("y_init", data.y_init, _column(rows, "当初予算")),
+        y_final=y_final,
+        df=pd.concat([data.df, meta], ignore_index=True),
+        ids=grow("ids", data.ids, rows["予算事業ID"].to_numpy(dtype=object)),
+        shared=data.shared,
+    )
+    appended = rows if parent.appended is None else pd.concat([parent.appended, rows], ignore_index=True)
+    if version is None:
+        version, parent_version = next(_versions), parent.version
     else:
-        df = pd.read_csv(base / "events.csv")
+        # 読み込み時に追記ログを当てる場合は同じ版のまま
+        parent_version = parent.parent_version
+    return DatasetSnapshot(
+        version=version, data=child, kind=kind, base_rows=parent.base_rows, adm=parent.adm,
+        appended=appended, parent_version=parent_version, _buffers=buffers,
+    )
 
-    return BudgetData(X1=X1, X2=X2, y_init=y_init, y_final=y_final, df=df)
+
+# ---- 追記ログ（DATASET_APPEND_PATH）: 再読み込み・再起動後も追記行を残す ----
+
+def append_log_path() -> Path | None:
+    return Path(settings.DATASET_APPEND_PATH) if settings.DATASET_APPEND_PATH else None
+
+
+@contextmanager
+def _log_lock(path: Path) -> Iterator[None]:
+    # 複数ワーカーが同時に追記しても行を失わないよう、読み→書きをファイルロックで囲む
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_log(path: Path) -> tuple[pd.DataFrame, np.ndarray] | None:
+    if not path.exists():
+        return None
+    table = pq.read_table(path)
+    X = _embeddings_from_arrow(table.column("embedding_sum"))
+    if X is None:
+        X = _stack_embeddings(table.column("embedding_sum").to_pylist())
+    rows = table.drop_columns(["embedding_sum"]).to_pandas()
+    return rows.reindex(columns=list(APPEND_COLUMNS)), X
+
+
+def read_append_log() -> tuple[pd.DataFrame, np.ndarray] | None:
+    """(rows, embeddings) saved by earlier appends, or None."""
+    path = append_log_path()
+    return _read_log(path) if path is not None else None
+
+
+def write_append_log(rows: pd.DataFrame, X: np.ndarray) -> Path | None:
+    """Add rows to the append log (atomic replace). ValueError if an ID is already logged."""
+    path = append_log_path()
+    if path is None:
+        return None
+    rows = rows.reindex(columns=list(APPEND_COLUMNS)).reset_index(drop=True)
+    X = np.asarray(X, dtype="float32")
+    with _log_lock(path):
+        old = _read_log(path)
+        if old is not None:
+            dup = sorted(set(normalize_ids(rows["予算事業ID"])) & set(normalize_ids(old[0]["予算事業ID"])))
+            if dup:
+                raise ValueError(f"予算事業ID already appended: {dup[:10]}")
+            if old[1].shape[1] != X.shape[1]:
+                raise ValueError(f"embedding dim {X.shape[1]} != append log dim {old[1].shape[1]}")
+            rows = pd.concat([old[0], rows], ignore_index=True)
+            X = np.concatenate([old[1], X])
+        table = pa.Table.from_pandas(rows.astype({c: object for c in ("予算事業ID", "事業名", "事業の概要", "現状・課題")}),
+                                     preserve_index=False)
+        emb = pa.FixedSizeListArray.from_arrays(pa.array(X.reshape(-1)), X.shape[1])
+        table = table.append_column("embedding_sum", emb)
+        tmp = path.with_name(path.name + ".tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+    return path
@@ -1,12 +1,15 @@
 import re
 import hashlib
-import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 import numpy as np
 from typing import Optional
 
 from app.core.config import settings
-
-_client_singleton = None
+from app.services.embedding_cache import get_embedding_cache
+from app.services.embedding_client import get_embedding_client
+from app.utils.telemetry import timed
 
 _token_re = re.compile(r"\w+", re.UNICODE)
 
@@ -24,57 +27,155 @@ def _rand_vec_for_token(token: str, dim: int) -> np.ndarray:
     return v
 
 
-def _ensure_openai_client():
-    global _client_singleton
-    if _client_singleton is not None:
-        return _client_singleton
-    try:
-        from openai import OpenAI
-    except Exception as e:
-        raise RuntimeError("openai package is required for EMBEDDING_PROVIDER=openai") from e
-    api_key = settings.OPENAI_API_KEY or os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY is not set")
-    client = OpenAI(api_key=api_key, base_url=settings.OPENAI_BASE_URL or None)
-    _client_singleton = client
-    return client
+class _TokenVectorTable:
+    """Bounded LRU table of per-token dummy vectors for one dimension.
+
+    Vectors live in a preallocated (capacity, dim) matrix; a text embeds as one
+    fancy-index gather plus an axis-0 sum. The axis-0 reduction adds rows in
+    token order, so the result is bit-identical to accumulating
+    _rand_vec_for_token() one by one.
+    """
+
+    def __init__(self, dim: int, capacity: int):
+        self.dim = dim
+        self.capacity = capacity
+        # np.empty はページを確保しないので、実際のメモリは使用分のみ
+        self._mat = np.empty((capacity, dim), dtype="float32")
+        self._slots: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def sum_tokens(self, tokens: list[str]) -> np.ndarray:
+        uniq = dict.fromkeys(tokens)
+        if len(uniq) > self.capacity:
+            # テーブルに収まらない場合は従来どおり逐次生成
+            vec = np.zeros((self.dim,), dtype="float32")
+            for t in tokens:
+                vec += _rand_vec_for_token(t, self.dim)
+            return vec
+        with self._lock:
+            for t in uniq:
+                slot = self._slots.get(t)
+                if slot is not None:
+                    self._slots.move_to_end(t)
+                    continue
+                if len(self._slots) < self.capacity:
+                    slot = len(self._slots)
+                else:
+                    _, slot = self._slots.popitem(last=False)
+                self._mat[slot] = _rand_vec_for_token(t, self.dim)
+                self._slots[t] = slot
+            idx = np.fromiter((self._slots[t] for t in tokens), dtype=np.intp, count=len(tokens))
+            return self._mat[idx].sum(axis=0)
+
+
+@lru_cache(maxsize=8)
+def _token_table(dim: int) -> _TokenVectorTable:
+    return _TokenVectorTable(dim, settings.EMBEDDING_TOKEN_CACHE_SIZE)
 
 
 def _embed_openai(text: str) -> np.ndarray:
-    client = _ensure_openai_client()
-    model = settings.OPENAI_EMBEDDING_MODEL
-    # OpenAI SDK v1
-    resp = client.embeddings.create(model=model, input=text)
-    emb = resp.data[0].embedding
-    return np.asarray(emb, dtype="float32")
+    return get_embedding_client().embed([text])[0]
+
+
+def _embed_openai_many(texts: list[str]) -> np.ndarray:
+    # 複数入力をバッチ単位でまとめて送る（接続プール・同時実行数制限・再試行付き）
+    return get_embedding_client().embed(texts)
 
 
 def _embed_dummy(text: str, dim: int, normalize: bool = True) -> np.ndarray:
     tokens = _tokenize(text or "")
     if not tokens:
         raise ValueError("empty text for embedding")
-    vec = np.zeros((dim,), dtype="float32")
-    for t in tokens:
-        vec += _rand_vec_for_token(t, dim)
+    if settings.EMBEDDING_TOKEN_CACHE_SIZE > 0:
+        vec = _token_table(dim).sum_tokens(tokens)
+    else:
+        vec = np.zeros((dim,), dtype="float32")
+        for t in tokens:
+            vec += _rand_vec_for_token(t, dim)
     if normalize:
         n = float(np.linalg.norm(vec) + 1e-12)
         vec = (vec / n).astype("float32")
     return vec
 
 
+def _provider_model() -> tuple[str, str]:
+    if settings.EMBEDDING_PROVIDER.lower() == "openai":
+        return "openai", settings.OPENAI_EMBEDDING_MODEL
+    return "dummy", "hash-v1"
+
+
+def _l2_normalize(v: np.ndarray) -> np.ndarray:
+    n = float(np.linalg.norm(v) + 1e-12)
+    return (v / n).astype("float32")
+
+
+@timed("embed")
 def embed_text_to_vec(text: str, dim: int, normalize: bool = True) -> np.ndarray:
     """Provider-aware embedding.
     - If settings.EMBEDDING_PROVIDER == 'openai': returns model-dimension vector.
     - Else: returns dummy embedding of length `dim`.
+    Raw vectors are looked up in / stored to the on-disk embedding cache first.
     NOTE: Predictor expects the query dimension to match X1. Ensure your
     dataset embeddings (adm_game.parquet) were produced by the same model
     when using the OpenAI provider.
     """
-    if settings.EMBEDDING_PROVIDER.lower() == "openai":
-        v = _embed_openai(text)
-        if normalize:
-            n = float(np.linalg.norm(v) + 1e-12)
-            v = (v / n).astype("float32")
-        return v
-    # default dummy
-    return _embed_dummy(text, dim=dim, normalize=normalize)
+    provider, model = _provider_model()
+    cache = get_embedding_cache()
+    v = cache.get(provider, model, dim, text) if cache is not None else None
+    if v is None:
+        if provider == "openai":
+            v = _embed_openai(text)
+        else:
+            v = _embed_dummy(text, dim=dim, normalize=False)
+        if cache is not None:
+            cache.put(provider, model, dim, text, v)
+    return _l2_normalize(v) if normalize else v
+
+
+@timed("embed")
+def embed_texts_to_mat(texts: list[str], dim: int, normalize: bool = True) -> tuple[np.ndarray, list[str | None]]:
+    """Batch version of embed_text_to_vec.
+
+    Returns (M, errors): M is a (len(texts), d) float32 matrix and errors[i] is
+    an error message for items that could not be embedded (their rows are zero).
+    Empty texts are reported per item instead of failing the whole batch.
+    """
+    provider, model = _provider_model()
+    cache = get_embedding_cache()
+    errors: list[str | None] = [None] * len(texts)
+    vecs: dict[int, np.ndarray] = {}
+    misses: list[int] = []
+    for i, t in enumerate(texts):
+        if not t or not str(t).strip():
+            errors[i] = "empty text for embedding"
+            continue
+        v = cache.get(provider, model, dim, t) if cache is not None else None
+        if v is None:
+            misses.append(i)
+        else:
+            vecs[i] = v
+
+    if misses and provider == "openai":
+        try:
+            V = _embed_openai_many([texts[i] for i in misses])
+            vecs.update(zip(misses, V))
+        except Exception as e:
+            for i in misses:
+                errors[i] = f"embedding failed: {e}"
+            misses = []
+    elif misses:
+        for i in list(misses):
+            try:
+                vecs[i] = _embed_dummy(texts[i], dim=dim, normalize=False)
+            except ValueError as e:
+                errors[i] = str(e)
+    if cache is not None:
+        for i in misses:
+            if i in vecs:
+                cache.put(provider, model, dim, texts[i], vecs[i])
+
+    width = next(iter(vecs.values())).shape[0] if vecs else dim
+    M = np.zeros((len(texts), width), dtype="float32")
+    for i, v in vecs.items():
+        M[i] = _l2_normalize(v) if normalize else v
+    return M, errors
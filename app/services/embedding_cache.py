@@ -0,0 +1,228 @@
+import fcntl
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def cache_key(provider: str, model: str, dim: int, text: str) -> str:
+    # プロバイダに渡すのと同じ生のテキストで引く（正規化・strip で別の入力を同じ項目にしない）
+    h = hashlib.sha256()
+    h.update(f"{provider}\0{model}\0{dim}\0".encode("utf-8"))
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+_KEY_BYTES = 32  # sha256 digest
+_FORMAT = 3  # ファイル名に含める（キー・行フォーマット変更時に旧ファイルを読まないため）
+
+
+class _Namespace:
+    """Vectors of one (provider, model, dim): an append-only row file + log index.
+
+    ``<ns>.vec`` holds rows of ``key digest (32B) + float32[dim]``; ``<ns>.idx``
+    is an append-only log of ``P <key> <slot>`` (put) and ``D <key>`` (evict)
+    lines. Writers take an exclusive flock, so several worker processes can
+    share one directory; each process tails the log to pick up rows written by
+    the others. A slot seen in the log may be stale once another process has
+    compacted the files, so every read checks the row's key digest and
+    re-reads the index on a mismatch.
+    """
+
+    def __init__(self, root: Path, name: str, dim: int, max_items: int):
+        self.dim = dim
+        self.row_dtype = np.dtype([("key", "u1", (_KEY_BYTES,)), ("vec", "<f4", (dim,))])
+        self.rowbytes = self.row_dtype.itemsize
+        self.max_items = max_items
+        self.vec_path = root / f"{name}.vec"
+        self.idx_path = root / f"{name}.idx"
+        self.lock_path = root / f"{name}.lock"
+        self.lock_path.touch(exist_ok=True)
+        self.vec_path.touch(exist_ok=True)
+        self.idx_path.touch(exist_ok=True)
+        self._entries: OrderedDict[str, int] = OrderedDict()  # key -> slot（LRU順）
+        self._idx_offset = 0
+        self._idx_ino = -1
+        self._mm: np.memmap | None = None
+        self._mm_rows = 0
+        self._refresh()
+
+    # ---- index log ----
+    def _refresh(self) -> None:
+        st = os.stat(self.idx_path)
+        if st.st_ino != self._idx_ino or st.st_size < self._idx_offset:
+            # 他プロセスが compaction した → 全読み直し
+            self._entries.clear()
+            self._idx_offset = 0
+            self._idx_ino = st.st_ino
+            self._mm = None
+        if st.st_size == self._idx_offset:
+            return
+        with open(self.idx_path, "rb") as f:
+            f.seek(self._idx_offset)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1  # 書きかけの行は次回に回す
+        for line in chunk[:end].decode("ascii").splitlines():
+            parts = line.split()
+            if len(parts) == 3 and parts[0] == "P":
+                self._entries[parts[1]] = int(parts[2])
+                self._entries.move_to_end(parts[1])
+            elif len(parts) == 2 and parts[0] == "D":
+                self._entries.pop(parts[1], None)
+        self._idx_offset += end
+
+    def _open(self) -> None:
+        rows = os.path.getsize(self.vec_path) // self.rowbytes
+        self._mm = np.memmap(self.vec_path, dtype=self.row_dtype, mode="r", shape=(rows,)) if rows else None
+        self._mm_rows = rows
+
+    def _row(self, slot: int, key: str) -> np.ndarray | None:
+        """Vector stored at ``slot`` if that row still belongs to ``key``."""
+        if self._mm is None or slot >= self._mm_rows:
+            self._open()
+            if slot >= self._mm_rows:
+                return None
+        rec = self._mm[slot]
+        if rec["key"].tobytes() != bytes.fromhex(key):
+            return None
+        return np.array(rec["vec"])
+
+    def get(self, key: str) -> np.ndarray | None:
+        slot = self._entries.get(key)
+        if slot is not None:
+            v = self._row(slot, key)
+            if v is not None:
+                self._entries.move_to_end(key)
+                return v
+        # 未知のキー、または他プロセスの compaction で slot が古くなった → 索引を読み直す
+        self._refresh()
+        slot = self._entries.get(key)
+        if slot is None:
+            return None
+        self._mm = None
+        v = self._row(slot, key)
+        if v is not None:
+            self._entries.move_to_end(key)
+        return v
+
+    def put(self, key: str, vec: np.ndarray) -> None:
+        v = np.ascontiguousarray(vec, dtype="float32").reshape(-1)
+        if v.shape[0] != self.dim:
+            return
+        with open(self.lock_path, "rb") as lk:
+            fcntl.flock(lk, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                if key in self._entries:
+                    return
+                with open(self.vec_path, "ab") as f:
+                    slot = f.tell() // self.rowbytes
+                    f.write(bytes.fromhex(key) + v.tobytes())
+                lines = [f"P {key} {slot}\n"]
+                self._entries[key] = slot
+                while len(self._entries) > self.max_items:
+                    old, _ = self._entries.popitem(last=False)
+                    lines.append(f"D {old}\n")
+                with open(self.idx_path, "ab") as f:
+                    f.write("".join(lines).encode("ascii"))
+                self._idx_offset = os.path.getsize(self.idx_path)
+                if slot + 1 > 2 * self.max_items:
+                    self._compact()
+            finally:
+                fcntl.flock(lk, fcntl.LOCK_UN)
+
+    def _compact(self) -> None:
+        # 生きている行だけを LRU 順に書き直し、ファイルをアトミックに差し替える（flock 保持中）
+        self._open()
+        live = []
+        for key, slot in self._entries.items():
+            v = self._row(slot, key)
+            if v is not None:
+                live.append((key, v))
+        tmp_vec = self.vec_path.with_suffix(".vec.tmp")
+        tmp_idx = self.idx_path.with_suffix(".idx.tmp")
+        with open(tmp_vec, "wb") as fv, open(tmp_idx, "wb") as fi:
+            for new_slot, (key, v) in enumerate(live):
+                fv.write(bytes.fromhex(key) + v.tobytes())
+                fi.write(f"P {key} {new_slot}\n".encode("ascii"))
+        os.replace(tmp_vec, self.vec_path)
+        os.replace(tmp_idx, self.idx_path)
+        self._entries = OrderedDict((key, i) for i, (key, _) in enumerate(live))
+        self._mm = None
+        st = os.stat(self.idx_path)
+        self._idx_ino = st.st_ino
+        self._idx_offset = st.st_size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def nbytes(self) -> int:
+        return os.path.getsize(self.vec_path) + os.path.getsize(self.idx_path)
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (provider, model, dim, normalized text hash).
+
+    Stores raw (un-normalized) provider vectors; callers normalize after lookup.
+    Each namespace keeps at most ``max_items`` vectors and evicts the least
+    recently used ones.
+    """
+
+    def __init__(self, root: str | Path, max_items: int):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_items = max(1, int(max_items))
+        self._spaces: dict[tuple[str, str, int], _Namespace] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _space(self, provider: str, model: str, dim: int) -> _Namespace:
+        k = (provider, model, int(dim))
+        ns = self._spaces.get(k)
+        if ns is None:
+            name = hashlib.sha1(f"v{_FORMAT}\0{provider}\0{model}\0{dim}".encode("utf-8")).hexdigest()[:16]
+            ns = _Namespace(self.root, name, int(dim), self.max_items)
+            self._spaces[k] = ns
+        return ns
+
+    def get(self, provider: str, model: str, dim: int, text: str) -> np.ndarray | None:
+        key = cache_key(provider, model, dim, text)
+        with self._lock:
+            v = self._space(provider, model, dim).get(key)
+            if v is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return v
+
+    def put(self, provider: str, model: str, dim: int, text: str, vec: np.ndarray) -> None:
+        key = cache_key(provider, model, dim, text)
+        with self._lock:
+            self._space(provider, model, dim).put(key, vec)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else None,
+                "items": sum(len(ns) for ns in self._spaces.values()),
+                "max_items": self.max_items,
+                "disk_bytes": sum(ns.nbytes() for ns in self._spaces.values()),
+            }
+
+
+@lru_cache(maxsize=1)
+def get_embedding_cache() -> EmbeddingCache | None:
+    """Process-wide cache, or None when EMBEDDING_CACHE_DIR is empty (disabled)."""
+    if not settings.EMBEDDING_CACHE_DIR:
+        return None
+    return EmbeddingCache(settings.EMBEDDING_CACHE_DIR, settings.EMBEDDING_CACHE_MAX_ITEMS)
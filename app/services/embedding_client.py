@@ -0,0 +1,152 @@
+import asyncio
+import os
+import random
+import threading
+from functools import lru_cache
+from typing import Awaitable, TypeVar
+
+import numpy as np
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class _LoopThread:
+    """A private asyncio event loop running in a daemon thread.
+
+    The async OpenAI client (and its httpx connection pool) is bound to this
+    loop, so sync callers and callers on other loops share one pool.
+    """
+
+    def __init__(self, name: str):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def run(self, coro: Awaitable[T], timeout: float | None = None) -> T:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    async def arun(self, coro: Awaitable[T]) -> T:
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+
+class OpenAIEmbeddingClient:
+    """Pooled, batched embedding client on top of AsyncOpenAI.
+
+    - 入力は batch_size 件ずつ一つのリクエストにまとめる
+    - 同時リクエスト数は max_concurrency で制限
+    - 接続エラー/429/5xx/タイムアウトは指数バックオフ（ジッタ付き）で再試行
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: str | None = None,
+        batch_size: int = 128,
+        max_concurrency: int = 8,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.batch_size = max(1, int(batch_size))
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.timeout = float(timeout)
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = float(backoff_base)
+        self._runner = _LoopThread("embedding-client")
+        self._client = None
+        self._sem: asyncio.Semaphore | None = None
+
+    def _ensure(self):
+        # ループスレッド上で呼ばれる（AsyncOpenAI/httpx はループに紐づくため）
+        if self._client is not None:
+            return self._client
+        try:
+            import httpx
+            from openai import AsyncOpenAI
+        except Exception as e:
+            raise RuntimeError("openai package is required for EMBEDDING_PROVIDER=openai") from e
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+            timeout=httpx.Timeout(self.timeout),
+        )
+        self._client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url or None,
+            timeout=self.timeout,
+            max_retries=0,  # 再試行はこのクラスで制御する
+            http_client=http_client,
+        )
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    @staticmethod
+    def _is_retryable(e: Exception) -> bool:
+        import openai
+
+        if isinstance(e, (openai.APIConnectionError, openai.RateLimitError, asyncio.TimeoutError)):
+            return True
+        if isinstance(e, openai.APIStatusError):
+            return e.status_code >= 500
+        return False
+
+    async def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        client = self._ensure()
+        assert self._sem is not None
+        attempt = 0
+        while True:
+            try:
+                async with self._sem:
+                    resp = await asyncio.wait_for(
+                        client.embeddings.create(model=self.model, input=texts),
+                        timeout=self.timeout,
+                    )
+                data = sorted(resp.data, key=lambda d: d.index)
+                return np.asarray([d.embedding for d in data], dtype="float32")
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+                delay = self.backoff_base * (2 ** attempt)
+                await asyncio.sleep(delay * (0.5 + random.random()))
+                attempt += 1
+
+    async def _embed_all(self, texts: list[str]) -> np.ndarray:
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        parts = await asyncio.gather(*(self._embed_batch(c) for c in chunks))
+        return np.concatenate(parts, axis=0)
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Embed texts from synchronous code; returns a (len(texts), d) float32 matrix."""
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        return self._runner.run(self._embed_all(list(texts)))
+
+    async def aembed(self, texts: list[str]) -> np.ndarray:
+        """Awaitable variant usable from any event loop."""
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        return await self._runner.arun(self._embed_all(list(texts)))
+
+
+@lru_cache(maxsize=1)
+def get_embedding_client() -> OpenAIEmbeddingClient:
+    api_key = settings.OPENAI_API_KEY or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY is not set")
+    return OpenAIEmbeddingClient(
+        api_key=api_key,
+        model=settings.OPENAI_EMBEDDING_MODEL,
+        base_url=settings.OPENAI_BASE_URL,
+        batch_size=settings.OPENAI_BATCH_SIZE,
+        max_concurrency=settings.OPENAI_MAX_CONCURRENCY,
+        timeout=settings.OPENAI_TIMEOUT,
+        max_retries=settings.OPENAI_MAX_RETRIES,
+    )
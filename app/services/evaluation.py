@@ -0,0 +1,138 @@
+import time
+from dataclasses import asdict, dataclass
+from typing import Iterable
+
+import numpy as np
+
+from app.services.corpus_storage import CorpusMatrix, normalize_rows
+from app.services.datastore import BudgetData
+
+# 1 ブロックあたりのスコア行列（block × N float32）の上限。argpartition の作業領域も同程度
+DEFAULT_BLOCK_BYTES = 256 << 20
+
+
+@dataclass
+class LOONeighbors:
+    """Leave-one-out top-kmax neighbours of every corpus row (self excluded).
+
+    ``idx`` / ``sims`` are (N, kmax), each row sorted by descending similarity,
+    so the top-K for any K <= kmax is the first K columns.
+    """
+    idx: np.ndarray
+    sims: np.ndarray
+    seconds: float
+
+    @property
+    def kmax(self) -> int:
+        return int(self.idx.shape[1])
+
+
+@dataclass
+class SweepRow:
+    k: int
+    tau: float
+    n_targets: int      # 目的変数が正の有限値の行数（評価対象）
+    n_estimated: int    # うち Top-K に有効な近傍があり推定できた行数
+    coverage: float
+    mae_log: float      # mean |log(est) - log(y)|
+    rmse_log: float
+    median_ae_log: float
+    p90_ae_log: float
+    bias_log: float     # mean (log(est) - log(y))。正なら過大推定
+    within_2x: float    # |log 誤差| <= log 2 の割合
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def loo_neighbors(X: np.ndarray, kmax: int, storage: str = "float32",
+                  block_bytes: int = DEFAULT_BLOCK_BYTES, normalized: bool = False) -> LOONeighbors:
+    """Top-kmax neighbours of every row against all other rows, in row blocks.
+
+    The N×N similarity matrix is never materialized: each block of queries
+    (sized so block × N float32 fits ``block_bytes``) is scored against the
+    corpus, its own column is masked, and one argpartition keeps the top-kmax.
+    Queries are the float32 rows; the corpus side uses ``storage`` like the
+    serving index does.
+    """
+    t0 = time.perf_counter()
+    X_n = np.ascontiguousarray(X, dtype="float32") if normalized else normalize_rows(X)
+    N = X_n.shape[0]
+    kmax = int(min(kmax, max(N - 1, 0)))
+    corpus = CorpusMatrix(X_n, storage)
+    idx = np.empty((N, kmax), dtype="int64")
+    sims = np.empty((N, kmax), dtype="float32")
+    if kmax == 0:
+        return LOONeighbors(idx, sims, time.perf_counter() - t0)
+    block = max(1, int(block_bytes // max(N * 4, 1)))
+    for s in range(0, N, block):
+        e = min(s + block, N)
+        S = corpus.scores(X_n[s:e])  # (B, N)
+        S[np.arange(e - s), np.arange(s, e)] = -np.inf  # 自分自身を除外
+        part = np.argpartition(-S, kmax - 1, axis=1)[:, :kmax]
+        ps = np.take_along_axis(S, part, axis=1)
+        order = np.argsort(-ps, axis=1, kind="stable")
+        idx[s:e] = np.take_along_axis(part, order, axis=1)
+        sims[s:e] = np.take_along_axis(ps, order, axis=1)
+    return LOONeighbors(idx, sims, time.perf_counter() - t0)
+
+
+def sweep(nb: LOONeighbors, y: np.ndarray, ks: Iterable[int], taus: Iterable[float]) -> list[SweepRow]:
+    """Leave-one-out estimates and log-error metrics for every (K, τ) in the grid.
+
+    Uses the same estimator as ``predictor.predict_initial_budget_batch``:
+    softmax(sim/τ) over the top-K, restricted to neighbours with a positive
+    finite target and renormalized, then a weighted mean of log(y). Since the
+    restriction renormalizes, the softmax denominator cancels. For each τ,
+    cumulative sums over the sorted columns give the estimate for every K in
+    one O(N·kmax) pass.
+    """
+    y = np.asarray(y, dtype="float64")
+    ks = sorted({int(k) for k in ks if 0 < int(k) <= nb.kmax})
+    target_ok = np.isfinite(y) & (y > 0)
+    log_y = np.log(np.where(target_ok, y, 1.0))[target_ok]
+    n_targets = int(target_ok.sum())
+
+    vals = y[nb.idx[target_ok]]  # (M, kmax)
+    valid = np.isfinite(vals) & (vals > 0)
+    logv = np.log(np.where(valid, vals, 1.0))
+    sims = nb.sims[target_ok].astype("float64")
+    gap = sims - sims[:, :1]  # 最大値（先頭列）を引いておく（exp のオーバーフロー防止）
+
+    rows: list[SweepRow] = []
+    cols = np.asarray(ks) - 1
+    for tau in taus:
+        w = np.exp(gap / float(tau)) * valid
+        den = np.cumsum(w, axis=1)[:, cols]
+        num = np.cumsum(w * logv, axis=1)[:, cols]
+        for j, k in enumerate(ks):
+            ok = den[:, j] > 0
+            err = num[ok, j] / den[ok, j] - log_y[ok]
+            ae = np.abs(err)
+            n_est = int(ok.sum())
+            rows.append(SweepRow(
+                k=k,
+                tau=float(tau),
+                n_targets=n_targets,
+                n_estimated=n_est,
+                coverage=(n_est / n_targets) if n_targets else 0.0,
+                mae_log=float(ae.mean()) if n_est else float("nan"),
+                rmse_log=float(np.sqrt((err ** 2).mean())) if n_est else float("nan"),
+                median_ae_log=float(np.median(ae)) if n_est else float("nan"),
+                p90_ae_log=float(np.percentile(ae, 90)) if n_est else float("nan"),
+                bias_log=float(err.mean()) if n_est else float("nan"),
+                within_2x=float((ae <= np.log(2.0)).mean()) if n_est else float("nan"),
+            ))
+    return rows
+
+
+def evaluate(data: BudgetData, ks: Iterable[int], taus: Iterable[float], target: str = "initial",
+             storage: str = "float32", block_bytes: int = DEFAULT_BLOCK_BYTES) -> tuple[LOONeighbors, list[SweepRow]]:
+    """``loo_neighbors`` once for max(ks), then ``sweep`` over the grid for y_init (or y_final)."""
+    ks = list(ks)
+    y = data.y_init if target == "initial" else data.y_final
+    if y is None:
+        raise ValueError(f"no {target} budget column in the dataset")
+    nb = loo_neighbors(data.X1, max(ks), storage=storage, block_bytes=block_bytes,
+                       normalized=data.shared is not None)
+    return nb, sweep(nb, y, ks, taus)
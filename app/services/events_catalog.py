@@ -1,31 +1,68 @@
-from functools import lru_cache
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping
+import math
+import threading
+import weakref
 
 import numpy as np
 import pandas as pd
 
+from app.core.config import settings
+from app.services.dataset import normalize_ids
+from app.services.datastore import DatasetSnapshot, current_snapshot
+from app.services.name_index import NameIndex
+from app.utils.json_safe import clean_scalar
+from app.utils.telemetry import timed
 
-def _normalize_id_series(s: pd.Series) -> pd.Series:
-    def _norm_id(v):
-        try:
-            f = float(v)
-            if np.isfinite(f) and abs(f - int(f)) < 1e-9:
-                return str(int(f))
-        except Exception:
-            pass
-        v_str = str(v).strip()
-        if v_str.endswith(".0"):
-            return v_str[:-2]
-        return v_str
-    return s.map(_norm_id)
 
+# カタログが返すメタ列（adm_game.parquet からはこの列だけを読む）
+CATALOG_COLUMNS = (
+    "予算事業ID", "事業名", "事業の概要", "府省庁", "局・庁",
+    "当初予算", "歳出予算現額", "現状・課題", "事業概要URL",
+)
 
-@lru_cache(maxsize=1)
-def load_events_df() -> pd.DataFrame:
+EVENTS_DF_KEY = "events_df"
+
+
+def load_events_df(snapshot: DatasetSnapshot | None = None) -> pd.DataFrame:
     """Load events metadata, preferring selected_game.csv, but also merging adm_game.parquet.
-    Index is normalized string of 予算事業ID. Rows from selected_game.csv take precedence.
+    Index is normalized string of 予算事業ID. Rows from selected_game.csv take precedence;
+    rows appended to the dataset snapshot come last.
     """
+    return (snapshot or current_snapshot()).memo(EVENTS_DF_KEY, _read_events_df)
+
+
+def _align_columns(a: pd.DataFrame, b: pd.DataFrame) -> None:
+    for c in b.columns:
+        if c not in a.columns:
+            a[c] = np.nan
+    for c in a.columns:
+        if c not in b.columns:
+            b[c] = np.nan
+
+
+def with_appended_rows(df: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    """``df`` plus appended rows (APPEND_COLUMNS, normalized IDs) whose ID it does not have yet."""
+    extra = rows.copy()
+    extra["_ID_STR_"] = extra["予算事業ID"].astype(str)
+    extra = extra.set_index("_ID_STR_", drop=False)
+    extra = extra.loc[[key not in df.index for key in extra.index]]
+    missing = [c for c in extra.columns if c not in df.columns]
+    if missing:
+        df = df.assign(**{c: np.nan for c in missing})
+    return pd.concat([df, extra.reindex(columns=df.columns)], axis=0)
+
+
+def _read_events_df(snapshot: DatasetSnapshot) -> pd.DataFrame:
+    df = _read_catalog_files(snapshot)
+    if snapshot.appended is not None:
+        df = with_appended_rows(df, snapshot.appended)
+    return df
+
+
+def _read_catalog_files(snapshot: DatasetSnapshot) -> pd.DataFrame:
     base = Path("data")
     df_sel: pd.DataFrame | None = None
     df_all: pd.DataFrame | None = None
@@ -35,30 +72,22 @@ def load_events_df() -> pd.DataFrame:
         df_sel = pd.read_csv(csv_path)
         if "予算事業ID" not in df_sel.columns:
             raise ValueError("selected_game.csv must contain column '予算事業ID'")
-        df_sel["_ID_STR_"] = _normalize_id_series(df_sel["予算事業ID"]) 
+        df_sel["_ID_STR_"] = normalize_ids(df_sel["予算事業ID"])
         df_sel = df_sel.set_index("_ID_STR_", drop=False)
 
-    parq_path = base / "adm_game.parquet"
-    if parq_path.exists():
-        try:
-            df_all = pd.read_parquet(parq_path)
-            if "予算事業ID" in df_all.columns:
-                df_all["_ID_STR_"] = _normalize_id_series(df_all["予算事業ID"]) 
-                df_all = df_all.set_index("_ID_STR_", drop=False)
-            else:
-                df_all = None
-        except Exception:
-            df_all = None
+    try:
+        ds = snapshot.adm
+        if ds is not None and ds.ids is not None:
+            # 埋め込み列は読まない（datastore と共通の ID 配列でインデックス付け）
+            df_all = ds.read(CATALOG_COLUMNS)
+            df_all["_ID_STR_"] = ds.ids
+            df_all = df_all.set_index("_ID_STR_", drop=False)
+    except Exception:
+        df_all = None
 
     if df_sel is not None and df_all is not None:
         # Combine: selected overrides adm
-        # Align columns
-        missing_cols = [c for c in df_sel.columns if c not in df_all.columns]
-        for c in missing_cols:
-            df_all[c] = np.nan
-        missing_cols2 = [c for c in df_all.columns if c not in df_sel.columns]
-        for c in missing_cols2:
-            df_sel[c] = np.nan
+        _align_columns(df_all, df_sel)
         # concat, drop duplicates keeping first (df_sel first)
         df = pd.concat([df_sel, df_all.loc[~df_all.index.isin(df_sel.index)]], axis=0)
         return df
@@ -69,27 +98,221 @@ def load_events_df() -> pd.DataFrame:
     raise FileNotFoundError("No events metadata found: selected_game.csv or adm_game.parquet")
 
 
-def get_all_event_ids() -> list[str]:
-    df = load_events_df()
-    return df.index.astype(str).tolist()
+# get_event_meta が返すフィールド（予算事業ID 以外）
+META_FIELDS = (
+    "事業名", "事業の概要", "府省庁", "局・庁",
+    "当初予算", "歳出予算現額", "現状・課題", "事業概要URL",
+)
+
+
+@dataclass(frozen=True)
+class EventRecordStore:
+    """Immutable, column-oriented copy of the catalog fields served by the API.
+
+    ``positions`` maps an event id to its row; each field is a tuple of plain
+    Python values, so lookups need no pandas on the request path. NaN/Inf and
+    "nan" strings are turned into None here, once, so responses can be encoded
+    as-is.
+    """
+    ids: tuple[str, ...]
+    positions: Mapping[str, int]
+    columns: Mapping[str, tuple]
+    name_index: NameIndex
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame) -> "EventRecordStore":
+        ids, columns = cls._fields(df)
+        positions: dict[str, int] = {}
+        for i, key in enumerate(ids):
+            positions.setdefault(key, i)  # 重複 ID は先頭行（df.loc 相当の優先順）
+        return cls(
+            ids=ids,
+            positions=MappingProxyType(positions),
+            columns=MappingProxyType(columns),
+            name_index=NameIndex(columns["事業名"]),
+        )
+
+    @staticmethod
+    def _fields(df: pd.DataFrame) -> tuple[tuple[str, ...], dict[str, tuple]]:
+        ids = tuple(df.index.astype(str).tolist())
+        n = len(ids)
+        columns = {
+            c: (tuple(clean_scalar(v) for v in df[c].tolist()) if c in df.columns else (None,) * n)
+            for c in META_FIELDS
+        }
+        return ids, columns
+
+    def extended(self, df: pd.DataFrame) -> "EventRecordStore":
+        """A new store with the rows of ``df`` after this one's; only those rows are converted."""
+        ids, columns = self._fields(df)
+        off = len(self.ids)
+        positions = dict(self.positions)
+        for i, key in enumerate(ids):
+            positions.setdefault(key, off + i)
+        return EventRecordStore(
+            ids=self.ids + ids,
+            positions=MappingProxyType(positions),
+            columns=MappingProxyType({c: self.columns[c] + columns[c] for c in META_FIELDS}),
+            name_index=self.name_index.extended(columns["事業名"]),
+        )
+
+    def meta(self, event_id: str) -> dict[str, Any]:
+        key = str(event_id)
+        i = self.positions.get(key)
+        if i is None:
+            raise KeyError(f"event id not found: {event_id}")
+        return self._row(i)
+
+    def _row(self, i: int) -> dict[str, Any]:
+        result: dict[str, Any] = {"予算事業ID": self.ids[i]}
+        for c in META_FIELDS:
+            result[c] = self.columns[c][i]
+        return result
+
+    def meta_by_name(self, name: str) -> dict[str, Any]:
+        """事業名の完全一致、無ければカタログ順で最初の部分一致の行。"""
+        i = self.name_index.first_match(name)
+        if i is None:
+            raise KeyError(f"event name not found: {name}")
+        return self._row(i)
+
+    def search_name(self, name: str, limit: int = 10, fuzzy: bool = True) -> list[dict[str, Any]]:
+        """事業名の n-gram 検索。各要素は meta に match/score を加えたもの。"""
+        out = []
+        for hit in self.name_index.search(name, limit=limit, fuzzy=fuzzy):
+            row = self._row(hit["position"])
+            row["match"] = hit["match"]
+            row["score"] = hit["score"]
+            out.append(row)
+        return out
+
+
+EVENT_STORE_KEY = "event_store"
+
+
+def load_event_store(snapshot: DatasetSnapshot | None = None) -> EventRecordStore:
+    return (snapshot or current_snapshot()).memo(EVENT_STORE_KEY, _build_event_store)
+
+
+@timed("catalog_load")
+def _build_event_store(snapshot: DatasetSnapshot) -> EventRecordStore:
+    return EventRecordStore.from_df(load_events_df(snapshot))
 
 
+def get_all_event_ids() -> tuple[str, ...]:
+    return load_event_store().ids
+
+
+def has_event_id(event_id: str) -> bool:
+    return str(event_id) in load_event_store().positions
+
+
+@timed("catalog_search")
+def search_events_by_name(name: str, limit: int = 10, fuzzy: bool = True) -> list[dict[str, Any]]:
+    return load_event_store().search_name(name, limit=limit, fuzzy=fuzzy)
+
+
+@timed("catalog_lookup")
 def get_event_meta(event_id: str) -> dict[str, Any]:
-    df = load_events_df()
-    key = str(event_id)
-    if key not in df.index:
-        raise KeyError(f"event id not found: {event_id}")
-    row = df.loc[key]
     # return a compact subset while keeping original columns when present
-    result: dict[str, Any] = {
-        "予算事業ID": key,
-        "事業名": row.get("事業名", None),
-        "事業の概要": row.get("事業の概要", None),
-        "府省庁": row.get("府省庁", None),
-        "局・庁": row.get("局・庁", None),
-        "当初予算": row.get("当初予算", None),
-        "歳出予算現額": row.get("歳出予算現額", None),
-        "現状・課題": row.get("現状・課題", None),
-        "事業概要URL": row.get("事業概要URL", None),
-    }
-    return result
+    return load_event_store().meta(event_id)
+
+
+@timed("catalog_lookup")
+def get_event_meta_by_name(name: str) -> dict[str, Any]:
+    return load_event_store().meta_by_name(name)
+
+
+class AIReferenceTable:
+    """Precomputed AI reference estimates (estimate_initial) per event id.
+
+    The input text is the event's 現状・課題 (or 事業の概要 as a fallback). Missing
+    entries are embedded and scored together in a single batched pass; results are
+    memoized, so repeated lookups are O(1) dict reads. Catalog and estimates come
+    from one dataset snapshot.
+    """
+
+    def __init__(self, snapshot: DatasetSnapshot | None = None):
+        # 版の memo がこの表を持つので弱参照にする（循環参照で古い版の解放が GC 待ちにならないように）
+        self._snapshot = weakref.ref(snapshot or current_snapshot())
+        self._values: dict[str, float | None] = {}
+        self._lock = threading.Lock()
+
+    def ensure(self, event_ids: Iterable[str]) -> None:
+        # 循環 import を避けるため遅延 import
+        from app.services.embedding import embed_texts_to_mat
+        from app.services.predictor import predict_initial_budget_batch
+
+        with self._lock:
+            missing = [str(e) for e in dict.fromkeys(event_ids) if str(e) not in self._values]
+            if not missing:
+                return
+            snap = self._snapshot() or current_snapshot()
+            store = load_event_store(snap)
+            ids: list[str] = []
+            texts: list[str] = []
+            for eid in missing:
+                try:
+                    meta = store.meta(eid)
+                except KeyError:
+                    self._values[eid] = None
+                    continue
+                text = meta.get("現状・課題") or meta.get("事業の概要") or None
+                if isinstance(text, str) and text.strip():
+                    ids.append(eid)
+                    texts.append(text)
+                else:
+                    self._values[eid] = None
+            if not ids:
+                return
+
+            values: list[float | None] = [None] * len(ids)
+            try:
+                x_dim = int(snap.data.X1.shape[1])
+                Q, errors = embed_texts_to_mat(texts, dim=x_dim, normalize=True)
+                ok = [i for i, err in enumerate(errors) if err is None]
+                preds = predict_initial_budget_batch(Q[ok], snapshot=snap) if ok else []
+                for i, pr in zip(ok, preds):
+                    if pr.get("can_estimate"):
+                        ev = float(pr["estimate_initial"])
+                        values[i] = ev if math.isfinite(ev) else None
+            except Exception:
+                # 参考値は任意項目。推定に失敗しても None のまま扱う
+                pass
+            self._values.update(zip(ids, values))
+
+    def get(self, event_id: str) -> float | None:
+        key = str(event_id)
+        if key not in self._values:
+            self.ensure([key])
+        return self._values.get(key)
+
+    def extended(self, snapshot: DatasetSnapshot) -> "AIReferenceTable":
+        """The table for a snapshot with appended rows: computed values are kept, new ids fill lazily.
+
+        Appends only add rows, so the parent's estimates are reused instead of
+        re-scoring every scheduled event on each append.
+        """
+        table = AIReferenceTable(snapshot)
+        with self._lock:
+            table._values.update(self._values)
+        return table
+
+
+AI_REFERENCES_KEY = "ai_references"
+
+
+def load_ai_references(snapshot: DatasetSnapshot | None = None) -> AIReferenceTable:
+    """Build the AI reference table once per dataset snapshot.
+
+    Events that the default game schedule can reach are precomputed up front;
+    any other event id is filled lazily (batched) on first lookup.
+    """
+    return (snapshot or current_snapshot()).memo(AI_REFERENCES_KEY, _build_ai_references)
+
+
+def _build_ai_references(snapshot: DatasetSnapshot) -> AIReferenceTable:
+    table = AIReferenceTable(snapshot)
+    n_default = settings.GAME_YEARS * settings.GAME_EVENTS_PER_YEAR
+    table.ensure(load_event_store(snapshot).ids[:n_default])
+    return table
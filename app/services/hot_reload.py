@@ -0,0 +1,175 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+import numpy as np
+import pandas as pd
+
+from app.services.dataset import normalize_ids
+from app.services.datastore import (
+    APPEND_COLUMNS, DatasetSnapshot, activate_snapshot, current_snapshot, extend_snapshot,
+    load_snapshot, peek_snapshot, write_append_log,
+)
+from app.services.embedding import embed_texts_to_mat
+from app.services.events_catalog import (
+    AI_REFERENCES_KEY, EVENT_STORE_KEY, EVENTS_DF_KEY, load_event_store, with_appended_rows,
+)
+from app.services.predictor import EVIDENCE_KEY, EvidenceColumns
+from app.services.shared_corpus import detach
+from app.services.similarity import INDEX_KEY, extend_index
+from app.services.warmup import StageTiming, preload_stages, run_stages
+
+
+class DatasetBusy(RuntimeError):
+    """Another reload / append is already running in this process."""
+
+
+class DatasetUpdateFailed(RuntimeError):
+    """A required warm-up stage failed; the new snapshot was not activated."""
+
+    def __init__(self, stages: list[StageTiming]):
+        failed = [f"{s.stage}: {s.error}" for s in stages if not s.ok and s.required]
+        super().__init__("; ".join(failed))
+        self.stages = stages
+
+
+_busy = threading.Lock()
+
+
+@contextmanager
+def _exclusive() -> Iterator[None]:
+    if not _busy.acquire(blocking=False):
+        raise DatasetBusy("a dataset reload or append is already running")
+    try:
+        yield
+    finally:
+        _busy.release()
+
+
+def _warm(snap: DatasetSnapshot) -> list[StageTiming]:
+    # 新しい版のカタログ・インデックス等を作り終えてから差し替える（その間も旧版で応答し続ける）
+    ok, stages = run_stages(preload_stages(snap))
+    if not ok:
+        raise DatasetUpdateFailed(stages)
+    return stages
+
+
+def _swap(snap: DatasetSnapshot, expected: DatasetSnapshot | None, t0: float,
+          stages: list[StageTiming]) -> dict[str, Any]:
+    prev = activate_snapshot(snap, expected=expected)
+    return {
+        **snap.info(),
+        "previous_version": prev.version if prev is not None else None,
+        "seconds": time.perf_counter() - t0,
+        "stages": [vars(s).copy() for s in stages],
+    }
+
+
+def reload_dataset() -> dict[str, Any]:
+    """Re-read the data files (and the append log) into a new snapshot, warm it, and swap it in.
+
+    Requests already running keep the snapshot they started with.
+    """
+    with _exclusive():
+        t0 = time.perf_counter()
+        expected = peek_snapshot()
+        snap = load_snapshot("reload")
+        result = _swap(snap, expected, t0, _warm(snap))
+        old = expected.data.shared if expected is not None else None
+        if old is not None and old is not snap.data.shared:
+            detach(old)  # データが変わった: 旧セグメントは他に使うワーカーが無くなれば削除される
+        return result
+
+
+def _texts(rows: pd.DataFrame) -> list[str]:
+    # AI 参考値と同じく 現状・課題（無ければ 事業の概要）を埋め込む
+    out = []
+    for issue, overview in zip(rows["現状・課題"].tolist(), rows["事業の概要"].tolist()):
+        text = next((t for t in (issue, overview) if isinstance(t, str) and t.strip()), "")
+        out.append(text)
+    return out
+
+
+def _embeddings(rows: pd.DataFrame, given: list[list[float] | None], dim: int) -> np.ndarray:
+    X = np.zeros((len(rows), dim), dtype="float32")
+    todo = []
+    for i, vec in enumerate(given):
+        if vec is None:
+            todo.append(i)
+            continue
+        v = np.asarray(vec, dtype="float32")
+        if v.shape != (dim,) or not np.isfinite(v).all():
+            raise ValueError(f"row {i}: embedding must be {dim} finite numbers")
+        X[i] = v
+    if todo:
+        texts = _texts(rows.iloc[todo])
+        empty = [todo[j] for j, t in enumerate(texts) if not t]
+        if empty:
+            raise ValueError(f"rows {empty[:10]}: no embedding and no 現状・課題 / 事業の概要 text")
+        Q, errors = embed_texts_to_mat(texts, dim=dim, normalize=True)
+        failed = [f"row {todo[j]}: {err}" for j, err in enumerate(errors) if err is not None]
+        if failed:
+            raise ValueError("; ".join(failed[:10]))
+        X[todo] = Q
+    return X
+
+
+def _carry_over(parent: DatasetSnapshot, child: DatasetSnapshot) -> None:
+    """Seed the child with the parent's built structures plus its new rows, instead of rebuilding them.
+
+    Whatever the parent has not built yet is built from scratch on first use.
+    """
+    n = parent.n_rows
+    data = child.data
+    if (index := parent.peek(INDEX_KEY)) is not None:
+        child.seed(INDEX_KEY, extend_index(index, data.X1[n:], normalized=data.shared is not None))
+    if (cols := parent.peek(EVIDENCE_KEY)) is not None:
+        child.seed(EVIDENCE_KEY, cols.extended(EvidenceColumns.from_frame(data.df.iloc[n:], data.ids[n:])))
+    if (events := parent.peek(EVENTS_DF_KEY)) is not None:
+        merged = with_appended_rows(events, child.appended.iloc[n - child.n_rows:])
+        child.seed(EVENTS_DF_KEY, merged)
+        if (store := parent.peek(EVENT_STORE_KEY)) is not None:
+            child.seed(EVENT_STORE_KEY, store.extended(merged.iloc[len(events):]))
+    if (refs := parent.peek(AI_REFERENCES_KEY)) is not None:
+        child.seed(AI_REFERENCES_KEY, refs.extended(child))
+
+
+def append_rows(rows: list[dict[str, Any]]) -> dict[str, Any]:
+    """Add rows to the active dataset without rebuilding it; returns the new snapshot's info.
+
+    Each row has APPEND_COLUMNS keys (予算事業ID required, new) and optionally
+    ``embedding``; rows without one are embedded from their text. The new
+    snapshot's index is the parent's extended with the new rows (see
+    ``similarity.DeltaIndex``), and its catalog the parent's plus these rows.
+    The rows are saved to the append log (DATASET_APPEND_PATH) right before
+    the swap, so reloads and restarts keep them. ValueError for invalid rows.
+    """
+    if not rows:
+        raise ValueError("no rows to append")
+    with _exclusive():
+        t0 = time.perf_counter()
+        parent = current_snapshot()
+        meta = pd.DataFrame([{c: r.get(c) for c in APPEND_COLUMNS} for r in rows], columns=list(APPEND_COLUMNS))
+        ids = normalize_ids(meta["予算事業ID"])
+        blank = [i for i, v in enumerate(ids.tolist()) if v in ("", "nan", "None")]
+        if blank:
+            raise ValueError(f"rows {blank[:10]}: 予算事業ID is required")
+        dup = sorted(ids[ids.duplicated()].unique().tolist())
+        if dup:
+            raise ValueError(f"duplicate 予算事業ID in request: {dup[:10]}")
+        known = load_event_store(parent).positions
+        taken = set(parent.data.ids.tolist()) if parent.data.ids is not None else set()
+        exists = [v for v in ids.tolist() if v in known or v in taken]
+        if exists:
+            raise ValueError(f"予算事業ID already in the dataset: {exists[:10]}")
+        meta["予算事業ID"] = ids
+
+        X = _embeddings(meta, [r.get("embedding") for r in rows], int(parent.data.X1.shape[1]))
+        child = extend_snapshot(parent, meta, X)
+        _carry_over(parent, child)
+        stages = _warm(child)
+        log = write_append_log(meta, X)
+        result = _swap(child, parent, t0, stages)
+        result.update(appended=len(meta), append_log=str(log) if log is not None else None)
+        return result
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.corpus_storage import CorpusMatrix
+
+# ブロック単位で割当計算（(block, nlist) の一時配列に抑える）
+_ASSIGN_BLOCK = 8192
+
+
+def corpus_fingerprint(X: np.ndarray) -> str:
+    """Cheap fingerprint of a corpus matrix (shape + strided sample of rows)."""
+    h = hashlib.blake2b(digest_size=12)
+    h.update(np.asarray(X.shape, dtype="int64").tobytes())
+    step = max(1, X.shape[0] // 1024)
+    h.update(np.ascontiguousarray(X[::step]).tobytes())
+    if X.shape[0]:
+        h.update(np.ascontiguousarray(X[-1]).tobytes())
+    return h.hexdigest()
+
+
+def _assign(X: np.ndarray, C: np.ndarray) -> np.ndarray:
+    out = np.empty((X.shape[0],), dtype="int32")
+    for s in range(0, X.shape[0], _ASSIGN_BLOCK):
+        out[s:s + _ASSIGN_BLOCK] = np.argmax(X[s:s + _ASSIGN_BLOCK] @ C.T, axis=1)
+    return out
+
+
+def train_centroids(X: np.ndarray, nlist: int, n_iter: int = 10, seed: int = 0,
+                    max_train: int | None = None) -> np.ndarray:
+    """Spherical k-means (cosine) on L2-normalized rows; returns (nlist, d) unit centroids."""
+    rng = np.random.default_rng(seed)
+    N = X.shape[0]
+    max_train = max_train or 256 * nlist
+    train = X[rng.choice(N, size=max_train, replace=False)] if N > max_train else np.asarray(X)
+    C = np.array(train[rng.choice(train.shape[0], size=nlist, replace=False)], dtype="float32")
+    for _ in range(n_iter):
+        a = _assign(train, C)
+        counts = np.bincount(a, minlength=nlist)
+        sums = np.zeros_like(C)
+        order = np.argsort(a, kind="stable")
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)])[nonempty]
+        sums[nonempty] = np.add.reduceat(train[order], starts, axis=0)
+        empty = counts == 0
+        if empty.any():
+            # 空クラスタは訓練データからランダムに再初期化
+            sums[empty] = train[rng.choice(train.shape[0], size=int(empty.sum()), replace=False)]
+        C = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-12)
+        C = C.astype("float32")
+    return C
+
+
+class IVFIndex:
+    """Approximate cosine index: k-means coarse quantizer + inverted lists.
+
+    Rows are stored grouped by cluster (``X_perm``), so probing a cluster scans
+    one contiguous slice. ``search``/``search_batch`` match SimilarityIndex.
+    """
+
+    def __init__(self, X_n: np.ndarray, nlist: int, nprobe: int, n_iter: int = 10,
+                 seed: int = 0, cache_dir: str | Path | None = None, storage: str = "float32"):
+        t0 = time.perf_counter()
+        X_n = np.asarray(X_n, dtype="float32")
+        N = X_n.shape[0]
+        self.nlist = int(max(1, min(nlist, N)))
+        self.nprobe = int(max(1, min(nprobe, self.nlist)))
+
+        centroids = assign = None
+        cache_path = None
+        if cache_dir is not None:
+            fp = corpus_fingerprint(X_n)
+            cache_path = Path(cache_dir) / f"ivf.{fp}.n{self.nlist}.s{seed}.npz"
+            if cache_path.exists():
+                try:
+                    z = np.load(cache_path)
+                    if z["assign"].shape[0] == N and z["centroids"].shape == (self.nlist, X_n.shape[1]):
+                        centroids, assign = z["centroids"], z["assign"]
+                except Exception:
+                    pass  # 壊れたキャッシュは学習し直して上書きする
+        if centroids is None:
+            centroids = train_centroids(X_n, self.nlist, n_iter=n_iter, seed=seed)
+            assign = _assign(X_n, centroids)
+            if cache_path is not None:
+                try:
+                    cache_path.parent.mkdir(parents=True, exist_ok=True)
+                    # 同時に学習したワーカーが同じ一時ファイルに書かないよう、名前はプロセスごと
+                    tmp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp.npz")
+                    np.savez(tmp, centroids=centroids, assign=assign)
+                    tmp.replace(cache_path)
+                except OSError:
+                    pass
+
+        self.centroids = np.ascontiguousarray(centroids, dtype="float32")
+        order = np.argsort(assign, kind="stable")
+        self.ids = order.astype("int64")  # X_perm の行 → 元の行番号
+        self.X_perm = CorpusMatrix(np.ascontiguousarray(X_n[order]), storage)
+        counts = np.bincount(assign, minlength=self.nlist)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype("int64")
+        self.build_seconds = time.perf_counter() - t0
+
+    @property
+    def storage(self) -> str:
+        return self.X_perm.mode
+
+    @property
+    def n_items(self) -> int:
+        return int(self.X_perm.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self.X_perm.shape[1])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.X_perm.nbytes + self.centroids.nbytes + self.ids.nbytes + self.offsets.nbytes)
+
+    def search(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        q = np.asarray(query, dtype="float32").reshape(1, -1)
+        idx, scores = self.search_batch(q, k)
+        return idx[0], scores[0]
+
+    def search_batch(self, queries: np.ndarray, k: int, nprobe: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        Q = np.asarray(queries, dtype="float32")
+        if Q.ndim != 2 or Q.shape[1] != self.dim:
+            raise ValueError(f"query dim {Q.shape[-1]} != X1 dim {self.dim}")
+        Q = Q / (np.linalg.norm(Q, axis=1, keepdims=True) + 1e-12)
+        K = int(min(k, self.n_items))
+        if K <= 0:
+            return np.zeros((Q.shape[0], 0), dtype="int64"), np.zeros((Q.shape[0], 0), dtype="float32")
+        nprobe = int(max(1, min(nprobe or self.nprobe, self.nlist)))
+        out_idx = np.empty((Q.shape[0], K), dtype="int64")
+        out_sc = np.empty((Q.shape[0], K), dtype="float32")
+        sizes = np.diff(self.offsets)
+        C_order = np.argsort(-(Q @ self.centroids.T), axis=1)
+        for b in range(Q.shape[0]):
+            probes = C_order[b, :nprobe]
+            # 候補が K 件に満たない場合は次に近いクラスタを追加で探索
+            n_cand = int(sizes[probes].sum())
+            p = nprobe
+            while n_cand < K and p < self.nlist:
+                n_cand += int(sizes[C_order[b, p]])
+                p += 1
+            probes = C_order[b, :p]
+            # クラスタごとに連続スライスを走査（行のコピーを作らない）
+            rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in probes])
+            q = Q[b:b + 1]
+            s = np.concatenate([self.X_perm.scores(q, self.offsets[c], self.offsets[c + 1])[0] for c in probes])
+            top = np.argpartition(-s, K - 1)[:K] if K < s.shape[0] else np.arange(s.shape[0])
+            top = top[np.argsort(-s[top])]
+            out_idx[b] = self.ids[rows[top]]
+            out_sc[b] = s[top]
+        return out_idx, out_sc
@@ -0,0 +1,157 @@
+import unicodedata
+from typing import Any, Sequence
+
+import numpy as np
+
+# 一致種別の優先順（大きいほど上位）
+_RANK = {"exact": 3, "prefix": 2, "substring": 1, "fuzzy": 0}
+
+
+def _norm(s: str) -> str:
+    return unicodedata.normalize("NFKC", s).casefold().strip()
+
+
+def _grams(s: str, n: int) -> set[str]:
+    if len(s) < n:
+        return set()
+    return {s[i:i + n] for i in range(len(s) - n + 1)}
+
+
+class NameIndex:
+    """Character n-gram inverted index over 事業名 (no tokenizer needed for Japanese).
+
+    Unigram/bigram/trigram postings narrow candidates for prefix and substring
+    matches, which are then verified with ``in``; bigram overlap (Dice) ranks
+    fuzzy matches. Names are NFKC-normalized and case-folded on both sides;
+    ``first_match`` compares the names as given, so names that normalization
+    changes are always checked directly instead of through the postings.
+    """
+
+    def __init__(self, names: Sequence[Any]):
+        self._raw: list[str | None] = [n if isinstance(n, str) else None for n in names]
+        self._names: list[str] = [(_norm(n) if isinstance(n, str) else "") for n in names]
+        self._exact: dict[str, int] = {}
+        postings: dict[str, list[int]] = {}
+        n_bigrams = np.zeros((len(self._names),), dtype="int32")
+        for i, name in enumerate(self._names):
+            if not name:
+                continue
+            self._exact.setdefault(name, i)
+            for n in (1, 2, 3):
+                for g in _grams(name, n):
+                    postings.setdefault(g, []).append(i)
+            n_bigrams[i] = len(_grams(name, 2))
+        self._postings = {g: np.asarray(v, dtype="int32") for g, v in postings.items()}
+        self._n_bigrams = n_bigrams
+        # 正規化で変わる名前（全角・互換文字・大文字・前後の空白など）。生の部分一致は n-gram で絞れない
+        self._irregular = np.asarray(
+            [i for i, (raw, name) in enumerate(zip(self._raw, self._names)) if raw is not None and raw != name],
+            dtype="int32",
+        )
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def extended(self, names: Sequence[Any]) -> "NameIndex":
+        """A new index with ``names`` appended (positions continue after this one's).
+
+        Only the new names are tokenized; postings of the grams they touch are
+        copied with the new positions at the end (so stay sorted), the rest are
+        shared with this index, which is left unchanged.
+        """
+        tail = NameIndex(names)
+        off = len(self._names)
+        out = NameIndex.__new__(NameIndex)
+        out._raw = self._raw + tail._raw
+        out._names = self._names + tail._names
+        out._exact = dict(self._exact)
+        for name, i in tail._exact.items():
+            out._exact.setdefault(name, i + off)
+        out._postings = dict(self._postings)
+        for g, p in tail._postings.items():
+            old = out._postings.get(g)
+            out._postings[g] = p + off if old is None else np.concatenate([old, p + off])
+        out._n_bigrams = np.concatenate([self._n_bigrams, tail._n_bigrams])
+        out._irregular = np.concatenate([self._irregular, tail._irregular + off])
+        return out
+
+    def _substring_candidates(self, q: str) -> np.ndarray:
+        n = min(3, len(q))
+        lists = [self._postings.get(g) for g in _grams(q, n)]
+        if not lists or any(p is None for p in lists):
+            return np.zeros((0,), dtype="int32")
+        lists.sort(key=len)
+        cand = lists[0]
+        for p in lists[1:]:
+            cand = np.intersect1d(cand, p, assume_unique=True)
+            if cand.size == 0:
+                break
+        return cand
+
+    def first_match(self, query: str) -> int | None:
+        """Position of the first name equal to ``query``, else of the first name containing it.
+
+        Catalog order, case- and width-sensitive (the behaviour of
+        /v1/events/meta_by_name). The n-gram postings only narrow the candidates
+        among names that normalization leaves unchanged; the others, and every
+        name when normalization changes the query itself, are checked one by one.
+        """
+        if not query:
+            return 0 if self._raw else None
+        q = _norm(query)
+        if not q or q != query.strip():
+            cand = range(len(self._raw))  # 正規化でクエリが変わる: 絞り込まずに先頭から
+        else:
+            cand = np.union1d(self._substring_candidates(q), self._irregular).tolist()  # 昇順（カタログ順）
+        for i in cand:
+            if self._raw[i] == query:
+                return i
+        for i in cand:
+            raw = self._raw[i]
+            if raw is not None and query in raw:
+                return i
+        return None
+
+    def search(self, query: str, limit: int = 10, fuzzy: bool = True,
+               min_similarity: float = 0.25) -> list[dict[str, Any]]:
+        """Ranked matches: exact > prefix > substring (> fuzzy when enabled).
+
+        Returns ``[{"position", "match", "score"}]``; ties keep catalog order
+        (shorter names first within prefix/substring).
+        """
+        q = _norm(query or "")
+        if not q or limit <= 0:
+            return []
+        hits: list[tuple[int, float, int, str]] = []  # (rank, score, position, kind)
+        seen: set[int] = set()
+
+        exact = self._exact.get(q)
+        if exact is not None:
+            hits.append((_RANK["exact"], 1.0, exact, "exact"))
+            seen.add(exact)
+
+        for i in self._substring_candidates(q).tolist():
+            if i in seen:
+                continue
+            name = self._names[i]
+            if q not in name:
+                continue
+            kind = "prefix" if name.startswith(q) else "substring"
+            hits.append((_RANK[kind], len(q) / len(name), i, kind))
+            seen.add(i)
+
+        if fuzzy and len(hits) < limit:
+            qg = _grams(q, 2) if len(q) >= 2 else _grams(q, 1)
+            lists = [self._postings[g] for g in qg if g in self._postings]
+            if lists:
+                # 候補（クエリの bigram を含む行）のポスティングだけを数える（全行長の配列は作らない）
+                cand, counts = np.unique(np.concatenate(lists), return_counts=True)
+                denom = len(qg) + np.maximum(self._n_bigrams[cand], 1)
+                dice = 2.0 * counts / denom
+                keep = dice >= min_similarity
+                for i, sc in zip(cand[keep].tolist(), dice[keep].tolist()):
+                    if i not in seen:
+                        hits.append((_RANK["fuzzy"], float(min(sc, 1.0)), i, "fuzzy"))
+
+        hits.sort(key=lambda h: (-h[0], -h[1], h[2]))
+        return [{"position": i, "match": kind, "score": score} for _, score, i, kind in hits[:limit]]
@@ -2,101 +2,226 @@ import numpy as np
 import pandas as pd
 from typing import Any
 from app.core.config import settings
-from app.services.datastore import load_budget_data, BudgetData
+from app.services.datastore import BudgetData, DatasetSnapshot, current_snapshot, reference_embeddings
+from app.services.similarity import SimilarityIndex, get_similarity_index
+from app.utils.json_safe import clean_scalar
+from app.utils.telemetry import observe_since, stage_histogram
 import math
+import time
+from dataclasses import dataclass
 
-def _normalize_rows(M: np.ndarray) -> np.ndarray:
-    M = np.asarray(M, dtype="float32")
-    if M.ndim == 1: M = M[None, :]
-    n = np.linalg.norm(M, axis=1, keepdims=True) + 1e-12
-    return M / n
+# 推定ごとに通る段階のヒストグラム（呼び出しごとにタイマーを作らない）
+_SEARCH_HIST = stage_histogram("similarity_search")
+_AGGREGATE_HIST = stage_histogram("aggregate")
+_EVIDENCE_HIST = stage_histogram("evidence_rows")
 
-def _softmax_1d(x: np.ndarray, tau: float) -> np.ndarray:
-    z = x / tau
-    z -= z.max()
+def _softmax_rows(x: np.ndarray, tau: float) -> np.ndarray:
+    """行ごとの温度付きソフトマックス（x: (B, K)）。"""
+    z = np.asarray(x, dtype="float64") / tau
+    z -= z.max(axis=1, keepdims=True)
     e = np.exp(z)
-    return e / (e.sum() + 1e-12)
+    return e / (e.sum(axis=1, keepdims=True) + 1e-12)
 
-def _weighted_log_mean(values: np.ndarray, weights: np.ndarray) -> float:
+def _masked_log_mean(values: np.ndarray, weights: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """正の有限値のみを使った行ごとの対数加重平均。
+
+    Returns (estimates (B,), renormalized weights (B, K), mask (B, K)).
+    有効値が一つもない行の推定値は NaN。
+    """
     v = np.asarray(values, dtype="float64")
-    w = np.asarray(weights, dtype="float64")
-    return float(np.exp((w * np.log(v)).sum()))
+    mask = np.isfinite(v) & (v > 0)
+    w = np.where(mask, weights, 0.0)
+    w = w / (w.sum(axis=1, keepdims=True) + 1e-12)
+    logv = np.log(np.where(mask, v, 1.0))
+    est = np.exp((w * logv).sum(axis=1))
+    est = np.where(mask.any(axis=1), est, np.nan)
+    return est, w, mask
 
-def predict_initial_budget(query_vec: np.ndarray) -> dict[str, Any]:
-    """当初予算の推定とTop-K根拠を返す（単一クエリベクトル）。
+@dataclass(frozen=True)
+class EvidenceColumns:
+    """Top-K 根拠表の列を行番号に揃えた配列（ロード時に一度だけ作る）。
 
-    既存の X1（目的・課題の埋め込み）のみを使用し、線形結合は行わない。
+    names / budget_ids は object 配列（欠損は None）、initial / final は float64
+    （欠損は NaN）。リクエスト時は idx によるファンシーインデックスだけで引く。
+    """
+    names: np.ndarray
+    budget_ids: np.ndarray
+    initial: np.ndarray
+    final: np.ndarray
+
+    @classmethod
+    def from_data(cls, data: BudgetData) -> "EvidenceColumns":
+        return cls.from_frame(data.df, data.ids)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, ids: np.ndarray | None = None) -> "EvidenceColumns":
+        n = len(df)
+
+        def _num(col: str) -> np.ndarray:
+            if col not in df.columns:
+                return np.full((n,), np.nan)
+            return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+        if "事業名" in df.columns:
+            names = np.array([clean_scalar(v) for v in df["事業名"].tolist()], dtype=object)
+        else:
+            names = np.full((n,), "", dtype=object)
+        # events_catalog と同じ正規化済み ID を優先（"123.0" ではなく "123"）
+        if ids is not None:
+            raw_ids = [str(v) for v in ids]
+        elif "予算事業ID" in df.columns:
+            raw_ids = [str(v) if pd.notna(v) else None for v in df["予算事業ID"].tolist()]
+        else:
+            raw_ids = [None] * n
+        budget_ids = np.array([None if v is None or v.lower() == "nan" else v for v in raw_ids], dtype=object)
+        return cls(names=names, budget_ids=budget_ids, initial=_num("当初予算"), final=_num("歳出予算現額"))
+
+    def extended(self, other: "EvidenceColumns") -> "EvidenceColumns":
+        return EvidenceColumns(*(np.concatenate([a, b]) for a, b in zip(
+            (self.names, self.budget_ids, self.initial, self.final),
+            (other.names, other.budget_ids, other.initial, other.final))))
+
+
+EVIDENCE_KEY = "evidence_columns"
+
+
+def evidence_columns(snapshot: DatasetSnapshot | None = None) -> EvidenceColumns:
+    return (snapshot or current_snapshot()).memo(EVIDENCE_KEY, lambda s: EvidenceColumns.from_data(s.data))
+
+
+def _finite_or_none(a: np.ndarray) -> list[float | None]:
+    return [v if ok else None for v, ok in zip(a.tolist(), np.isfinite(a).tolist())]
+
+
+def _evidence_rows(cols: EvidenceColumns, idx: np.ndarray, sims: np.ndarray, weights: np.ndarray) -> list[dict[str, Any]]:
+    """Top-K 根拠テーブル（idx/sims/weights はマスク適用済みの 1D 配列）。
+
+    列は EvidenceColumns から一括で引く。NaN/Inf は None（API はこの dict をそのまま JSON 化する）。
     """
-    data: BudgetData = load_budget_data()
-    X_n = _normalize_rows(data.X1)
-    Q_n = _normalize_rows(np.asarray(query_vec, "float32"))
-
-    if Q_n.shape[1] != X_n.shape[1]:
-        return {"can_estimate": False, "reason": f"query dim {Q_n.shape[1]} != X1 dim {X_n.shape[1]}"}
-
-    S = Q_n @ X_n.T
-
-    scores = S[0]  # 単一クエリ想定
-    K = int(min(settings.TOPK, scores.shape[0]))
-    idx = np.argpartition(-scores, K-1)[:K]
-    idx = idx[np.argsort(-scores[idx])]
-    sims = scores[idx]
-    weights = _softmax_1d(sims, tau=settings.TAU)
-
-    init_budget = data.y_init[idx].astype("float64")
-    mask = np.isfinite(init_budget) & (init_budget > 0)
-    if mask.sum() == 0:
-        return {"can_estimate": False, "reason": "no valid initial budget in top-k"}
-
-    # マスク適用＆重み再正規化
-    sims_f = sims[mask]
-    w_f = weights[mask]
-    init_f = init_budget[mask]
-    w_f = w_f / (w_f.sum() + 1e-12)
-
-    est_init = _weighted_log_mean(init_f, w_f)
-
-    # 現額の推定（任意）
-    est_final: float | None = None
-    if data.y_final is not None:
-        yfin_all = np.asarray(data.y_final[idx].astype("float64"))
-        mask_fin = np.isfinite(yfin_all) & (yfin_all > 0)
-        if mask_fin.any():
-            yfin = yfin_all[mask_fin]
-            w_fin = weights[mask_fin]
-            w_fin = w_fin / (w_fin.sum() + 1e-12)
-            est_final = _weighted_log_mean(yfin, w_fin)
-
-    # 根拠テーブル
-    df = data.df
-    col_name   = "事業名" if "事業名" in df.columns else None
-    col_init   = "当初予算" if "当初予算" in df.columns else None
-    col_final  = "歳出予算現額" if "歳出予算現額" in df.columns else None
-    col_id     = "予算事業ID" if "予算事業ID" in df.columns else None
-
-    rows = []
-    for rank, j in enumerate(idx[mask], 1):
-        row = df.iloc[int(j)]
-        name  = row[col_name] if col_name else ""
-        y0    = float(row[col_init]) if col_init and pd.notna(row[col_init]) else float("nan")
-        yfin  = float(row[col_final]) if col_final and pd.notna(row[col_final]) else float("nan")
-        rows.append({
+    return [
+        {
             "rank": rank,
-            "df_index": int(j),
-            "similarity": float(sims_f[rank-1]),
-            "weight": float(w_f[rank-1]),
+            "df_index": j,
+            "similarity": s,
+            "weight": w,
             "name": name,
-            "initial_budget": (None if (not math.isfinite(y0)) else y0),
-            "final_budget": (None if (not math.isfinite(yfin)) else yfin),
-            "budget_id": str(row[col_id]) if col_id and pd.notna(row[col_id]) else None,
-        })
+            "initial_budget": y0,
+            "final_budget": yfin,
+            "budget_id": bid,
+        }
+        for rank, (j, s, w, name, y0, yfin, bid) in enumerate(zip(
+            idx.tolist(), sims.astype("float64").tolist(), weights.tolist(),
+            cols.names[idx].tolist(), _finite_or_none(cols.initial[idx]),
+            _finite_or_none(cols.final[idx]), cols.budget_ids[idx].tolist(),
+        ), 1)
+    ]
+
+def predict_initial_budget_batch(query_mat: np.ndarray, topk: int | None = None,
+                                 snapshot: DatasetSnapshot | None = None) -> list[dict[str, Any]]:
+    """複数クエリをまとめて推定する（query_mat: (B, d)）。
+
+    類似度は Q·Xᵀ の一回の行列積で計算し、Top-K 抽出・ソフトマックス・
+    対数加重平均もバッチ全体でベクトル化する。結果は入力順の dict のリスト。
+    topk を省略すると settings.TOPK（上限 settings.TOPK_MAX）。
+    snapshot を省略すると現在のデータ版（途中で差し替わっても最後まで同じ版を使う）。
+    """
+    snap = snapshot or current_snapshot()
+    data: BudgetData = snap.data
+    index = get_similarity_index(snap)  # 正規化済みコーパス（版ごとに一度だけ構築）
+    Q = np.asarray(query_mat, "float32")
+    if Q.ndim == 1:
+        Q = Q[None, :]
+
+    if Q.shape[1] != index.dim:
+        reason = f"query dim {Q.shape[1]} != X1 dim {index.dim}"
+        return [{"can_estimate": False, "reason": reason} for _ in range(Q.shape[0])]
+
+    k = min(int(topk or settings.TOPK), settings.TOPK_MAX)
+    t0 = time.perf_counter()
+    try:
+        idx, sims = index.search_batch(Q, k)  # (B, K)
+    finally:
+        observe_since(_SEARCH_HIST, t0)
+    t0 = time.perf_counter()
+    try:
+        weights = _softmax_rows(sims, tau=settings.TAU)
+        est_init, w_init, mask_init = _masked_log_mean(data.y_init[idx], weights)
+        # 現額の推定（任意）
+        if data.y_final is not None:
+            est_final, _, _ = _masked_log_mean(data.y_final[idx], weights)
+        else:
+            est_final = np.full((Q.shape[0],), np.nan)
+    finally:
+        observe_since(_AGGREGATE_HIST, t0)
+
+    t0 = time.perf_counter()
+    try:
+        cols = evidence_columns(snap)
+        results: list[dict[str, Any]] = []
+        for b in range(Q.shape[0]):
+            m = mask_init[b]
+            if not m.any():
+                results.append({"can_estimate": False, "reason": "no valid initial budget in top-k"})
+                continue
+            e_init = float(est_init[b])
+            e_final = float(est_final[b]) if math.isfinite(est_final[b]) else None
+            ratio = (e_final / e_init) if (e_final is not None and e_init > 0) else None
+            results.append({
+                "can_estimate": True,
+                "estimate_initial": e_init,
+                "estimate_final": e_final,
+                "ratio": (None if (ratio is None or not math.isfinite(ratio)) else ratio),
+                "currency": "JPY",
+                "topk": _evidence_rows(cols, idx[b][m], sims[b][m], w_init[b][m]),
+                "reason": None,
+            })
+    finally:
+        observe_since(_EVIDENCE_HIST, t0)
+    return results
+
+def predict_initial_budget(query_vec: np.ndarray, topk: int | None = None,
+                           snapshot: DatasetSnapshot | None = None) -> dict[str, Any]:
+    """当初予算の推定とTop-K根拠を返す（単一クエリベクトル）。
+
+    既存の X1（目的・課題の埋め込み）のみを使用し、線形結合は行わない。
+    """
+    q = np.asarray(query_vec, "float32").reshape(-1)
+    return predict_initial_budget_batch(q[None, :], topk=topk, snapshot=snapshot)[0]
+
+def quantization_report(n_queries: int = 256, snapshot: DatasetSnapshot | None = None) -> dict[str, Any] | None:
+    """量子化保持（float16/int8）の精度を float32 総当たりと比較して測る。
+
+    コーパス行にノイズを加えたクエリで Top-K の一致率と推定値の相対ずれを計測する。
+    float32 保持時は None。結果はデータ版ごとにキャッシュ。
+    """
+    snap = snapshot or current_snapshot()
+    return snap.memo(f"quantization_report:{n_queries}", lambda s: _quantization_report(s, n_queries))
+
+def _quantization_report(snap: DatasetSnapshot, n_queries: int) -> dict[str, Any] | None:
+    index = get_similarity_index(snap)
+    if index.storage == "float32":
+        return None
+    data: BudgetData = snap.data
+    ref = SimilarityIndex(reference_embeddings(snap), storage="float32")
+    N, d = ref.n_items, ref.dim
+    rng = np.random.default_rng(0)
+    rows = rng.choice(N, size=min(n_queries, N), replace=False)
+    Q = ref.X.data[rows] + rng.normal(0.0, 0.5 / np.sqrt(d), size=(rows.shape[0], d)).astype("float32")
 
-    ratio = (est_final / est_init) if (est_final is not None and est_init > 0) else None
+    K = settings.TOPK
+    idx_r, s_r = ref.search_batch(Q, K)
+    idx_q, s_q = index.search_batch(Q, K)
+    agree = np.mean([len(set(a.tolist()) & set(b.tolist())) / max(len(a), 1) for a, b in zip(idx_r, idx_q)])
+    est_r, _, _ = _masked_log_mean(data.y_init[idx_r], _softmax_rows(s_r, settings.TAU))
+    est_q, _, _ = _masked_log_mean(data.y_init[idx_q], _softmax_rows(s_q, settings.TAU))
+    ok = np.isfinite(est_r) & np.isfinite(est_q) & (est_r > 0)
+    drift = np.abs(est_q[ok] / est_r[ok] - 1.0)
     return {
-        "can_estimate": True,
-        "estimate_initial": est_init,
-        "estimate_final": (None if (est_final is None or not math.isfinite(est_final)) else est_final),
-        "ratio": (None if (ratio is None or not math.isfinite(ratio)) else ratio),
-        "currency": "JPY",
-        "topk": rows
+        "storage": index.storage,
+        "memory_bytes": index.nbytes,
+        "float32_bytes": int(N * d * 4),
+        "n_queries": int(rows.shape[0]),
+        "topk_agreement": float(agree),
+        "estimate_drift_mean": float(drift.mean()) if drift.size else None,
+        "estimate_drift_max": float(drift.max()) if drift.size else None,
     }
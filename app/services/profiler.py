@@ -0,0 +1,99 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# 待機中のスレッドの葉フレーム（ファイル名, 関数名）。include_idle=False ではこれらを数えない
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),  # concurrent.futures の待機中ワーカー
+}
+
+_CWD = str(Path.cwd())
+_busy = threading.Lock()  # 同時に走らせる計測は 1 つだけ
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _short(filename: str) -> str:
+    # アプリは作業ディレクトリからの相対、ライブラリは site-packages / lib/pythonX.Y 以下
+    if filename.startswith(_CWD):
+        return filename[len(_CWD) + 1:]
+    for marker in ("site-packages/", "dist-packages/"):
+        i = filename.rfind(marker)
+        if i >= 0:
+            return filename[i + len(marker):]
+    i = filename.rfind("/lib/python")
+    if i >= 0:
+        return filename[filename.find("/", i + 11) + 1:]
+    return filename
+
+
+@dataclass
+class Profile:
+    pid: int
+    seconds: float
+    interval_ms: float
+    samples: int = 0
+    stacks: Counter = field(default_factory=Counter)
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format (``thread;outer;...;leaf count``), for flamegraph.pl / speedscope."""
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+def _collapse(frame, thread_name: str, include_idle: bool) -> str | None:
+    code = frame.f_code
+    if not include_idle and (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+        return None
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({_short(code.co_filename)})")
+        frame = frame.f_back
+    parts.append(thread_name)
+    return ";".join(reversed(parts))
+
+
+def sample(seconds: float, interval_ms: float = 5.0, include_idle: bool = False) -> Profile:
+    """Sample every thread's stack via ``sys._current_frames`` for ``seconds``.
+
+    Runs on the calling thread (which is excluded from the samples); nothing
+    is installed or left running afterwards, so there is no cost while idle.
+    Raises ``ProfilerBusy`` if another profile is in progress.
+    """
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running in this worker")
+    try:
+        me = threading.get_ident()
+        prof = Profile(pid=os.getpid(), seconds=seconds, interval_ms=interval_ms)
+        interval = interval_ms / 1000.0
+        deadline = time.perf_counter() + seconds
+        next_at = time.perf_counter()
+        while True:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = _collapse(frame, names.get(tid, f"thread-{tid}"), include_idle)
+                if stack is not None:
+                    prof.stacks[stack] += 1
+            prof.samples += 1
+            next_at += interval
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if next_at > now:
+                time.sleep(next_at - now)
+            else:
+                next_at = now  # 遅れた分は詰めずに間隔を保つ
+        return prof
+    finally:
+        _busy.release()
@@ -0,0 +1,340 @@
+import os
+import pickle
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import AbstractContextManager, contextmanager
+from functools import lru_cache
+from typing import Any, Iterator
+
+from app.core.config import settings
+
+
+class SessionStore(ABC):
+    """Interface shared by the session backends.
+
+    ``get`` returns a session for reading; every change must go through
+    ``put`` (new sessions) or ``mutate`` (atomic read-modify-write), so that
+    backends that store serialized copies see the update. Expired sessions are
+    removed by a background sweeper thread started on the first ``put``.
+
+    ``blocking`` backends do I/O that can wait on other processes (file
+    locks); async callers run their calls on a thread (see
+    ``app.services.concurrency``) instead of on the event loop.
+    """
+
+    blocking = False
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self.sweep_interval = float(sweep_interval)
+        self._sweeper: threading.Thread | None = None
+        self._sweeper_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @abstractmethod
+    def get(self, session_id: str) -> dict[str, Any] | None:
+        """The session, or None if it does not exist or has expired."""
+
+    @abstractmethod
+    def put(self, session_id: str, session: dict[str, Any]) -> None:
+        """Store a new session (replacing any with the same id)."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Remove a session if it exists."""
+
+    @abstractmethod
+    def mutate(self, session_id: str) -> AbstractContextManager[dict[str, Any] | None]:
+        """``with store.mutate(sid) as session:`` — atomic read-modify-write (None if missing)."""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Remove expired sessions; returns how many were removed."""
+
+    @abstractmethod
+    def stats(self) -> dict[str, Any]:
+        """Counts for /v1/state/stats: active / evicted / expired / max_sessions / ttl_seconds."""
+
+    # ---- background sweeper (shared) ----
+    def _sweep_loop(self, stop: threading.Event) -> None:
+        while not stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception:
+                pass
+
+    def start_sweeper(self) -> None:
+        if self._sweeper is not None or self.sweep_interval <= 0:
+            return
+        with self._sweeper_lock:
+            if self._sweeper is None:
+                # スレッドごとに停止イベントを持つ（止めた後に再開しても古いスレッドは止まったまま）
+                self._stop = threading.Event()
+                self._sweeper = threading.Thread(target=self._sweep_loop, args=(self._stop,),
+                                                 name="session-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        """Stop the sweeper; the next ``put`` starts a new one (e.g. after a lifespan restart).
+
+        Does not wait for a sweep in progress (called from the event loop at shutdown).
+        """
+        with self._sweeper_lock:
+            self._stop.set()
+            self._sweeper = None
+
+
+class MemorySessionStore(SessionStore):
+    """In-process game session store with idle TTL and LRU eviction.
+
+    - ``get`` refreshes a session's last-access time (and drops it if expired)
+    - ``put`` evicts the least recently used sessions beyond ``max_sessions``
+    - a daemon sweeper thread removes expired sessions every ``sweep_interval`` s
+    """
+
+    def __init__(self, ttl_seconds: float, max_sessions: int, sweep_interval: float = 60.0):
+        super().__init__(sweep_interval)
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_sessions = max(1, int(max_sessions))
+        self._data: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._last_access: dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._evicted = 0
+        self._expired = 0
+
+    def _expired_at(self, sid: str, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - self._last_access[sid] > self.ttl_seconds
+
+    def get(self, session_id: str) -> dict[str, Any] | None:
+        now = time.monotonic()
+        with self._lock:
+            session = self._data.get(session_id)
+            if session is None:
+                return None
+            if self._expired_at(session_id, now):
+                self._remove(session_id)
+                self._expired += 1
+                return None
+            self._data.move_to_end(session_id)
+            self._last_access[session_id] = now
+            return session
+
+    def put(self, session_id: str, session: dict[str, Any]) -> None:
+        with self._lock:
+            self._data[session_id] = session
+            self._data.move_to_end(session_id)
+            self._last_access[session_id] = time.monotonic()
+            while len(self._data) > self.max_sessions:
+                old, _ = self._data.popitem(last=False)
+                self._last_access.pop(old, None)
+                self._evicted += 1
+        self.start_sweeper()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._remove(session_id)
+
+    @contextmanager
+    def mutate(self, session_id: str) -> Iterator[dict[str, Any] | None]:
+        # 同一プロセス内の書き換えはストアのロックで直列化する
+        with self._lock:
+            yield self.get(session_id)
+
+    def _remove(self, session_id: str) -> None:
+        self._data.pop(session_id, None)
+        self._last_access.pop(session_id, None)
+
+    def sweep(self) -> int:
+        if self.ttl_seconds <= 0:
+            return 0
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            # LRU 順なので先頭から期限切れが続く間だけ見ればよい
+            for sid in list(self._data.keys()):
+                if not self._expired_at(sid, now):
+                    break
+                self._remove(sid)
+                removed += 1
+            self._expired += removed
+        return removed
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "active": len(self._data),
+                "evicted": self._evicted,
+                "expired": self._expired,
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session backend on a local SQLite file in WAL mode, shared by all workers.
+
+    Sessions are stored as pickled records. ``mutate`` runs inside
+    ``BEGIN IMMEDIATE``, so read-modify-write is atomic across processes.
+    Connections come from a per-process pool: each call (or each ``mutate``
+    from enter to exit) holds one connection exclusively, so a transaction may
+    begin and end on different threads.
+    """
+
+    blocking = True
+
+    # 最終アクセス時刻の更新は 1 秒に 1 回まで（読み取りのたびに書き込まない）
+    _TOUCH_RESOLUTION = 1.0
+
+    def __init__(self, path: str, ttl_seconds: float, max_sessions: int, sweep_interval: float = 60.0):
+        super().__init__(sweep_interval)
+        self.path = path
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_sessions = max(1, int(max_sessions))
+        self._pool: queue.SimpleQueue[sqlite3.Connection] = queue.SimpleQueue()
+        self._pool_pid = os.getpid()
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " id TEXT PRIMARY KEY, data BLOB NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions(last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO counters VALUES ('evicted', 0), ('expired', 0)")
+
+    @contextmanager
+    def _conn(self) -> Iterator[sqlite3.Connection]:
+        if self._pool_pid != os.getpid():
+            # fork 後は親の接続を使わない（ワーカーごとに接続プール）
+            self._pool = queue.SimpleQueue()
+            self._pool_pid = os.getpid()
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+        try:
+            yield conn
+        finally:
+            if not conn.in_transaction:
+                self._pool.put(conn)
+            else:  # COMMIT/ROLLBACK 自体が失敗した接続は再利用しない
+                conn.close()
+
+    @staticmethod
+    def _dumps(session: dict[str, Any]) -> bytes:
+        return pickle.dumps(session, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loads(blob: bytes) -> dict[str, Any]:
+        return pickle.loads(blob)
+
+    def _bump(self, conn: sqlite3.Connection, name: str, n: int) -> None:
+        if n:
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (n, name))
+
+    def _load(self, conn: sqlite3.Connection, session_id: str, now: float) -> dict[str, Any] | None:
+        row = conn.execute("SELECT data, last_access FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        data, last = row
+        if self.ttl_seconds > 0 and now - last > self.ttl_seconds:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._bump(conn, "expired", 1)
+            return None
+        if now - last > self._TOUCH_RESOLUTION:
+            conn.execute("UPDATE sessions SET last_access = ? WHERE id = ?", (now, session_id))
+        return self._loads(data)
+
+    def get(self, session_id: str) -> dict[str, Any] | None:
+        with self._conn() as conn, conn:
+            return self._load(conn, session_id, time.time())
+
+    def put(self, session_id: str, session: dict[str, Any]) -> None:
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions (id, data, last_access) VALUES (?, ?, ?)",
+                    (session_id, self._dumps(session), time.time()),
+                )
+                (count,) = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+                over = count - self.max_sessions
+                if over > 0:
+                    conn.execute(
+                        "DELETE FROM sessions WHERE id IN ("
+                        " SELECT id FROM sessions ORDER BY last_access LIMIT ?)",
+                        (over,),
+                    )
+                    self._bump(conn, "evicted", over)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self.start_sweeper()
+
+    def delete(self, session_id: str) -> None:
+        with self._conn() as conn, conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    @contextmanager
+    def mutate(self, session_id: str) -> Iterator[dict[str, Any] | None]:
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")  # 書き込みロックを先に取る（他ワーカーとの競合を防ぐ）
+            try:
+                now = time.time()
+                session = self._load(conn, session_id, now)
+                yield session
+                if session is not None:
+                    conn.execute(
+                        "UPDATE sessions SET data = ?, last_access = ? WHERE id = ?",
+                        (self._dumps(session), now, session_id),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def sweep(self) -> int:
+        if self.ttl_seconds <= 0:
+            return 0
+        with self._conn() as conn, conn:
+            cur = conn.execute("DELETE FROM sessions WHERE last_access < ?", (time.time() - self.ttl_seconds,))
+            self._bump(conn, "expired", cur.rowcount)
+        return cur.rowcount
+
+    def stats(self) -> dict[str, Any]:
+        with self._conn() as conn:
+            (active,) = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        return {
+            "active": int(active),
+            "evicted": int(counters.get("evicted", 0)),
+            "expired": int(counters.get("expired", 0)),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_session_store() -> SessionStore:
+    """Process-wide session store selected by settings.SESSION_BACKEND."""
+    if settings.SESSION_BACKEND.lower() == "sqlite":
+        return SQLiteSessionStore(
+            path=settings.SESSION_SQLITE_PATH,
+            ttl_seconds=settings.SESSION_TTL_SECONDS,
+            max_sessions=settings.SESSION_MAX,
+            sweep_interval=settings.SESSION_SWEEP_INTERVAL,
+        )
+    return MemorySessionStore(
+        ttl_seconds=settings.SESSION_TTL_SECONDS,
+        max_sessions=settings.SESSION_MAX,
+        sweep_interval=settings.SESSION_SWEEP_INTERVAL,
+    )
@@ -0,0 +1,279 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.corpus_storage import CorpusMatrix, DecodedRows
+
+# セグメント形式を変えたら上げる（古いセグメントは別キーになり GC される）
+SEGMENT_VERSION = 2
+
+_ATTACH_FILE = ".attach"
+_MANIFEST = "manifest.json"
+_TMP_PREFIX = ".tmp-"
+
+
+def shared_root() -> Path:
+    """Directory holding published segments (tmpfs /dev/shm by default)."""
+    if settings.SHARED_CORPUS_DIR:
+        p = Path(settings.SHARED_CORPUS_DIR)
+        if p.parent.exists():
+            return p
+    # /dev/shm が無い環境（macOS など）はディスク上のファイルを mmap（ページキャッシュで共有）
+    return Path(settings.DATA_CACHE_DIR) / "shared"
+
+
+def segment_key(sources: Iterable[Path], storage: str) -> tuple[str, dict]:
+    """Key + description of the inputs a segment was built from.
+
+    Any change to a source file (size / mtime) or to the storage mode yields a
+    new key, so a worker never attaches to a segment built from other data.
+    """
+    files = []
+    for p in sources:
+        st = p.stat()
+        files.append({"path": str(p.resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns})
+    source = {"version": SEGMENT_VERSION, "storage": storage, "files": files}
+    key = hashlib.blake2b(json.dumps(source, sort_keys=True).encode(), digest_size=12).hexdigest()
+    return key, source
+
+
+@contextmanager
+def _root_lock(root: Path) -> Iterator[None]:
+    # 公開・接続・削除はルートの排他ロック下で行う（ワーカー間の競合防止）
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / ".lock", "a+b") as lk:
+        fcntl.flock(lk, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lk, fcntl.LOCK_UN)
+
+
+def _in_use(seg_dir: Path) -> bool:
+    """True while some process holds the segment's shared attach lock."""
+    try:
+        fd = os.open(seg_dir / _ATTACH_FILE, os.O_RDWR)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return False
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+
+
+class SharedCorpus:
+    """Read-only view of a published segment: the index corpus and targets.
+
+    Arrays are ``np.load(..., mmap_mode="r")`` views on files in the segment
+    directory, so every worker maps the same pages. A float32 segment holds
+    the normalized rows ``X_n``; a float16 / int8 segment holds only the codes
+    (and per-row scales). The process holds a shared flock on ``.attach``
+    while attached; a segment is only deleted when nobody holds it.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.manifest = json.loads((path / _MANIFEST).read_text())
+        self._fd: int | None = os.open(path / _ATTACH_FILE, os.O_RDWR)
+        fcntl.flock(self._fd, fcntl.LOCK_SH)
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in self.manifest["arrays"]}
+        self.X_n: np.ndarray | None = arrays.get("X_n")
+        self.y_init: np.ndarray = arrays["y_init"]
+        self.y_final: np.ndarray | None = arrays.get("y_final")
+        self._codes = arrays.get("codes")
+        self._scales = arrays.get("scales")
+
+    @property
+    def key(self) -> str:
+        return self.manifest["key"]
+
+    @property
+    def storage(self) -> str:
+        return self.manifest["source"]["storage"]
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum((self.path / f"{n}.npy").stat().st_size for n in self.manifest["arrays"]))
+
+    @property
+    def rows(self) -> "np.ndarray | DecodedRows":
+        """Normalized corpus rows as float32 (decoded on access for quantized segments)."""
+        if self.storage == "float32":
+            return self.X_n
+        return DecodedRows(self.corpus_matrix())
+
+    def corpus_matrix(self) -> CorpusMatrix:
+        """CorpusMatrix over the shared pages (no copy, no re-quantization)."""
+        if self.storage == "float32":
+            return CorpusMatrix.from_arrays(self.X_n, "float32")
+        return CorpusMatrix.from_arrays(self._codes, self.storage, self._scales)
+
+    def close(self, cleanup: bool = False) -> None:
+        """Detach; with ``cleanup`` remove the segment if no other process holds it."""
+        if self._fd is None:
+            return
+        os.close(self._fd)  # 自分の共有ロックを外してから他の利用者を確認する
+        self._fd = None
+        if cleanup:
+            with _root_lock(self.path.parent):
+                if self.path.exists() and not _in_use(self.path):
+                    shutil.rmtree(self.path, ignore_errors=True)
+
+
+def _valid(seg_dir: Path, key: str) -> bool:
+    try:
+        m = json.loads((seg_dir / _MANIFEST).read_text())
+    except Exception:
+        return False
+    if m.get("key") != key or not (seg_dir / _ATTACH_FILE).exists():
+        return False
+    for name, spec in m.get("arrays", {}).items():
+        f = seg_dir / f"{name}.npy"
+        if not f.exists() or f.stat().st_size != spec.get("file_bytes"):
+            return False
+    return True
+
+
+def _publish(root: Path, key: str, source: dict, arrays: dict[str, np.ndarray]) -> Path:
+    # 一時ディレクトリに書いてから rename（接続側は完成したセグメントしか見ない）
+    tmp = root / f"{_TMP_PREFIX}{key}.{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    specs = {}
+    for name, arr in arrays.items():
+        with open(tmp / f"{name}.npy", "wb") as f:
+            np.save(f, np.ascontiguousarray(arr))
+        specs[name] = {"dtype": str(arr.dtype), "shape": list(arr.shape),
+                       "file_bytes": (tmp / f"{name}.npy").stat().st_size}
+    (tmp / _ATTACH_FILE).touch()
+    manifest = {"key": key, "source": source, "arrays": specs, "created": time.time(), "pid": os.getpid()}
+    (tmp / _MANIFEST).write_text(json.dumps(manifest))
+    final = root / key
+    shutil.rmtree(final, ignore_errors=True)
+    os.rename(tmp, final)
+    return final
+
+
+def collect_garbage(root: Path | None = None, keep: str | None = None) -> list[str]:
+    """Remove stale segments (other keys) that no process is attached to.
+
+    Call with the root lock held. Also removes half-written ``.tmp-*`` dirs
+    left by a crashed publisher.
+    """
+    root = root or shared_root()
+    removed = []
+    if not root.exists():
+        return removed
+    for d in root.iterdir():
+        if not d.is_dir() or d.name == keep:
+            continue
+        if d.name.startswith(_TMP_PREFIX) or not _in_use(d):
+            shutil.rmtree(d, ignore_errors=True)
+            removed.append(d.name)
+    return removed
+
+
+def remove_stale(keep: str | None = None) -> list[str]:
+    """``collect_garbage`` under the root lock (for maintenance scripts)."""
+    root = shared_root()
+    with _root_lock(root):
+        return collect_garbage(root, keep=keep)
+
+
+_attached: list[SharedCorpus] = []
+_attached_lock = threading.Lock()
+
+
+def attach_or_publish(sources: Iterable[Path], storage: str,
+                      build: Callable[[], dict[str, np.ndarray]]) -> SharedCorpus:
+    """Attach to the segment for ``sources``/``storage``, publishing it first if needed.
+
+    ``build`` returns ``{"X_n", "y_init", "y_final"?}`` (float32 normalized
+    corpus and float64 targets). For float16 / int8 storage ``X_n`` is
+    replaced by the quantized codes (and scales) before publishing. Only
+    the first process to get the root lock builds; the others wait and attach.
+    """
+    root = shared_root()
+    key, source = segment_key(sources, storage)
+    with _attached_lock:
+        # 再読み込みでデータが変わっていなければ、接続済みのセグメントをそのまま使う
+        for seg in _attached:
+            if seg.key == key:
+                return seg
+    seg_dir = root / key
+    with _root_lock(root):
+        if not _valid(seg_dir, key):
+            arrays = build()
+            arrays = {k: v for k, v in arrays.items() if v is not None}
+            if storage != "float32":
+                cm = CorpusMatrix(np.asarray(arrays.pop("X_n"), dtype="float32"), storage)
+                arrays["codes"] = cm.data
+                if cm.scales is not None:
+                    arrays["scales"] = cm.scales
+            _publish(root, key, source, arrays)
+            collect_garbage(root, keep=key)
+        seg = SharedCorpus(seg_dir)
+    with _attached_lock:
+        _attached.append(seg)
+    return seg
+
+
+def detach(seg: SharedCorpus, cleanup: bool = True) -> None:
+    """Detach one segment (e.g. the previous data after a reload).
+
+    Arrays already handed out stay readable: their mappings outlive the file.
+    """
+    with _attached_lock:
+        if seg in _attached:
+            _attached.remove(seg)
+    seg.close(cleanup=cleanup)
+
+
+def release_all(cleanup: bool | None = None) -> None:
+    """Detach every segment this process attached to (called at shutdown)."""
+    cleanup = settings.SHARED_CORPUS_CLEANUP_ON_EXIT if cleanup is None else cleanup
+    with _attached_lock:
+        segs = list(_attached)
+        _attached.clear()
+    for seg in segs:
+        try:
+            seg.close(cleanup=cleanup)
+        except OSError:
+            pass
+
+
+def list_segments(root: Path | None = None) -> list[dict]:
+    """Published segments with size, source and whether a process is attached."""
+    root = root or shared_root()
+    out = []
+    if not root.exists():
+        return out
+    for d in sorted(root.iterdir()):
+        if not d.is_dir() or d.name.startswith(_TMP_PREFIX):
+            continue
+        try:
+            m = json.loads((d / _MANIFEST).read_text())
+        except Exception:
+            m = {}
+        out.append({
+            "key": d.name,
+            "in_use": _in_use(d),
+            "bytes": int(sum(f.stat().st_size for f in d.glob("*.npy"))),
+            "storage": m.get("source", {}).get("storage"),
+            "files": m.get("source", {}).get("files"),
+            "created": m.get("created"),
+        })
+    return out
@@ -0,0 +1,209 @@
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.corpus_storage import CorpusMatrix, normalize_rows
+from app.services.datastore import DatasetSnapshot, current_snapshot, reference_embeddings
+from app.services.ivf import IVFIndex
+from app.services.shared_corpus import SharedCorpus
+
+
+class SimilarityIndex:
+    """Exact cosine-similarity index over the X1 corpus.
+
+    The corpus is L2-normalized once at build time and kept as a C-contiguous
+    matrix (float32, or float16/int8 per ``storage``), so a query only costs a
+    single matrix-vector product.
+    """
+
+    def __init__(self, X: np.ndarray, storage: str = "float32", normalized: bool = False):
+        t0 = time.perf_counter()
+        # normalize_rows は新しい配列を返すので、元の X1 は変更しない
+        X_n = np.ascontiguousarray(X, dtype="float32") if normalized else normalize_rows(X)
+        self.X = CorpusMatrix(X_n, storage)
+        self.build_seconds: float = time.perf_counter() - t0
+
+    @classmethod
+    def from_corpus(cls, corpus: CorpusMatrix) -> "SimilarityIndex":
+        """Index over an existing CorpusMatrix (e.g. attached from shared memory)."""
+        self = cls.__new__(cls)
+        self.X = corpus
+        self.build_seconds = 0.0
+        return self
+
+    @property
+    def storage(self) -> str:
+        return self.X.mode
+
+    @property
+    def n_items(self) -> int:
+        return int(self.X.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self.X.shape[1])
+
+    @property
+    def nbytes(self) -> int:
+        return self.X.nbytes
+
+    def search(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return (indices, scores) of the top-k rows, sorted by descending score."""
+        q = np.asarray(query, dtype="float32").reshape(1, -1)
+        idx, scores = self.search_batch(q, k)
+        return idx[0], scores[0]
+
+    def search_batch(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Batched search for a (B, d) query matrix.
+
+        Returns (B, K) indices and scores, each row sorted by descending score.
+        """
+        Q = np.asarray(queries, dtype="float32")
+        if Q.ndim != 2 or Q.shape[1] != self.dim:
+            raise ValueError(f"query dim {Q.shape[-1]} != X1 dim {self.dim}")
+        Q = Q / (np.linalg.norm(Q, axis=1, keepdims=True) + 1e-12)
+        return _top_k(self.X.scores(Q), k)  # (B, N) → (B, K)
+
+
+def _top_k(S: np.ndarray, k: int, ids: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """Row-wise top-k of a (B, M) score matrix, sorted by descending score.
+
+    ``ids`` (B, M) maps columns to row numbers; by default the column index.
+    """
+    K = int(min(k, S.shape[1]))
+    if K <= 0:
+        return np.zeros((S.shape[0], 0), dtype="int64"), np.zeros((S.shape[0], 0), dtype="float32")
+    idx = np.argpartition(-S, K - 1, axis=1)[:, :K]
+    part = np.take_along_axis(S, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    idx = np.take_along_axis(idx, order, axis=1)
+    if ids is not None:
+        idx = np.take_along_axis(ids, idx, axis=1)
+    return idx, np.take_along_axis(part, order, axis=1)
+
+
+class DeltaIndex:
+    """A built index plus rows appended after it, which are searched exhaustively.
+
+    Appending never rebuilds (or re-trains) the base index: the new rows get a
+    small exact corpus of their own, and each search merges the base top-k with
+    the tail's. Tail rows are numbered after the base (``base.n_items + i``),
+    matching their position in the snapshot's row arrays.
+    """
+
+    def __init__(self, base: "SimilarityIndex | IVFIndex", X_tail: np.ndarray, normalized: bool = False):
+        t0 = time.perf_counter()
+        self.base = base
+        # 次の追記で行を足せるよう、正規化済み float32 の行も持っておく（追記分だけなので小さい）
+        self.tail_rows = np.ascontiguousarray(X_tail, dtype="float32") if normalized else normalize_rows(X_tail)
+        self.tail = CorpusMatrix(self.tail_rows, base.storage)
+        self.build_seconds: float = base.build_seconds + (time.perf_counter() - t0)
+
+    def extended(self, X_new: np.ndarray, normalized: bool = False) -> "DeltaIndex":
+        X_n = np.asarray(X_new, dtype="float32") if normalized else normalize_rows(X_new)
+        return DeltaIndex(self.base, np.concatenate([self.tail_rows, X_n]), normalized=True)
+
+    @property
+    def storage(self) -> str:
+        return self.base.storage
+
+    @property
+    def n_items(self) -> int:
+        return self.base.n_items + int(self.tail.shape[0])
+
+    @property
+    def tail_items(self) -> int:
+        return int(self.tail.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return self.base.dim
+
+    @property
+    def nbytes(self) -> int:
+        extra = self.tail_rows.nbytes if self.tail.data is not self.tail_rows else 0
+        return self.base.nbytes + self.tail.nbytes + extra
+
+    def search(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        q = np.asarray(query, dtype="float32").reshape(1, -1)
+        idx, scores = self.search_batch(q, k)
+        return idx[0], scores[0]
+
+    def search_batch(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        Q = np.asarray(queries, dtype="float32")
+        if Q.ndim != 2 or Q.shape[1] != self.dim:
+            raise ValueError(f"query dim {Q.shape[-1]} != X1 dim {self.dim}")
+        b_idx, b_sc = self.base.search_batch(Q, k)
+        Qn = Q / (np.linalg.norm(Q, axis=1, keepdims=True) + 1e-12)
+        t_sc = self.tail.scores(Qn)  # (B, T)
+        t_idx = np.broadcast_to(np.arange(self.base.n_items, self.n_items, dtype="int64"), t_sc.shape)
+        return _top_k(np.concatenate([b_sc, t_sc], axis=1), k, ids=np.concatenate([b_idx, t_idx], axis=1))
+
+
+def extend_index(index: "SimilarityIndex | IVFIndex | DeltaIndex", X_new: np.ndarray,
+                 normalized: bool = False) -> DeltaIndex:
+    """The index of a snapshot with ``X_new`` appended, derived from its parent's index."""
+    if isinstance(index, DeltaIndex):
+        return index.extended(X_new, normalized=normalized)
+    return DeltaIndex(index, X_new, normalized=normalized)
+
+
+def index_type(index: "SimilarityIndex | IVFIndex | DeltaIndex") -> str:
+    base = index.base if isinstance(index, DeltaIndex) else index
+    return "ivf" if isinstance(base, IVFIndex) else "exact"
+
+
+def default_nlist(n_items: int) -> int:
+    return max(1, int(4 * np.sqrt(max(n_items, 1))))
+
+
+INDEX_KEY = "similarity_index"
+
+
+def get_similarity_index(snapshot: DatasetSnapshot | None = None) -> "SimilarityIndex | IVFIndex | DeltaIndex":
+    """The similarity index of a dataset snapshot (default: the active one), built once per snapshot.
+
+    settings.INDEX_TYPE == "ivf" returns an approximate IVFIndex whose centroids
+    and assignments are persisted under DATA_CACHE_DIR. settings.EMBEDDING_STORAGE
+    selects float32 / float16 / int8 corpus storage for either index. With
+    SHARED_CORPUS the exact index attaches to the shared segment instead.
+    Appended rows (beyond ``snapshot.base_rows``) go to a DeltaIndex tail.
+    """
+    return (snapshot or current_snapshot()).memo(INDEX_KEY, _build_index)
+
+
+def _build_index(snapshot: DatasetSnapshot) -> "SimilarityIndex | IVFIndex | DeltaIndex":
+    t0 = time.perf_counter()
+    data = snapshot.data
+    n = snapshot.base_rows
+    shared = data.shared
+    if shared is not None and settings.INDEX_TYPE.lower() != "ivf":
+        index = _build_base_index(None, shared=shared)  # 共有セグメントの符号をそのまま使う（行は読まない）
+    elif shared is not None and shared.storage != "float32":
+        # 量子化セグメントは符号しか持たないので、IVF の学習は元の float32 行（データファイル）で行う
+        index = _build_base_index(reference_embeddings(snapshot)[:n])
+    else:
+        index = _build_base_index(data.X1[:n], shared=shared)
+    index.build_seconds = time.perf_counter() - t0
+    if data.X1.shape[0] > n:
+        index = DeltaIndex(index, data.X1[n:], normalized=data.shared is not None)
+    return index
+
+
+def _build_base_index(X1: np.ndarray | None, shared: SharedCorpus | None = None) -> "SimilarityIndex | IVFIndex":
+    storage = settings.EMBEDDING_STORAGE
+    if shared is not None and settings.INDEX_TYPE.lower() != "ivf":
+        # 共有セグメントの正規化済み（量子化済み）行をそのまま使う（ワーカー間でコピーしない）
+        return SimilarityIndex.from_corpus(shared.corpus_matrix())
+    X_n = X1 if shared is not None else normalize_rows(X1)
+    if settings.INDEX_TYPE.lower() != "ivf":
+        return SimilarityIndex(X_n, storage=storage, normalized=True)
+    return IVFIndex(
+        X_n,
+        nlist=settings.IVF_NLIST or default_nlist(X_n.shape[0]),
+        nprobe=settings.IVF_NPROBE,
+        n_iter=settings.IVF_TRAIN_ITERS,
+        cache_dir=settings.DATA_CACHE_DIR,
+        storage=storage,
+    )
@@ -0,0 +1,128 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from typing import Any, Callable
+
+from app.core.config import settings
+from app.services.datastore import DatasetSnapshot, load_budget_data
+from app.services.embedding import embed_text_to_vec
+from app.services.events_catalog import load_ai_references, load_event_store
+from app.services.predictor import predict_initial_budget
+from app.services.similarity import get_similarity_index
+
+# ウォームアップ推定に使う入力（埋め込み・近傍探索・推定の経路を一通り通す）
+WARMUP_TEXT = "地域 医療 提供体制 整備 推進 事業"
+
+
+@dataclass
+class StageTiming:
+    stage: str
+    ok: bool
+    ms: float
+    required: bool = True
+    error: str | None = None
+
+
+@dataclass
+class Readiness:
+    """Progress of the startup preload, reported by ``GET /ready``.
+
+    ``ready`` becomes True once every required stage has loaded (or at once
+    when preloading is disabled). Optional stages record failures without
+    blocking readiness.
+    """
+    preload: bool = False
+    ready: bool = False
+    running: bool = False
+    stages: list[StageTiming] = field(default_factory=list)
+    total_ms: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "preload": self.preload,
+                "running": self.running,
+                "total_ms": self.total_ms,
+                "stages": [vars(s).copy() for s in self.stages],
+            }
+
+    def _record(self, stage: StageTiming) -> None:
+        with self._lock:
+            self.stages.append(stage)
+
+
+@lru_cache(maxsize=1)
+def get_readiness() -> Readiness:
+    return Readiness()
+
+
+def skip_preload(readiness: Readiness | None = None) -> Readiness:
+    """Preloading disabled: report ready at once (caches fill on first use)."""
+    r = readiness or get_readiness()
+    with r._lock:
+        r.preload = False
+        r.ready = True
+        r.running = False
+    return r
+
+
+def _warmup_prediction(snapshot: DatasetSnapshot | None = None) -> None:
+    data = snapshot.data if snapshot is not None else load_budget_data()
+    q = embed_text_to_vec(WARMUP_TEXT, dim=int(data.X1.shape[1]), normalize=True)
+    predict_initial_budget(q, snapshot=snapshot)
+
+
+def preload_stages(snapshot: DatasetSnapshot | None = None) -> list[tuple[str, Callable[[], Any], bool]]:
+    """(name, loader, required) in load order; later stages reuse earlier caches.
+
+    With ``snapshot`` (a reloaded / appended version that is not active yet)
+    the stages build that snapshot's structures and the dataset stage is skipped.
+    """
+    stages = [] if snapshot is not None else [("dataset", load_budget_data, True)]
+    stages += [
+        ("catalog", partial(load_event_store, snapshot), True),
+        ("similarity_index", partial(get_similarity_index, snapshot), True),
+        ("ai_references", partial(load_ai_references, snapshot), False),
+    ]
+    if settings.PRELOAD_WARMUP:
+        stages.append(("warmup_prediction", partial(_warmup_prediction, snapshot), True))
+    return stages
+
+
+def run_stages(stages: list[tuple[str, Callable[[], Any], bool]],
+               record: Callable[[StageTiming], None] | None = None) -> tuple[bool, list[StageTiming]]:
+    """Run (name, loader, required) stages in order; ok is False if a required stage failed."""
+    ok = True
+    timings: list[StageTiming] = []
+    for name, fn, required in stages:
+        t0 = time.perf_counter()
+        try:
+            fn()
+            timing = StageTiming(name, True, (time.perf_counter() - t0) * 1000.0, required)
+        except Exception as e:
+            timing = StageTiming(name, False, (time.perf_counter() - t0) * 1000.0, required, f"{type(e).__name__}: {e}")
+            ok = ok and not required
+        timings.append(timing)
+        if record is not None:
+            record(timing)
+    return ok, timings
+
+
+def run_preload(readiness: Readiness | None = None) -> Readiness:
+    """Load everything the request path needs and record per-stage timings."""
+    r = readiness or get_readiness()
+    with r._lock:
+        r.preload = True
+        r.ready = False
+        r.running = True
+        r.stages = []
+    t_all = time.perf_counter()
+    ok, _ = run_stages(preload_stages(), record=r._record)
+    with r._lock:
+        r.total_ms = (time.perf_counter() - t_all) * 1000.0
+        r.ready = ok
+        r.running = False
+    return r
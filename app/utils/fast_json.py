@@ -0,0 +1,60 @@
+import json
+import math
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.utils.telemetry import timed
+
+try:
+    import orjson  # type: ignore
+except Exception:
+    orjson = None  # type: ignore
+
+
+def _finite(obj: Any) -> Any:
+    # orjson と同じく NaN/Inf を null にする（標準 json の既定は NaN/Infinity という不正な JSON）
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    return obj
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    try:
+        text = json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    except ValueError:
+        # 生成元で取り切れなかった NaN/Inf がある時だけ、全体を辿って置き換える
+        text = json.dumps(_finite(obj), ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    return text.encode("utf-8")
+
+
+@timed("serialize")
+def dumps(obj: Any) -> bytes:
+    """Encode already-sanitized data (plain Python types) to JSON bytes.
+
+    Uses orjson when installed, else the stdlib. Either way a NaN/Inf that
+    slipped past the producer is written as ``null`` (orjson's behavior), so
+    the response does not depend on whether orjson is present.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return _stdlib_dumps(obj)
+
+
+class JSONBytesResponse(JSONResponse):
+    """JSON response that skips FastAPI's validate → jsonable_encoder → render pass.
+
+    Handlers return ``JSONBytesResponse(payload)`` where payload is sanitized at
+    the source. Routes keep ``response_model=`` (and this class subclasses
+    JSONResponse) so the OpenAPI schema is unchanged.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return dumps(content)
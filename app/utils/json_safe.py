@@ -34,3 +34,14 @@ def json_safe(obj: Any) -> Any:
         return [json_safe(v) for v in obj]
     return obj
 
+
+
+def clean_scalar(v: Any) -> Any:
+    """Non-recursive json_safe for a single cell (used when data is loaded, not per response)."""
+    if np is not None and isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float):
+        return v if math.isfinite(v) else None
+    if isinstance(v, str) and v.lower() == 'nan':
+        return None
+    return v
@@ -0,0 +1,265 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Any
+
+from app.core.config import settings
+
+# 上限（秒）。embed の 0.1ms 台からデータ読み込みの数十秒までを固定の刻みで数える
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# 予め登録しておく段階名（/metrics に 0 件でも並ぶ）
+STAGES: tuple[str, ...] = (
+    "embed",              # embed_text_to_vec / embed_texts_to_mat
+    "similarity_search",  # index.search_batch（Q·Xᵀ と Top-K 抽出）
+    "aggregate",          # softmax と対数加重平均
+    "evidence_rows",      # Top-K 根拠行の組み立て
+    "serialize",          # レスポンスの JSON 化（fast_json.dumps）
+    "dataset_load",       # データファイルの読み込み（起動時・再読み込み時）
+    "catalog_load",       # load_event_store（データの版ごとに 1 回）
+    "catalog_lookup",     # get_event_meta
+    "catalog_search",     # search_events_by_name
+)
+
+_PREFIX = "policy_game"
+
+
+class Histogram:
+    """Fixed-bucket latency histogram: one counter per bucket, plus sum and count.
+
+    ``observe`` only increments preallocated counters, so recording costs the
+    same no matter how many requests have been seen. Buckets are cumulated
+    only when ``/metrics`` is rendered.
+    """
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 最後は +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        i = bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+
+    def snapshot(self) -> tuple[list[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class _Timer:
+    __slots__ = ("_hist", "_t0")
+
+    def __init__(self, hist: Histogram):
+        self._hist = hist
+
+    def __enter__(self) -> "_Timer":
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self._hist.observe(time.perf_counter() - self._t0)
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopTimer":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NOOP = _NoopTimer()
+
+_stage_hists: dict[str, Histogram] = {name: Histogram() for name in STAGES}
+_stage_lock = threading.Lock()
+
+
+def _stage_hist(name: str) -> Histogram:
+    h = _stage_hists.get(name)
+    if h is None:
+        with _stage_lock:
+            h = _stage_hists.setdefault(name, Histogram())
+    return h
+
+
+def stage(name: str):
+    """``with stage("embed"): ...`` records the block's wall time (no-op if METRICS_ENABLED is off).
+
+    Allocates a timer per call; per-request hot paths use ``stage_histogram``
+    and ``observe_since`` instead.
+    """
+    if not settings.METRICS_ENABLED:
+        return _NOOP
+    return _Timer(_stage_hist(name))
+
+
+def stage_histogram(name: str) -> Histogram:
+    """The stage's preallocated histogram, looked up once (e.g. at import) by hot paths::
+
+        t0 = time.perf_counter()
+        try:
+            ...
+        finally:
+            observe_since(hist, t0)
+    """
+    return _stage_hist(name)
+
+
+def observe_since(hist: Histogram, t0: float) -> None:
+    """Record ``perf_counter() - t0`` in ``hist`` (no-op if METRICS_ENABLED is off)."""
+    if settings.METRICS_ENABLED:
+        hist.observe(time.perf_counter() - t0)
+
+
+def timed(name: str):
+    """Decorator form of ``stage`` for functions with several return points.
+
+    Put it under ``@lru_cache`` so that only cache misses (the real loads) are timed.
+    """
+    def deco(fn):
+        hist = _stage_hist(name)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not settings.METRICS_ENABLED:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - t0)
+        return wrapper
+    return deco
+
+
+class RequestMetrics:
+    """Request counts per (route, method, status) and latency per route.
+
+    Routes are labelled by ``route_label`` (unmatched paths share one label),
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: dict[tuple[str, str, str], int] = {}
+        self.latency: dict[str, Histogram] = {}
+
+    def record(self, route: str, method: str, status: int, seconds: float) -> None:
+        key = (route, method, str(status))
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+            h = self.latency.get(route)
+            if h is None:
+                h = self.latency[route] = Histogram()
+        h.observe(seconds)
+
+    def snapshot(self) -> tuple[dict[tuple[str, str, str], int], dict[str, Histogram]]:
+        with self._lock:
+            return dict(self.counts), dict(self.latency)
+
+
+_requests = RequestMetrics()
+
+
+def route_label(scope) -> str:
+    """Path template of the matched route, e.g. ``/v1/budget/predict`` or ``/ui`` for a mount.
+
+    Built from the request path with path parameters put back as ``{name}``
+    (included routers do not expose the prefixed template in the scope).
+    """
+    if "endpoint" not in scope:
+        return "<unmatched>"
+    root = scope.get("root_path", "")
+    if "app_root_path" in scope and root != scope["app_root_path"]:
+        return root  # マウントされたアプリ（静的 UI など）はマウント位置でまとめる
+    path = scope.get("path", "")
+    for name, value in (scope.get("path_params") or {}).items():
+        path = path.replace(f"/{value}", f"/{{{name}}}", 1)
+    return path
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware feeding ``RequestMetrics`` (no per-request task or body copy)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _requests.record(route_label(scope), scope.get("method", ""), status, time.perf_counter() - t0)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**kv: str) -> str:
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in kv.items())
+
+
+def _histogram_lines(name: str, labels: str, hist: Histogram) -> list[str]:
+    counts, total = hist.snapshot()
+    sep = "," if labels else ""
+    out, acc = [], 0
+    for bound, c in zip(hist.bounds, counts):
+        acc += c
+        out.append(f'{name}_bucket{{{labels}{sep}le="{bound:g}"}} {acc}')
+    acc += counts[-1]
+    out.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {acc}')
+    out.append(f"{name}_sum{{{labels}}} {total!r}")
+    out.append(f"{name}_count{{{labels}}} {acc}")
+    return out
+
+
+def render_prometheus(extra: dict[str, Any] | None = None) -> str:
+    """Prometheus text exposition (format 0.0.4) of stage and request metrics.
+
+    ``extra`` adds gauges (name → number) such as the active session count.
+    """
+    lines: list[str] = []
+    name = f"{_PREFIX}_stage_seconds"
+    lines += [f"# HELP {name} Wall time of internal processing stages.", f"# TYPE {name} histogram"]
+    with _stage_lock:
+        stages = dict(_stage_hists)
+    for st, h in stages.items():
+        lines += _histogram_lines(name, _labels(stage=st), h)
+
+    counts, latency = _requests.snapshot()
+    name = f"{_PREFIX}_http_requests_total"
+    lines += [f"# HELP {name} HTTP requests by route template, method and status.", f"# TYPE {name} counter"]
+    for (route, method, status), c in sorted(counts.items()):
+        lines.append(f"{name}{{{_labels(route=route, method=method, status=status)}}} {c}")
+    name = f"{_PREFIX}_http_request_duration_seconds"
+    lines += [f"# HELP {name} HTTP request latency by route template.", f"# TYPE {name} histogram"]
+    for route, h in sorted(latency.items()):
+        lines += _histogram_lines(name, _labels(route=route), h)
+
+    for key, value in (extra or {}).items():
+        name = f"{_PREFIX}_{key}"
+        lines += [f"# TYPE {name} gauge", f"{name} {float(value)!r}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,52 @@
+"""Lookups/sec for the events catalog: pandas df.loc path vs EventRecordStore.
+
+    python -m scripts.bench_catalog_lookup --lookups 20000
+"""
+import argparse
+import random
+import time
+
+from app.services.events_catalog import META_FIELDS, load_event_store, load_events_df
+
+
+def _legacy_meta(df, event_id: str) -> dict:
+    # 旧実装: 文字列インデックスの df.loc + row.get
+    key = str(event_id)
+    if key not in df.index:
+        raise KeyError(key)
+    row = df.loc[key]
+    out = {"予算事業ID": key}
+    for c in META_FIELDS:
+        out[c] = row.get(c, None)
+    return out
+
+
+def _rate(fn, ids) -> float:
+    t0 = time.perf_counter()
+    for i in ids:
+        fn(i)
+    return len(ids) / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lookups", type=int, default=20000)
+    args = ap.parse_args()
+
+    df = load_events_df()
+    store = load_event_store()
+    ids = random.Random(0).choices(store.ids, k=args.lookups)
+
+    legacy = _rate(lambda i: _legacy_meta(df, i), ids)
+    fast = _rate(store.meta, ids)
+    legacy_ids = _rate(lambda _: df.index.astype(str).tolist(), ids[:200])
+    fast_ids = _rate(lambda _: store.ids, ids)
+    print(f"catalog rows: {len(store.ids)}")
+    print(f"{'get_event_meta (df.loc)':<32}{legacy:>14,.0f} /s")
+    print(f"{'get_event_meta (record store)':<32}{fast:>14,.0f} /s  ({fast / legacy:.0f}x)")
+    print(f"{'get_all_event_ids (rebuild)':<32}{legacy_ids:>14,.0f} /s")
+    print(f"{'get_all_event_ids (cached)':<32}{fast_ids:>14,.0f} /s")
+
+
+if __name__ == "__main__":
+    main()
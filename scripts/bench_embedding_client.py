@@ -0,0 +1,62 @@
+"""Throughput benchmark for the OpenAI embedding client.
+
+Start the stub first (see scripts/openai_stub_server.py), then:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=stub \\
+        python -m scripts.bench_embedding_client --texts 2000
+
+Compares the legacy one-request-per-text pattern with the batched client
+over a few batch-size/concurrency settings.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.embedding_client import OpenAIEmbeddingClient
+
+
+def _make_client(batch_size: int, concurrency: int) -> OpenAIEmbeddingClient:
+    return OpenAIEmbeddingClient(
+        api_key=settings.OPENAI_API_KEY or "stub",
+        model=settings.OPENAI_EMBEDDING_MODEL,
+        base_url=settings.OPENAI_BASE_URL,
+        batch_size=batch_size,
+        max_concurrency=concurrency,
+        timeout=settings.OPENAI_TIMEOUT,
+        max_retries=settings.OPENAI_MAX_RETRIES,
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--texts", type=int, default=1000)
+    ap.add_argument("--sequential", type=int, default=100, help="texts for the one-by-one baseline")
+    args = ap.parse_args()
+    if not settings.OPENAI_BASE_URL:
+        raise SystemExit("OPENAI_BASE_URL must point at the stub server (or a real endpoint)")
+
+    rng = np.random.default_rng(0)
+    words = [f"w{i}" for i in range(500)]
+    texts = [" ".join(rng.choice(words, size=24)) for _ in range(args.texts)]
+
+    base = _make_client(batch_size=1, concurrency=1)
+    n = min(args.sequential, len(texts))
+    t0 = time.perf_counter()
+    for t in texts[:n]:
+        base.embed([t])
+    dt = time.perf_counter() - t0
+    print(f"sequential  batch=1   conc=1  {n / dt:10.1f} texts/s")
+
+    for batch_size, conc in [(16, 4), (64, 8), (128, 8), (256, 16)]:
+        client = _make_client(batch_size, conc)
+        client.embed(texts[:batch_size])  # 接続確立
+        t0 = time.perf_counter()
+        M = client.embed(texts)
+        dt = time.perf_counter() - t0
+        print(f"batched     batch={batch_size:<4d}conc={conc:<3d}{len(texts) / dt:10.1f} texts/s  shape={M.shape}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""In-process load test: many game sessions played end to end.
+
+    python -m scripts.bench_game_flow --synthetic 20000 --dim 256 --sessions 64 --concurrency 16
+    python -m scripts.bench_game_flow --out bench/flow.json            # data/ の実データ
+    python -m scripts.bench_game_flow --synthetic 20000 --compare bench/flow.json
+
+Drives ``app.main:app`` through httpx.ASGITransport (no network, no uvicorn),
+with the lifespan running so the preload, executor and sweeper behave as in
+production. Each session plays a whole game:
+
+    /v1/state/start
+    per year: 12 × (/v1/events/next → /v1/budget/predict → /v1/allocate)
+              then /v1/state/next_year (except after the last year)
+
+``--concurrency`` sessions are in flight at once. Reports p50/p95/p99 latency
+per endpoint plus sessions/s and requests/s. ``--out`` writes the results as
+JSON (with the git commit and settings) and ``--compare`` prints the ratio of
+each percentile against an earlier result file.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+from scripts.synthetic_data import write_adm_parquet
+
+REPO = Path(__file__).resolve().parent.parent
+ENDPOINTS = ("start", "events/next", "budget/predict", "allocate", "next_year")
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self.lat: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def call(self, name: str, fn, *args, ok=(200,), **kwargs):
+        t0 = time.perf_counter()
+        r = await fn(*args, **kwargs)
+        self.lat[name].append(time.perf_counter() - t0)
+        if r.status_code not in ok:
+            self.errors[f"{name} {r.status_code}"] += 1
+            return None
+        return r.json()
+
+
+async def _play(c, rec: Recorder, years: int, events_per_year: int) -> None:
+    start = await rec.call("start", c.post, "/v1/state/start")
+    if start is None:
+        return
+    sid = start["session_id"]
+    remaining = float(start["year_budget_remaining"])
+    for year in range(1, years + 1):
+        for _ in range(events_per_year):
+            ev = await rec.call("events/next", c.get, "/v1/events/next", params={"session_id": sid})
+            if ev is None:
+                break
+            meta = ev.get("meta") or {}
+            text = meta.get("事業の概要") or meta.get("現状・課題") or meta.get("事業名") or "事業"
+            pred = await rec.call("budget/predict", c.post, "/v1/budget/predict", json={"query_text": text})
+            est = (pred or {}).get("estimate_initial") or 0.0
+            # 予算超過（422）を避けるため残額の範囲に収める
+            amount = min(max(est, 1.0), remaining / 2)
+            alloc = await rec.call("allocate", c.post, "/v1/allocate",
+                                   json={"session_id": sid, "event_id": ev["予算事業ID"], "allocated_budget": amount})
+            if alloc is not None:
+                remaining = float(alloc["year_budget_remaining"])
+        if year < years:
+            nxt = await rec.call("next_year", c.post, "/v1/state/next_year", json={"session_id": sid})
+            if nxt is None:
+                return
+            remaining = float(nxt["year_budget_remaining"])
+
+
+def _summary(lat: list[float]) -> dict:
+    a = np.asarray(lat) * 1e3
+    return {"count": int(a.size), "mean_ms": float(a.mean()),
+            **{f"p{p}_ms": float(np.percentile(a, p)) for p in (50, 95, 99)},
+            "max_ms": float(a.max())}
+
+
+async def _run(args) -> dict:
+    import httpx
+
+    from app.core.config import settings
+    from app.main import app
+    from app.services.warmup import get_readiness
+
+    years = args.years or settings.GAME_YEARS
+    per_year = settings.GAME_EVENTS_PER_YEAR
+    async with app.router.lifespan_context(app):
+        t0 = time.perf_counter()
+        await asyncio.sleep(0)  # lifespan が作った事前ロードのタスクを開始させる
+        while not (state := get_readiness().snapshot())["ready"]:
+            if not state["running"] and state["stages"]:
+                raise RuntimeError(f"preload failed: {[s for s in state['stages'] if not s['ok']]}")
+            await asyncio.sleep(0.05)
+        preload_s = time.perf_counter() - t0
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            for _ in range(args.warmup):
+                await _play(c, Recorder(), years, per_year)
+
+            rec = Recorder()
+            sem = asyncio.Semaphore(args.concurrency)
+
+            async def one():
+                async with sem:
+                    await _play(c, rec, years, per_year)
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*[one() for _ in range(args.sessions)])
+            wall = time.perf_counter() - t0
+
+        index_n, index_d = None, None
+        try:
+            from app.services.similarity import get_similarity_index
+            idx = get_similarity_index()
+            index_n, index_d = int(idx.n_items), int(idx.dim)
+        except Exception:
+            pass
+
+    n_requests = sum(len(v) for v in rec.lat.values())
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "rows": index_n, "dim": index_d, "synthetic": bool(args.synthetic),
+            "sessions": args.sessions, "concurrency": args.concurrency,
+            "years": years, "events_per_year": per_year,
+            "INDEX_TYPE": settings.INDEX_TYPE, "EMBEDDING_STORAGE": settings.EMBEDDING_STORAGE,
+            "SESSION_BACKEND": settings.SESSION_BACKEND, "SHARED_CORPUS": settings.SHARED_CORPUS,
+            "TOPK": settings.TOPK, "CPU_EXECUTOR_WORKERS": settings.CPU_EXECUTOR_WORKERS,
+        },
+        "results": {
+            "preload_seconds": preload_s,
+            "preload_stages": {st["stage"]: st["ms"] for st in state["stages"]},
+            "wall_seconds": wall,
+            "sessions_per_second": args.sessions / wall,
+            "requests_per_second": n_requests / wall,
+            "errors": dict(rec.errors),
+            "endpoints": {name: _summary(rec.lat[name]) for name in ENDPOINTS if rec.lat.get(name)},
+        },
+    }
+
+
+def _print(result: dict, baseline: dict | None) -> None:
+    res = result["results"]
+    cfg = result["config"]
+    print(f"rows={cfg['rows']} dim={cfg['dim']} sessions={cfg['sessions']} concurrency={cfg['concurrency']} "
+          f"years={cfg['years']}  commit={result['meta']['commit']}")
+    print(f"{'endpoint':>16}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, s in res["endpoints"].items():
+        print(f"{name:>16}{s['count']:>8}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}")
+    print(f"sessions/s={res['sessions_per_second']:.2f} requests/s={res['requests_per_second']:.0f} "
+          f"wall={res['wall_seconds']:.2f}s preload={res['preload_seconds']:.2f}s errors={res['errors'] or 0}")
+    if baseline is None:
+        return
+    base = baseline["results"]
+    print(f"\nvs {baseline['meta'].get('commit')} (ratio new/old, <1 is faster)")
+    print(f"{'endpoint':>16}{'p50':>8}{'p95':>8}{'p99':>8}")
+    for name, s in res["endpoints"].items():
+        b = base["endpoints"].get(name)
+        if b:
+            print(f"{name:>16}" + "".join(f"{s[k] / max(b[k], 1e-9):>8.2f}" for k in ("p50_ms", "p95_ms", "p99_ms")))
+    print(f"{'sessions/s':>16}{res['sessions_per_second'] / max(base['sessions_per_second'], 1e-9):>8.2f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--synthetic", type=int, default=0, help="use a synthetic corpus of N rows")
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--sessions", type=int, default=32, help="games played in the measured run")
+    ap.add_argument("--concurrency", type=int, default=8, help="games in flight at once")
+    ap.add_argument("--years", type=int, default=0, help="years per game (default GAME_YEARS)")
+    ap.add_argument("--warmup", type=int, default=1, help="unmeasured games played first")
+    ap.add_argument("--out", type=Path, help="write results JSON here")
+    ap.add_argument("--compare", type=Path, help="earlier results JSON to compare against")
+    args = ap.parse_args()
+
+    out = args.out.resolve() if args.out else None
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    tmp = None
+    if args.synthetic:
+        # 設定は import 時に読まれるので、app を import する前に環境変数と cwd を整える
+        tmp = Path(tempfile.mkdtemp())
+        write_adm_parquet(tmp, args.synthetic, args.dim)
+        (tmp / "web").symlink_to(REPO / "web")  # StaticFiles(directory="web") は cwd 相対
+        os.environ["DATA_CACHE_DIR"] = str(tmp / "data" / ".cache")
+        os.environ["EMBEDDING_CACHE_DIR"] = ""
+        os.environ["SHARED_CORPUS_DIR"] = str(tmp / "shm")
+        os.environ.setdefault("SESSION_SQLITE_PATH", str(tmp / "sessions.sqlite3"))
+        os.chdir(tmp)
+    try:
+        result = asyncio.run(_run(args))
+    finally:
+        if tmp is not None:
+            os.chdir(REPO)
+            shutil.rmtree(tmp, ignore_errors=True)
+    _print(result, baseline)
+    if out:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(result, ensure_ascii=False, indent=2))
+        print(f"wrote {out}")
+    if result["results"]["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
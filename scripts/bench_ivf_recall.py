@@ -0,0 +1,69 @@
+"""Recall@K vs latency report for the IVF index against exact search.
+
+    python -m scripts.bench_ivf_recall --synthetic 200000 --dim 256
+    python -m scripts.bench_ivf_recall            # data/adm_game.parquet
+
+Queries are held-out noisy copies of corpus rows. For each nprobe the report
+shows recall@K (overlap with the exact top-K) and per-query latency, which is
+what IVF_NLIST / IVF_NPROBE should be tuned against.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.ivf import IVFIndex
+from app.services.similarity import SimilarityIndex, default_nlist
+
+
+def _synthetic(n: int, d: int, seed: int = 0) -> np.ndarray:
+    # クラスタ構造のある合成コーパス（実データの埋め込みに近い分布）
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(8, n // 500), d)).astype("float32")
+    X = centers[rng.integers(0, centers.shape[0], size=n)]
+    X += 0.6 * rng.normal(size=(n, d)).astype("float32")
+    return X
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--synthetic", type=int, default=0, help="use a synthetic corpus of N rows")
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--nlist", type=int, default=0)
+    ap.add_argument("--nprobe", type=str, default="1,2,4,8,16,32,64")
+    args = ap.parse_args()
+
+    if args.synthetic:
+        X = _synthetic(args.synthetic, args.dim)
+    else:
+        from app.services.datastore import load_budget_data
+        X = np.asarray(load_budget_data().X1, dtype="float32")
+
+    rng = np.random.default_rng(1)
+    rows = rng.choice(X.shape[0], size=min(args.queries, X.shape[0]), replace=False)
+    Q = X[rows] + 0.3 * rng.normal(size=(rows.shape[0], X.shape[1])).astype("float32")
+
+    exact = SimilarityIndex(X)
+    t0 = time.perf_counter()
+    truth = [exact.search(q, args.k)[0] for q in Q]
+    exact_ms = (time.perf_counter() - t0) * 1000.0 / Q.shape[0]
+
+    nlist = args.nlist or default_nlist(X.shape[0])
+    ivf = IVFIndex(exact.X.data, nlist=nlist, nprobe=1)
+    print(f"N={X.shape[0]} d={X.shape[1]} K={args.k} nlist={ivf.nlist} build={ivf.build_seconds:.2f}s")
+    print(f"{'index':<14}{'recall@K':>10}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'exact':<14}{1.0:>10.3f}{exact_ms:>12.3f}{1.0:>10.1f}")
+    for nprobe in [int(x) for x in args.nprobe.split(",")]:
+        if nprobe > ivf.nlist:
+            continue
+        t0 = time.perf_counter()
+        found = [ivf.search_batch(q[None, :], args.k, nprobe=nprobe)[0][0] for q in Q]
+        ms = (time.perf_counter() - t0) * 1000.0 / Q.shape[0]
+        recall = np.mean([len(set(a.tolist()) & set(b.tolist())) / len(a) for a, b in zip(truth, found)])
+        print(f"{'ivf p=' + str(nprobe):<14}{recall:>10.3f}{ms:>12.3f}{exact_ms / ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
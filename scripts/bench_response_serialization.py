@@ -0,0 +1,81 @@
+"""Per-response serialization overhead: legacy path vs pre-encoded JSON bytes.
+
+    python -m scripts.bench_response_serialization --iters 5000
+
+Legacy path (what the handlers did before): json_safe() over the result, then
+FastAPI's response_model validation, jsonable_encoder and JSONResponse.render.
+New path: the result is already sanitized by the producer (predictor / event
+catalog) and is encoded once by JSONBytesResponse. Uses a real prediction
+result and event metadata from the loaded data.
+"""
+import argparse
+import time
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.api.v1.budget import PredictResponse
+from app.api.v1.events import EventMetaResponse, _meta_payload
+from app.services.datastore import load_budget_data
+from app.services.events_catalog import get_all_event_ids, get_event_meta
+from app.services.predictor import predict_initial_budget
+from app.utils.fast_json import JSONBytesResponse, orjson
+from app.utils.json_safe import json_safe
+
+
+def _legacy_meta(d: dict) -> dict:
+    # 旧 events._clean_meta 相当
+    out = {}
+    for k, v in d.items():
+        if isinstance(v, (int, float)):
+            try:
+                f = float(v)
+                out[k] = f if np.isfinite(f) else None
+            except Exception:
+                out[k] = v
+        elif isinstance(v, str) and v.lower() == "nan":
+            out[k] = None
+        else:
+            out[k] = v
+    return out
+
+
+def _legacy(model, payload: dict, clean) -> bytes:
+    obj = model.model_validate(clean(payload))
+    return JSONResponse(jsonable_encoder(obj.model_dump(mode="json", by_alias=True))).body
+
+
+def _us_per_call(fn, iters: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return (time.perf_counter() - t0) / iters * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iters", type=int, default=5000)
+    args = ap.parse_args()
+
+    data = load_budget_data()
+    rng = np.random.default_rng(0)
+    result = predict_initial_budget(rng.normal(size=(data.X1.shape[1],)).astype("float32"))
+    meta = get_event_meta(get_all_event_ids()[0])
+
+    cases = [
+        ("predict", lambda: _legacy(PredictResponse, result, json_safe), lambda: JSONBytesResponse(result).body),
+        ("events/meta", lambda: _legacy(EventMetaResponse, meta, _legacy_meta),
+         lambda: JSONBytesResponse(_meta_payload(meta)).body),
+    ]
+    print(f"encoder: {'orjson' if orjson is not None else 'json (stdlib)'}")
+    print(f"{'endpoint':>12}{'legacy µs':>12}{'bytes µs':>12}{'speedup':>10}")
+    for name, old, new in cases:
+        a = _us_per_call(old, args.iters)
+        b = _us_per_call(new, args.iters)
+        print(f"{name:>12}{a:>12.1f}{b:>12.1f}{a / b:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Throughput of the SQLite (WAL) session backend vs. number of worker processes.
+
+    python -m scripts.bench_session_workers --workers 1,2,4,8 --seconds 3
+
+Each process opens its own SQLiteSessionStore on one shared file (as uvicorn
+``--workers N`` would) and replays the session side of a game turn: one
+``mutate`` like /v1/allocate and one ``get`` like /v1/state/me, spread over
+many sessions. Reports total operations per second and scaling relative to one
+worker (writes serialize on the database lock, so scaling is sub-linear).
+"""
+import argparse
+import multiprocessing as mp
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from app.services.session_store import SQLiteSessionStore
+
+
+def _session() -> dict:
+    ids = [str(i) for i in range(12)]
+    return {
+        "year": 1, "years_total": 5, "year_budget_total": 1.5e11, "year_budget_remaining": 1.5e11,
+        "events_per_year": 12, "schedule": {1: list(ids)}, "timeline": {1: list(ids)},
+        "done_events": set(), "allocations": {}, "alloc_log": [], "predictions": {}, "scores": {},
+    }
+
+
+def _worker(path: str, sids: list[str], seconds: float, seed: int, out) -> None:
+    store = SQLiteSessionStore(path, ttl_seconds=0, max_sessions=1_000_000, sweep_interval=0)
+    rng = random.Random(seed)
+    ops = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sid = rng.choice(sids)
+        with store.mutate(sid) as s:
+            eid = str(rng.randrange(12))
+            prev = s["allocations"].get(eid, 0.0)
+            s["allocations"][eid] = 1e9
+            s["year_budget_remaining"] -= 1e9 - prev
+            s["alloc_log"] = s["alloc_log"][-50:] + [{"event_id": eid, "amount": 1e9}]
+        store.get(sid)
+        ops += 2
+    out.put(ops)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=str, default="1,2,4,8")
+    ap.add_argument("--sessions", type=int, default=2000)
+    ap.add_argument("--seconds", type=float, default=3.0)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "sessions.sqlite3")
+    store = SQLiteSessionStore(path, ttl_seconds=0, max_sessions=1_000_000, sweep_interval=0)
+    sids = [str(uuid.uuid4()) for _ in range(args.sessions)]
+    for sid in sids:
+        store.put(sid, _session())
+
+    ctx = mp.get_context("spawn")
+    base = None
+    print(f"{'workers':>8}{'ops/s':>12}{'scaling':>10}")
+    for n in [int(x) for x in args.workers.split(",")]:
+        q = ctx.Queue()
+        procs = [ctx.Process(target=_worker, args=(path, sids, args.seconds, i, q)) for i in range(n)]
+        for p in procs:
+            p.start()
+        total = sum(q.get() for _ in procs)
+        for p in procs:
+            p.join()
+        rate = total / args.seconds
+        base = base or rate
+        print(f"{n:>8}{rate:>12,.0f}{rate / base:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Resident memory per worker with and without SHARED_CORPUS.
+
+    python -m scripts.bench_shared_corpus --workers 4 --synthetic 100000 --dim 256
+    python -m scripts.bench_shared_corpus --workers 4          # data/adm_game.parquet
+
+Starts N processes the way ``uvicorn --workers N`` would (spawn, each importing
+the app from scratch). Every process loads the budget data and similarity
+index and runs a few predictions. Then, while all N are still alive, each one
+reads /proc/self/smaps_rollup. RSS counts shared pages in full; PSS divides
+them among the processes mapping them, so sum(PSS) is the real footprint.
+The run is repeated with SHARED_CORPUS off and on. Linux only.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from scripts.synthetic_data import write_adm_parquet
+
+
+def _smaps() -> dict[str, int]:
+    out = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[-1] == "kB":
+                out[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return out
+
+
+def _worker(loaded, measured, out) -> None:
+    # 設定は import 時に読まれるので、環境変数は親プロセスで設定済み
+    from app.services.datastore import load_budget_data
+    from app.services.predictor import predict_initial_budget_batch
+    from app.services.similarity import get_similarity_index
+    from app.services.shared_corpus import release_all
+
+    base = _smaps()
+    data = load_budget_data()
+    index = get_similarity_index()
+    rng = np.random.default_rng(os.getpid())
+    predict_initial_budget_batch(rng.normal(size=(16, index.dim)).astype("float32"))
+    loaded.wait()  # 全ワーカーが揃ってから計測（PSS は同時に写像しているプロセス数で按分）
+    m = _smaps()
+    measured.wait()
+    out.put({"rss": m["Rss"], "pss": m["Pss"], "d_pss": m["Pss"] - base["Pss"],
+             "private": m.get("Private_Clean", 0) + m.get("Private_Dirty", 0),
+             "shared_mode": data.shared is not None})
+    release_all()
+
+
+def _run(n_workers: int, shared: bool) -> list[dict]:
+    os.environ["SHARED_CORPUS"] = "true" if shared else "false"
+    ctx = mp.get_context("spawn")
+    loaded, measured, q = ctx.Barrier(n_workers), ctx.Barrier(n_workers), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(loaded, measured, q)) for _ in range(n_workers)]
+    for p in procs:
+        p.start()
+    rows = [q.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--synthetic", type=int, default=0, help="use a synthetic corpus of N rows")
+    ap.add_argument("--dim", type=int, default=256)
+    args = ap.parse_args()
+
+    tmp = None
+    if args.synthetic:
+        tmp = Path(tempfile.mkdtemp())
+        write_adm_parquet(tmp, args.synthetic, args.dim)
+        os.environ["DATA_CACHE_DIR"] = str(tmp / "data" / ".cache")
+        os.environ["SHARED_CORPUS_DIR"] = str(Path("/dev/shm") / f"policy-game-bench-{os.getpid()}")
+        os.environ["EMBEDDING_CACHE_DIR"] = ""
+        os.chdir(tmp)
+    try:
+        _run(1, shared=False)  # サイドカー作成（以降の計測に parquet 解析を含めない）
+        mb = 1 / (1 << 20)
+        print(f"{'mode':>8}{'workers':>9}{'RSS/w MB':>11}{'PSS/w MB':>11}{'ΔPSS/w MB':>12}{'private/w MB':>14}{'ΣPSS MB':>10}")
+        for shared in (False, True):
+            rows = _run(args.workers, shared)
+            assert all(r["shared_mode"] == shared for r in rows)
+            avg = {k: float(np.mean([r[k] for r in rows])) for k in ("rss", "pss", "d_pss", "private")}
+            total = sum(r["pss"] for r in rows)
+            print(f"{'shared' if shared else 'local':>8}{args.workers:>9}{avg['rss'] * mb:>11.1f}{avg['pss'] * mb:>11.1f}"
+                  f"{avg['d_pss'] * mb:>12.1f}{avg['private'] * mb:>14.1f}{total * mb:>10.1f}")
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+            shutil.rmtree(os.environ["SHARED_CORPUS_DIR"], ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Check that both encoders in app/utils/fast_json.py produce the same JSON.
+
+    python -m scripts.check_fast_json
+
+Encodes the same payloads with orjson (if installed) and with the stdlib
+fallback, including NaN / Inf that slipped past the producer and a real
+/v1/budget/predict response on a synthetic corpus:
+
+- both outputs are strict JSON (no NaN / Infinity literals)
+- both decode to the same value, with non-finite floats as null
+- JSONBytesResponse renders the same body either way
+
+Exits with status 1 if any check fails.
+"""
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from scripts.synthetic_data import write_adm_parquet
+
+
+def _strict(data: bytes):
+    def reject(name):
+        raise ValueError(f"non-standard JSON constant {name}")
+    return json.loads(data, parse_constant=reject)
+
+
+def _payloads() -> list[tuple[str, object]]:
+    from app.services.predictor import predict_initial_budget
+    from app.services.datastore import load_budget_data
+    import numpy as np
+
+    data = load_budget_data()
+    result = predict_initial_budget(np.asarray(data.X1[3], dtype="float32"))
+    dirty = dict(result, estimate_final=math.nan, ratio=math.inf)
+    dirty["topk"] = [dict(row, final_budget=-math.inf) for row in result["topk"]]
+    return [
+        ("prediction", result),
+        ("prediction with NaN/Inf", dirty),
+        ("nested", {"a": [1, 2.5, None, "学校 ICT"], "b": (math.nan, {"c": [math.inf, -0.0]}), "d": True}),
+        ("scalar NaN", math.nan),
+    ]
+
+
+def main():
+    tmp = Path(tempfile.mkdtemp())
+    write_adm_parquet(tmp, 2000, 32)
+    os.environ.update(DATA_CACHE_DIR=str(tmp / "data" / ".cache"), DATASET_APPEND_PATH="", SHARED_CORPUS="false")
+    os.chdir(tmp)
+    failures: list[str] = []
+    try:
+        from app.utils import fast_json
+
+        payloads = _payloads()
+        encoders = {"stdlib": fast_json._stdlib_dumps}
+        if fast_json.orjson is not None:
+            encoders["orjson"] = fast_json.orjson.dumps
+        else:
+            print("orjson is not installed: checking the stdlib fallback only")
+        for label, obj in payloads:
+            decoded = {}
+            for name, enc in encoders.items():
+                try:
+                    decoded[name] = _strict(enc(obj))
+                except Exception as e:
+                    failures.append(f"{label}: {name} failed: {type(e).__name__}: {e}")
+            if len(set(json.dumps(v, sort_keys=True) for v in decoded.values())) > 1:
+                failures.append(f"{label}: encoders disagree")
+            print(f"{label:<26}" + "  ".join(f"{n}={len(enc(obj))}B" for n, enc in encoders.items()
+                                              if n in decoded))
+
+        dirty = payloads[1][1]
+        saved = fast_json.orjson
+        bodies = []
+        try:
+            for mod in ([saved] if saved is not None else []) + [None]:
+                fast_json.orjson = mod
+                bodies.append(_strict(fast_json.JSONBytesResponse(dirty).body))
+        finally:
+            fast_json.orjson = saved
+        if any(b != bodies[0] for b in bodies):
+            failures.append("JSONBytesResponse bodies differ between orjson and the stdlib fallback")
+        if bodies[-1]["estimate_final"] is not None or bodies[-1]["ratio"] is not None:
+            failures.append("non-finite values were not written as null")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    for f in failures:
+        print("FAIL:", f)
+    print("OK" if not failures else f"{len(failures)} check(s) failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Start the API, send traffic while it preloads, and check /ready and /health.
+
+    python -m scripts.check_readiness --synthetic 100000 --dim 256
+    SESSION_BACKEND=sqlite python -m scripts.check_readiness
+
+Runs a real ``uvicorn app.main:app`` subprocess, because the event loop and
+the lifespan preload task are what is being checked. Game requests are fired
+as soon as /health answers, so they wait on the dataset that is still loading.
+Meanwhile /ready and /health are polled:
+
+- /ready is 503 until preload has finished, then 200 (and stays 200)
+- a 200 from /ready reports ``ready`` with no stage still running
+- neither probe stalls for more than ``--max-stall`` seconds behind the traffic
+
+Exits with status 1 if any check fails.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from scripts.synthetic_data import write_adm_parquet
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+async def _traffic(c: httpx.AsyncClient) -> list[int]:
+    # 事前ロード中に届く典型的なリクエスト（データ待ちになる経路）
+    start = await c.post("/v1/state/start")
+    codes = [start.status_code]
+    if start.status_code == 200:
+        sid = start.json()["session_id"]
+        rs = await asyncio.gather(
+            c.get("/v1/events/next", params={"session_id": sid}),
+            c.get("/v1/metrics/months", params={"session_id": sid}),
+            c.get("/v1/events/ids"),
+            c.post("/v1/budget/predict", json={"query_text": "学校 ICT 推進"}),
+        )
+        codes += [r.status_code for r in rs]
+    return codes
+
+
+async def _probe(c: httpx.AsyncClient, path: str, samples: list) -> None:
+    t0 = time.perf_counter()
+    r = await c.get(path)
+    samples.append((path, r.status_code, time.perf_counter() - t0, r.json() if path == "/ready" else None))
+
+
+async def _check(base: str, timeout: float, max_stall: float, interval: float) -> list[str]:
+    failures: list[str] = []
+    samples: list[tuple[str, int, float, dict | None]] = []
+    async with httpx.AsyncClient(base_url=base, timeout=timeout) as c:
+        traffic = asyncio.create_task(_traffic(c))
+        deadline = time.perf_counter() + timeout
+        ready_at = None
+        while time.perf_counter() < deadline:
+            await asyncio.gather(_probe(c, "/ready", samples), _probe(c, "/health", samples))
+            if ready_at is None and samples[-2][1] == 200:
+                ready_at = len(samples)
+            if ready_at is not None and traffic.done() and len(samples) > ready_at + 4:
+                break
+            await asyncio.sleep(interval)
+        codes = await asyncio.wait_for(traffic, timeout)
+
+    ready = [(code, body) for path, code, _, body in samples if path == "/ready"]
+    statuses = [code for code, _ in ready]
+    if 503 not in statuses:
+        failures.append("never saw 503 from /ready (preload finished too fast? try a larger --synthetic)")
+    if 200 not in statuses:
+        failures.append(f"/ready never returned 200 within {timeout:.0f}s")
+    else:
+        first = statuses.index(200)
+        if any(s != 200 for s in statuses[first:]):
+            failures.append("/ready went back to 503 after reporting ready")
+    for code, body in ready:
+        if (code == 200) != bool(body["ready"]):
+            failures.append(f"/ready status {code} disagrees with ready={body['ready']}")
+            break
+        if code == 200 and body["running"]:
+            failures.append("/ready returned 200 while preload was still running")
+            break
+    for path in ("/ready", "/health"):
+        worst = max(dt for p, _, dt, _ in samples if p == path)
+        if worst > max_stall:
+            failures.append(f"{path} stalled {worst:.2f}s (> {max_stall:.2f}s) behind requests waiting on preload")
+    if any(code >= 500 for code in codes):
+        failures.append(f"game requests failed during preload: {codes}")
+
+    stages = next((body for code, body in reversed(ready) if code == 200), {}).get("stages", [])
+    print(f"/ready: {statuses.count(503)} x 503 then {statuses.count(200)} x 200; "
+          f"worst /ready {max(dt for p, _, dt, _ in samples if p == '/ready') * 1000:.0f} ms, "
+          f"/health {max(dt for p, _, dt, _ in samples if p == '/health') * 1000:.0f} ms; "
+          f"game requests {codes}")
+    for s in stages:
+        print(f"  {s['stage']:<20}{'ok' if s['ok'] else 'FAILED':>8}{s['ms']:>12.1f} ms")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--synthetic", type=int, default=100_000, help="synthetic corpus rows (0: use ./data)")
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--max-stall", type=float, default=1.0, help="seconds a probe may take while preloading")
+    ap.add_argument("--interval", type=float, default=0.02)
+    args = ap.parse_args()
+
+    env = dict(os.environ, PRELOAD_ON_STARTUP="true")
+    cwd = REPO
+    tmp = None
+    if args.synthetic:
+        tmp = Path(tempfile.mkdtemp())
+        write_adm_parquet(tmp, args.synthetic, args.dim)
+        (tmp / "web").symlink_to(REPO / "web")  # StaticFiles(directory="web") は cwd 相対
+        env.update(
+            PYTHONPATH=os.pathsep.join(filter(None, [str(REPO), env.get("PYTHONPATH")])),
+            DATA_CACHE_DIR=str(tmp / "data" / ".cache"),
+            EMBEDDING_CACHE_DIR="",
+            SHARED_CORPUS_DIR=str(tmp / "shm"),
+            DATASET_APPEND_PATH="",
+        )
+        env.setdefault("SESSION_SQLITE_PATH", str(tmp / "sessions.sqlite3"))
+        cwd = tmp
+    base = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=cwd, env=env,
+    )
+    try:
+        deadline = time.perf_counter() + args.timeout
+        while True:
+            try:
+                httpx.get(base + "/health", timeout=1.0)
+                break
+            except httpx.TransportError:
+                if server.poll() is not None or time.perf_counter() > deadline:
+                    print("FAIL: server did not start")
+                    sys.exit(1)
+                time.sleep(0.02)
+        failures = asyncio.run(_check(base, args.timeout, args.max_stall, args.interval))
+    finally:
+        server.terminate()
+        server.wait()
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+    for f in failures:
+        print("FAIL:", f)
+    print("OK" if not failures else f"{len(failures)} check(s) failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Hammer one game session with concurrent requests and check the invariants.
+
+    python -m scripts.check_session_concurrency --requests 200
+    SESSION_BACKEND=sqlite python -m scripts.check_session_concurrency
+
+Runs the app in-process (httpx ASGITransport) and fires requests with
+asyncio.gather against a single session_id:
+
+- /v1/events/next: every scheduled event is handed out exactly once, the rest are 409
+- /v1/allocate: year_budget_remaining == total - sum(allocations) and never < 0
+- /v1/state/next_year: exactly one request advances the year
+
+Predictions for the same session run concurrently to keep the CPU executor busy.
+Exits with status 1 if any invariant is violated.
+"""
+import argparse
+import asyncio
+import random
+import sys
+
+import httpx
+
+from app.main import app
+
+
+async def _check(n_requests: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    failures: list[str] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        start = (await c.post("/v1/state/start")).json()
+        sid = start["session_id"]
+        scheduled = start["scheduled_event_ids"]
+        total = float(start["year_budget_total"])
+
+        # 1) 同時 next: 各イベントはちょうど 1 回ずつ
+        rs = await asyncio.gather(
+            *[c.get("/v1/events/next", params={"session_id": sid}) for _ in range(n_requests)],
+            *[c.post("/v1/budget/predict", json={"query_text": "学校 ICT 推進"}) for _ in range(8)],
+        )
+        nexts = rs[:n_requests]
+        got = [r.json()["予算事業ID"] for r in nexts if r.status_code == 200]
+        codes = {r.status_code for r in nexts}
+        if sorted(got) != sorted(scheduled) or len(got) != len(set(got)):
+            failures.append(f"events/next handed out {len(got)} ids ({len(set(got))} distinct), expected {len(scheduled)}")
+        if not codes <= {200, 409}:
+            failures.append(f"events/next unexpected status codes: {sorted(codes)}")
+
+        # 2) 同時 allocate（上書きあり・一部は残額超過で 422）
+        amounts = [rng.uniform(0.05, 0.3) * total for _ in range(n_requests)]
+        allocs = await asyncio.gather(*[
+            c.post("/v1/allocate", json={"session_id": sid, "event_id": rng.choice(scheduled), "allocated_budget": a})
+            for a in amounts
+        ])
+        codes = {r.status_code for r in allocs}
+        if not codes <= {200, 422}:
+            failures.append(f"allocate unexpected status codes: {sorted(codes)}")
+        me = (await c.get("/v1/state/me", params={"session_id": sid})).json()
+        months = (await c.get("/v1/metrics/months", params={"session_id": sid})).json()["months"]
+        allocated = sum(m["allocated"] or 0.0 for m in months)
+        remaining = float(me["year_budget_remaining"])
+        if abs(total - allocated - remaining) > 1e-9 * total:
+            failures.append(f"remaining {remaining:.0f} != total {total:.0f} - allocated {allocated:.0f}")
+        if remaining < 0:
+            failures.append(f"remaining went negative: {remaining:.0f}")
+
+        # 3) 同時 next_year: 進むのは 1 回だけ
+        rs = await asyncio.gather(*[c.post("/v1/state/next_year", json={"session_id": sid}) for _ in range(n_requests)])
+        ok = sum(r.status_code == 200 for r in rs)
+        me = (await c.get("/v1/state/me", params={"session_id": sid})).json()
+        if ok != 1 or me["year"] != 2:
+            failures.append(f"next_year advanced {ok} times (year={me['year']})")
+
+        print(f"next: {len(got)} handed out / {n_requests} requests; "
+              f"allocate: {sum(r.status_code == 200 for r in allocs)} ok; "
+              f"remaining={remaining:.0f} allocated={allocated:.0f}; year={me['year']}")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    failures: list[str] = []
+    for i in range(args.rounds):
+        failures += asyncio.run(_check(args.requests, seed=i))
+    for f in failures:
+        print("FAIL:", f)
+    print("OK" if not failures else f"{len(failures)} invariant violation(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""OpenAI-compatible embeddings stub for offline benchmarking.
+
+Serves ``POST /v1/embeddings`` with deterministic dummy vectors (same hashing
+embedder as EMBEDDING_PROVIDER=dummy), so the OpenAI client path can be
+exercised without network access or an API key.
+
+    STUB_EMBEDDING_DIM=3072 STUB_LATENCY_MS=50 \\
+        uvicorn scripts.openai_stub_server:app --port 8100
+
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=stub \\
+        EMBEDDING_PROVIDER=openai uvicorn app.main:app
+"""
+import asyncio
+import base64
+import os
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from app.services.embedding import _embed_dummy
+
+STUB_DIM = int(os.getenv("STUB_EMBEDDING_DIM", "3072"))
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "0"))
+
+app = FastAPI(title="OpenAI embeddings stub")
+
+
+class EmbeddingsRequest(BaseModel):
+    model: str
+    input: str | list[str]
+    encoding_format: str | None = None
+    dimensions: int | None = None
+
+
+@app.post("/v1/embeddings")
+async def embeddings(req: EmbeddingsRequest):
+    texts = [req.input] if isinstance(req.input, str) else list(req.input)
+    if not texts:
+        raise HTTPException(status_code=400, detail="input must not be empty")
+    if STUB_LATENCY_MS > 0:
+        await asyncio.sleep(STUB_LATENCY_MS / 1000.0)
+    dim = int(req.dimensions or STUB_DIM)
+    data = []
+    for i, t in enumerate(texts):
+        try:
+            v = _embed_dummy(t, dim=dim, normalize=True)
+        except ValueError:
+            # 単語を含まない入力も本物の API は受け付けるので、ゼロベクトルで返す
+            v = np.zeros((dim,), dtype="float32")
+        emb = base64.b64encode(v.astype("<f4").tobytes()).decode("ascii") if req.encoding_format == "base64" else v.tolist()
+        data.append({"object": "embedding", "index": i, "embedding": emb})
+    n_tokens = sum(len(t.split()) for t in texts)
+    return {
+        "object": "list",
+        "data": data,
+        "model": req.model,
+        "usage": {"prompt_tokens": n_tokens, "total_tokens": n_tokens},
+    }
@@ -0,0 +1,102 @@
+"""Score a CSV / parquet of 事業の概要 rows and write NDJSON (one estimate per row).
+
+    python -m scripts.predict_bulk requests.csv -o estimates.ndjson                 # in-process
+    python -m scripts.predict_bulk requests.parquet --url http://127.0.0.1:8000 -o -  # via the API
+    python -m scripts.predict_bulk requests.csv --encoding cp932 --text-column 現状・課題
+
+In-process mode reads the file in ``--chunk-rows`` chunks with the same code
+as POST /v1/budget/predict_bulk. ``--url`` streams the file to that endpoint
+and writes lines as they come back. Either way memory stays flat in the file
+size. The trailing ``{"summary": ...}`` line is printed to stderr.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def _write_lines(chunks, out) -> dict | None:
+    # チャンク境界は行境界と限らない（HTTP の受信単位）ので、行の途中は次回に持ち越す
+    summary = None
+    pending = b""
+    for chunk in chunks:
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            if line.startswith(b'{"summary"'):
+                summary = json.loads(line)["summary"]
+            elif line:
+                out.write(line + b"\n")
+        out.flush()
+    if pending.startswith(b'{"summary"'):
+        summary = json.loads(pending)["summary"]
+    elif pending:
+        out.write(pending + b"\n")
+    return summary
+
+
+def _local(args, out) -> dict | None:
+    from app.core.config import settings
+    from app.services.bulk_predict import BulkSource, iter_ndjson, sniff_format
+
+    source = BulkSource(
+        path=args.input,
+        fmt=args.format or sniff_format(args.input),
+        text_column=args.text_column,
+        id_column=args.id_column or None,
+        chunk_rows=args.chunk_rows or settings.BULK_CHUNK_ROWS,
+        encoding=args.encoding,
+    )
+    source.validate()
+    return _write_lines(iter_ndjson(source, topk=args.topk, evidence=args.evidence), out)
+
+
+def _remote(args, out) -> dict | None:
+    import httpx
+
+    params = {"text_column": args.text_column, "id_column": args.id_column, "encoding": args.encoding,
+              "evidence": args.evidence}
+    for key in ("format", "chunk_rows", "topk"):
+        if getattr(args, key):
+            params[key] = getattr(args, key)
+
+    def body():
+        with open(args.input, "rb") as f:
+            while piece := f.read(1 << 20):
+                yield piece
+
+    url = args.url.rstrip("/") + "/v1/budget/predict_bulk"
+    with httpx.Client(timeout=None) as client:
+        with client.stream("POST", url, params=params, content=body(),
+                           headers={"content-type": "application/octet-stream"}) as r:
+            if r.status_code != 200:
+                r.read()
+                sys.exit(f"{r.status_code}: {r.text}")
+            return _write_lines(r.iter_raw(), out)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("input", type=Path)
+    ap.add_argument("-o", "--output", default="-", help="NDJSON output path ('-' = stdout)")
+    ap.add_argument("--url", help="API base URL; omit to run in-process")
+    ap.add_argument("--text-column", default="事業の概要")
+    ap.add_argument("--id-column", default="予算事業ID")
+    ap.add_argument("--format", choices=["csv", "parquet"])
+    ap.add_argument("--encoding", default="utf-8-sig", help="CSV encoding (e.g. cp932)")
+    ap.add_argument("--chunk-rows", type=int, default=0)
+    ap.add_argument("--topk", type=int, default=0)
+    ap.add_argument("--evidence", action="store_true", help="include the top-k evidence rows")
+    args = ap.parse_args()
+    args.topk = args.topk or None
+
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        summary = (_remote if args.url else _local)(args, out)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    print(json.dumps({"summary": summary}, ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
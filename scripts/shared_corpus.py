@@ -0,0 +1,40 @@
+"""Publish / inspect / clean up the shared corpus segment (SHARED_CORPUS).
+
+    python -m scripts.shared_corpus publish   # build once before `uvicorn --workers N`
+    python -m scripts.shared_corpus status
+    python -m scripts.shared_corpus gc        # remove stale segments nobody is attached to
+                                              # (the one matching the current data is kept)
+
+Workers publish on demand as well (the first one to start builds under a lock),
+so ``publish`` is optional. It moves the parquet parse out of worker startup.
+"""
+import argparse
+import json
+
+from app.core.config import settings
+from app.services.datastore import load_budget_data, shared_corpus_sources
+from app.services.shared_corpus import list_segments, release_all, remove_stale, segment_key, shared_root
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("command", choices=["publish", "status", "gc"])
+    args = ap.parse_args()
+
+    if args.command == "publish":
+        settings.SHARED_CORPUS = True
+        seg = load_budget_data().shared
+        print(f"published {seg.path} ({seg.nbytes / (1 << 20):.1f} MB, storage={seg.storage})")
+        release_all(cleanup=False)  # ワーカーが接続するまで残す
+    elif args.command == "gc":
+        key, _ = segment_key(shared_corpus_sources(), settings.EMBEDDING_STORAGE.lower())
+        removed = remove_stale(keep=key)
+        print(f"removed {len(removed)} segment(s): {removed}")
+    else:
+        key, _ = segment_key(shared_corpus_sources(), settings.EMBEDDING_STORAGE.lower())
+        print(json.dumps({"root": str(shared_root()), "current": key, "segments": list_segments()},
+                         ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
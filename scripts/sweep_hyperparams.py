@@ -0,0 +1,112 @@
+"""Leave-one-out sweep of TOPK × TAU over the budget data.
+
+    python -m scripts.sweep_hyperparams                               # data/ の実データ
+    python -m scripts.sweep_hyperparams --k 1:50 --tau 0.005:1:40 --out sweep.csv
+    python -m scripts.sweep_hyperparams --synthetic 30000 --dim 256   # 速度確認用
+
+Every row is estimated from its nearest other rows exactly as
+``/v1/budget/predict`` would (softmax(sim/τ) over the top-K, log-weighted
+mean of 当初予算), and compared with its own value. The top-kmax neighbours
+are computed once, in row blocks of at most ``--block-mb``, and every
+(K, τ) in the grid reuses them. Prints the best settings by mean |log error|
+next to the current TOPK/TAU; ``--out`` writes all rows (.csv or .json).
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from scripts.synthetic_data import write_adm_parquet
+
+
+# 既定の格子（--k / --tau 省略時）。現在の TOPK / TAU は常に足して比較できるようにする
+_DEFAULT_K = "1:30"
+_DEFAULT_TAU = "0.005:1:20"
+
+
+def _grid(spec: str, cast) -> list:
+    """``a,b,c`` (list), ``lo:hi`` (integer range, inclusive) or ``lo:hi:n`` (n log-spaced values)."""
+    if ":" not in spec:
+        return [cast(v) for v in spec.split(",") if v]
+    parts = spec.split(":")
+    if len(parts) == 2:
+        return list(range(int(parts[0]), int(parts[1]) + 1))
+    lo, hi, n = float(parts[0]), float(parts[1]), int(parts[2])
+    vals = np.geomspace(lo, hi, n)
+    return sorted({cast(round(v)) for v in vals}) if cast is int else [float(v) for v in vals]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--k", help=f"K grid: 1,3,5 / 1:30 / 1:100:20 (log-spaced); default {_DEFAULT_K} + TOPK")
+    ap.add_argument("--tau", help=f"τ grid: 0.05,0.1 / 0.005:1:20 (log-spaced); default {_DEFAULT_TAU} + TAU")
+    ap.add_argument("--target", choices=["initial", "final"], default="initial")
+    ap.add_argument("--storage", default=None, help="corpus storage (default EMBEDDING_STORAGE)")
+    ap.add_argument("--block-mb", type=int, default=256, help="memory bound for one score block")
+    ap.add_argument("--top", type=int, default=10, help="print the N best settings")
+    ap.add_argument("--synthetic", type=int, default=0, help="use a synthetic corpus of N rows")
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--out", type=Path, help="write all rows (.csv or .json)")
+    args = ap.parse_args()
+
+    out = args.out.resolve() if args.out else None
+    tmp = None
+    if args.synthetic:
+        tmp = Path(tempfile.mkdtemp())
+        write_adm_parquet(tmp, args.synthetic, args.dim)
+        os.environ["DATA_CACHE_DIR"] = str(tmp / "data" / ".cache")
+        os.chdir(tmp)
+    try:
+        # 設定は import 時に読まれるので、cwd と環境変数を整えてから import する
+        from app.core.config import settings
+        from app.services.datastore import load_budget_data
+        from app.services.evaluation import evaluate
+
+        ks = _grid(args.k or _DEFAULT_K, int)
+        taus = _grid(args.tau or _DEFAULT_TAU, float)
+        if args.k is None and settings.TOPK not in ks:
+            ks = sorted([*ks, int(settings.TOPK)])
+        if args.tau is None and not np.isclose(taus, settings.TAU).any():
+            taus = sorted([*taus, float(settings.TAU)])
+        t0 = time.perf_counter()
+        data = load_budget_data()
+        load_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        nb, rows = evaluate(data, ks, taus, target=args.target,
+                            storage=args.storage or settings.EMBEDDING_STORAGE,
+                            block_bytes=args.block_mb << 20)
+        total_s = time.perf_counter() - t0
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    N, d = data.X1.shape
+    print(f"rows={N} dim={d} kmax={nb.kmax} settings={len(rows)} target={args.target}")
+    print(f"load {load_s:.1f}s  neighbours {nb.seconds:.1f}s  sweep {total_s - nb.seconds:.1f}s")
+    ranked = sorted((r for r in rows if np.isfinite(r.mae_log)), key=lambda r: r.mae_log)
+    current = next((r for r in rows if r.k == settings.TOPK and np.isclose(r.tau, settings.TAU)), None)
+    print(f"{'K':>4}{'tau':>9}{'MAE(log)':>10}{'RMSE':>8}{'median':>8}{'p90':>8}{'bias':>8}{'≤2x':>7}{'cover':>7}")
+    for label, r in [*(("", r) for r in ranked[:args.top]), *((" ← current TOPK/TAU", r) for r in [current] if r)]:
+        print(f"{r.k:>4}{r.tau:>9.4f}{r.mae_log:>10.4f}{r.rmse_log:>8.3f}{r.median_ae_log:>8.3f}"
+              f"{r.p90_ae_log:>8.3f}{r.bias_log:>8.3f}{r.within_2x:>7.3f}{r.coverage:>7.3f}{label}")
+    if current is None:
+        print(f"(current TOPK={settings.TOPK} TAU={settings.TAU} is not in the grid)")
+
+    if out:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        if out.suffix == ".json":
+            out.write_text(json.dumps({"rows": int(N), "dim": int(d), "target": args.target,
+                                       "results": [r.to_dict() for r in rows]}, indent=2))
+        else:
+            import pandas as pd
+            pd.DataFrame([r.to_dict() for r in rows]).to_csv(out, index=False)
+        print(f"wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
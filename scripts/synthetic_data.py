@@ -0,0 +1,55 @@
+"""Synthetic adm_game.parquet for benchmarks (N rows, d-dim embedding_sum).
+
+Used by the bench_* scripts; run directly to write one:
+
+    python -m scripts.synthetic_data /tmp/bench --rows 50000 --dim 256
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+_WORDS = (
+    "学校", "ICT", "推進", "医療", "道路", "整備", "調査", "支援", "防災", "観光",
+    "農業", "研究", "国際", "環境", "エネルギー", "地域", "福祉", "教育", "交通", "保健",
+)
+
+
+def write_adm_parquet(root: Path, n: int, d: int, seed: int = 0) -> Path:
+    """Write ``root/data/adm_game.parquet`` with the columns the app reads."""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, d)).astype("float32")
+    emb = pa.FixedSizeListArray.from_arrays(pa.array(X.reshape(-1)), d)
+    words = np.array(_WORDS, dtype=object)
+    texts = [" ".join(row) for row in words[rng.integers(0, len(_WORDS), size=(n, 6))].tolist()]
+    df = pd.DataFrame({
+        "予算事業ID": np.arange(1, n + 1).astype(str),
+        "事業名": [f"{_WORDS[i % len(_WORDS)]}{_WORDS[(i * 7) % len(_WORDS)]}事業{i}" for i in range(n)],
+        "事業の概要": texts,
+        "現状・課題": texts,
+        "当初予算": np.exp(rng.normal(20, 2, n)),
+        "歳出予算現額": np.exp(rng.normal(20, 2, n)),
+    })
+    table = pa.Table.from_pandas(df, preserve_index=False).append_column("embedding_sum", emb)
+    path = Path(root) / "data" / "adm_game.parquet"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, path)
+    return path
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("root", type=Path)
+    ap.add_argument("--rows", type=int, default=50000)
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    print(write_adm_parquet(args.root, args.rows, args.dim, args.seed))
+
+
+if __name__ == "__main__":
+    main()